@@ -1,14 +1,42 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Optional
 
 
 class Settings(BaseSettings):
     # Stripe Configuration
     stripe_publishable_key: str
     stripe_secret_key: str
+    config_max_age: int = 300  # seconds browsers/CDNs may cache GET /payments/config
+    
+    # Stripe Webhooks (confirmation emails are sent on payment success when set)
+    stripe_webhook_secret: Optional[str] = None
+    webhook_queue_size: int = 1000
+    webhook_workers: int = 4
+    webhook_dedup_size: int = 10000
+    
+    # Stripe Customer Cache
+    customer_cache_size: int = 10000
+    customer_cache_ttl: float = 3600.0
+    
+    # Customer Portal Session Cache (0 TTL disables; capped under the 5 minute URL lifetime)
+    portal_cache_size: int = 5000
+    portal_cache_ttl: float = 60.0
+    
+    # Stripe API base override (local stand-ins / benchmarks only)
+    stripe_api_base: Optional[str] = None
+    
+    # Outbound HTTP Record/Replay (benchmarks and tests only, see app/services/cassette.py)
+    http_cassette_mode: Optional[str] = None  # record or replay
+    http_cassette_path: str = "benchmarks/cassettes/checkout.cassette"
+    http_cassette_latency: Optional[float] = None  # seconds per replayed call instead of the recorded latency
+    http_cassette_latency_scale: float = 1.0  # multiplier on recorded latencies
     
     # Turnstile Configuration
     turnstile_secret_key: str
+    turnstile_verify_url: str = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
+    turnstile_cache_size: int = 10000
+    turnstile_token_ttl: float = 300.0  # tokens are single-use and valid for 5 minutes
+    turnstile_retry_window: float = 60.0  # same session may resubmit a verified token this long
     
     # Email Configuration
     notification_emails: str  # Comma-separated emails
@@ -17,6 +45,7 @@ class Settings(BaseSettings):
     mailtrap_api_token: Optional[str] = None
     sender_email: Optional[str] = None
     sender_name: Optional[str] = None
+    mailtrap_api_base: Optional[str] = None  # e.g. http://127.0.0.1:9003 for stand-ins
     
     # SMTP Configuration (Development - Mailpit)
     smtp_host: Optional[str] = None
@@ -39,24 +68,101 @@ class Settings(BaseSettings):
     cors_origins: str  # Required - comma-separated origins
     allowed_hosts: str  # Required - comma-separated hosts
     
+    # Runtime Config Reload (values in the overrides file win over the environment)
+    config_overrides_path: Optional[str] = None  # .env-style file, re-read on SIGHUP or when it changes
+    config_reload_interval: float = 2.0  # seconds between checks of the overrides file
+    
     # Internal API Security (Never expose to frontend)
     api_key: str  # Server-side only - for internal auth
     
-    # Rate Limiting
-    rate_limit_requests: int = 100
+    # Process Model (set by gunicorn.conf.py, or uvicorn --workers via the same env var)
+    web_concurrency: int = 1  # worker processes sharing the budgets below
+    
+    # Rate Limiting (per host; split evenly between workers unless counters are shared)
+    # Buckets and the routes spending them are declared in app/services/rate_limits.py
+    rate_limit_requests: int = 100  # default bucket, per IP, for routes without a policy
     rate_limit_window: int = 3600  # 1 hour
+    rate_limit_config_requests: int = 1000  # GET /payments/config per IP
+    rate_limit_session_requests: int = 60  # POST /payments/session per IP
+    rate_limit_checkout_requests: int = 30  # /payments/create + /customer-portal per IP, shared
+    rate_limit_checkout_session_requests: int = 10  # the same routes per session key
+    rate_limit_email_requests: int = 10  # /payments/create per customer email
+    
+    # Admission Control (per worker)
+    admission_per_client: int = 8  # in-flight requests per client IP
+    admission_max_in_flight: int = 200  # in-flight requests at which even /payments/create is refused
+    admission_max_loop_lag: float = 0.25  # seconds of event-loop lag counted as full load
+    admission_retry_after: int = 2  # seconds, sent with 429/503 rejections
+    
+    # Graceful Shutdown (keep gunicorn's GRACEFUL_TIMEOUT and the compose stop_grace_period above this)
+    shutdown_drain_timeout: float = 15.0  # seconds in-flight requests and background tasks get after SIGTERM
+    shutdown_retry_after: int = 5  # seconds, sent with 503s while draining
+    
+    # Rate-limit / Session Counter Store
+    state_backend: str = "memory"  # memory (per worker) or shm (shared by workers on the host)
+    shared_state_path: str = "/dev/shm/ezyba-counters"
+    shared_state_slots: int = 65536
+    state_snapshot_enabled: bool = True
+    state_snapshot_path: str = "/tmp/logs/state/counters.snap"  # on the logs volume, survives restarts
+    state_snapshot_interval: float = 60.0  # seconds
+    
+    # Payment Ledger (SQLite, on the logs volume)
+    ledger_path: str = "/tmp/logs/ledger/payments.db"
+    ledger_flush_interval: float = 1.0  # seconds between batched writes
+    ledger_batch_size: int = 500  # flush early once this many writes are pending
+    ledger_max_pending: int = 10000  # oldest writes dropped beyond this while the database is unwritable
+
+    # Admin Export (streamed from Stripe list endpoints)
+    export_page_size: int = 100  # Stripe maximum
+    export_prefetch_pages: int = 2  # pages fetched ahead of the response writer
+
+    # Bulk Payment Creation (admin)
+    bulk_concurrency: int = 8  # rows processed at once
+    bulk_max_rows: int = 5000
+
+    # Readiness Probes
+    readiness_probe_interval: float = 15.0  # seconds between probe rounds
+    readiness_probe_timeout: float = 5.0  # per-dependency connect timeout
+    readiness_max_loop_lag: float = 0.5  # seconds
+    
+    # Outbound Timeouts & Circuit Breakers
+    payment_request_deadline: float = 20.0  # seconds for turnstile + stripe stages
+    turnstile_timeout: float = 5.0
+    stripe_timeout: float = 10.0
+    email_timeout: float = 10.0
+    breaker_window_seconds: float = 60.0
+    breaker_min_calls: int = 10
+    breaker_error_rate: float = 0.5
+    breaker_slow_call_seconds: float = 5.0
+    breaker_slow_call_rate: float = 0.5
+    breaker_open_seconds: float = 30.0
+    
+    # Stripe Outbound Limiter (rate and burst per host, split between workers)
+    stripe_rate_limit: float = 20.0  # requests per second
+    stripe_rate_burst: int = 20
+    stripe_max_concurrency: int = 10
+    stripe_max_queue_wait: float = 2.0  # seconds before failing with 503
+    thread_pool_size: int = 32  # threads for blocking SDK calls, at least stripe_max_concurrency + 4
+    
+    # Startup Warm-up
+    warmup_enabled: bool = True
+    warmup_budget: float = 10.0  # seconds, startup continues when exceeded
     
-    @property
-    def notification_email_list(self) -> List[str]:
-        return [email.strip() for email in self.notification_emails.split(",")]
+    # Event Loop Monitor
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval: float = 0.1  # heartbeat period, seconds
+    loop_slow_threshold: float = 0.1  # steps holding the loop longer than this are flagged
+    loop_monitor_log_interval: float = 60.0  # seconds between stats log records
     
-    @property
-    def cors_origins_list(self) -> List[str]:
-        return [origin.strip() for origin in self.cors_origins.split(",")]
+    # On-demand Profiling (middleware is not installed unless enabled)
+    profiling_enabled: bool = False
+    profile_sample_rate: int = 0  # profile 1 in N requests, 0 = signed requests only
+    profile_dir: str = "/tmp/logs/profiles"
+    profile_max_files: int = 50
+    profile_signature_tolerance: int = 300  # seconds a signed header stays valid
     
-    @property
-    def allowed_hosts_list(self) -> List[str]:
-        return [host.strip() for host in self.allowed_hosts.split(",")]
+    # Parsed host/origin/recipient sets live in the runtime config snapshot
+    # (app/services/runtime_config.py), which is what request code reads
     
     class Config:
         env_file = ".env"
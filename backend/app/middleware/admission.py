@@ -0,0 +1,72 @@
+"""
+Admission Middleware
+- Pure ASGI, innermost, so CORS headers are on rejections and preflights
+  are answered without taking a slot
+- Asks the admission controller before the route runs and releases the
+  slot when the response (streams included) is finished
+"""
+
+import json
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.middleware.security import get_client_ip
+from app.services.admission import ADMITTED, CLIENT_LIMIT, OVERLOADED, AdmissionController, admission_controller
+from app.utils.logging import log_security_event
+
+REJECTIONS = {
+    CLIENT_LIMIT: (429, "Too many concurrent requests"),
+    OVERLOADED: (503, "Server busy, retry later"),
+}
+
+
+def client_ip(scope: Scope) -> str:
+    """IP stored by real_ip_middleware (which runs outside this one), resolved the same way if absent"""
+    state = scope.get("state")
+    if state and "real_ip" in state:
+        return state["real_ip"]
+    return get_client_ip(Request(scope))
+
+
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        priority = self.controller.priority(scope["path"])
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = client_ip(scope)
+        decision = self.controller.admit(client, priority)
+        if decision != ADMITTED:
+            if decision == CLIENT_LIMIT:
+                log_security_event("CONCURRENCY_LIMIT_EXCEEDED", client, f"Path: {scope['path']}")
+            await self._reject(decision, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(client)
+
+    async def _reject(self, decision: str, send: Send):
+        status, detail = REJECTIONS[decision]
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.controller.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -14,6 +14,7 @@ import time
 from urllib.parse import urlparse
 
 from app.config import settings
+from app.services.runtime_config import runtime_config
 from app.utils.logging import log_security_event
 
 logger = logging.getLogger(__name__)
@@ -69,7 +70,7 @@ class SecureAPIAuth:
         
         try:
             parsed = urlparse(origin)
-            return parsed.hostname in settings.allowed_hosts_list
+            return parsed.hostname in runtime_config.current.allowed_hosts
         except Exception:
             return False
     
@@ -83,7 +84,7 @@ class SecureAPIAuth:
         
         try:
             parsed = urlparse(referer)
-            return parsed.hostname in settings.allowed_hosts_list
+            return parsed.hostname in runtime_config.current.allowed_hosts
         except Exception:
             return False
     
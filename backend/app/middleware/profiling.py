@@ -0,0 +1,95 @@
+"""
+On-demand Request Profiling Middleware
+- Only installed when settings.profiling_enabled is set
+- Profiles requests carrying a valid X-Profile-Signature header
+  (t=<unix time>,v1=<HMAC-SHA256 of "<t>.<path>" with settings.api_key>)
+- Optionally profiles 1 in settings.profile_sample_rate requests
+- One profile at a time: cProfile sees everything on the event loop thread
+  while the request is in flight, so concurrent requests share the profile
+"""
+
+import cProfile
+import logging
+import secrets
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.middleware.api_auth import RequestSigner
+from app.services.profiling import ProfileStore, profile_store
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile-signature"
+
+
+def sign_profile_request(path: str, timestamp: Optional[int] = None) -> str:
+    """Header value that triggers profiling of a request to path"""
+    timestamp = str(int(time.time()) if timestamp is None else timestamp)
+    return f"t={timestamp},v1={RequestSigner.generate_signature(path, settings.api_key, timestamp)}"
+
+
+def verify_profile_signature(value: str, path: str) -> bool:
+    try:
+        parts = dict(part.split("=", 1) for part in value.split(","))
+        timestamp, signature = parts["t"], parts["v1"]
+        if abs(time.time() - int(timestamp)) > settings.profile_signature_tolerance:
+            return False
+    except (KeyError, ValueError):
+        return False
+    return RequestSigner.verify_signature(path, signature, settings.api_key, timestamp)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware so untriggered requests only pay for a header lookup"""
+
+    def __init__(self, app: ASGIApp, store: ProfileStore = profile_store,
+                 sample_rate: Optional[int] = None):
+        self.app = app
+        self.store = store
+        self.sample_rate = settings.profile_sample_rate if sample_rate is None else sample_rate
+        self.request_count = 0
+        self.active = False
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                if verify_profile_signature(value.decode("latin-1"), scope["path"]):
+                    return "signed"
+                logger.warning(f"Invalid profiling signature for {scope['path']}")
+                return None
+
+        if self.sample_rate:
+            self.request_count += 1
+            if self.request_count % self.sample_rate == 0:
+                return "sampled"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or self.active:
+            await self.app(scope, receive, send)
+            return
+
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        name = self.store.new_name(trigger, scope["method"], scope["path"], secrets.token_hex(4))
+
+        async def send_with_profile_id(message: Message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).append((b"x-profile-id", name.encode()))
+            await send(message)
+
+        profiler = cProfile.Profile()
+        self.active = True
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.disable()
+            self.active = False
+            await self.store.save(profiler, name)
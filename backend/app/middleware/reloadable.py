@@ -0,0 +1,61 @@
+"""
+Reloadable Host and CORS Middleware
+- Starlette's TrustedHost and CORS middlewares with their host and origin
+  lists taken from the runtime config snapshot, so a reload applies
+  without a restart
+- Exact hosts are a set lookup on the raw Host header; wildcard patterns
+  and www redirects fall through to Starlette's own matching
+- Allowing every origin ("*" in CORS_ORIGINS) changes which headers CORS
+  sends and is fixed at startup
+"""
+
+from typing import Iterable, Optional
+
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.trustedhost import TrustedHostMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services.runtime_config import ConfigSnapshot, RuntimeConfig, runtime_config
+
+
+def host_header(scope: Scope) -> str:
+    """Host header without the port, read straight from the ASGI headers"""
+    for name, value in scope["headers"]:
+        if name == b"host":
+            return value.decode("latin-1").split(":")[0]
+    return ""
+
+
+class ReloadableTrustedHostMiddleware(TrustedHostMiddleware):
+    def __init__(self, app: ASGIApp, config: RuntimeConfig = runtime_config,
+                 extra_hosts: Iterable[str] = (), www_redirect: bool = True):
+        self.config = config
+        self.extra_hosts = frozenset(extra_hosts)
+        self.version: Optional[int] = None
+        self._refresh(config.current)
+        super().__init__(app, allowed_hosts=self.allowed_hosts, www_redirect=www_redirect)
+
+    def _refresh(self, snapshot: ConfigSnapshot):
+        self.exact_hosts = snapshot.allowed_hosts | self.extra_hosts
+        self.allowed_hosts = [*self.exact_hosts, *snapshot.host_wildcards]
+        self.allow_any = "*" in self.exact_hosts
+        self.version = snapshot.version
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        snapshot = self.config.current
+        if snapshot.version != self.version:
+            self._refresh(snapshot)
+
+        if scope["type"] == "http" and host_header(scope) in self.exact_hosts:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class ReloadableCORSMiddleware(CORSMiddleware):
+    def __init__(self, app: ASGIApp, config: RuntimeConfig = runtime_config, **options):
+        self.config = config
+        super().__init__(app, allow_origins=sorted(config.current.cors_origins), **options)
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        return self.allow_all_origins or origin in self.config.current.cors_origins
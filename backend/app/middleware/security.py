@@ -1,18 +1,19 @@
 from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import time
 from typing import Dict, Optional
 import logging
+import math
+import time
 from urllib.parse import urlparse
 
 from app.config import settings
+from app.services.runtime_config import runtime_config
+from app.services.rate_limits import KEY_EMAIL, KEY_IP, KEY_SESSION, RateLimitDenial, rate_limiter
 from app.utils.logging import log_security_event
 
 logger = logging.getLogger(__name__)
 
-# In-memory rate limiting (use Redis in production)
-rate_limit_storage: Dict[str, Dict[str, int]] = {}
-
 class APIKeyAuth(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super(APIKeyAuth, self).__init__(auto_error=auto_error)
@@ -55,12 +56,12 @@ class APIKeyAuth(HTTPBearer):
         # Check origin header
         if origin:
             parsed = urlparse(origin)
-            return parsed.hostname in settings.allowed_hosts_list
+            return parsed.hostname in runtime_config.current.allowed_hosts
         
         # Check referer as fallback
         if referer:
             parsed = urlparse(referer)
-            return parsed.hostname in settings.allowed_hosts_list
+            return parsed.hostname in runtime_config.current.allowed_hosts
         
         return False
     
@@ -92,47 +93,48 @@ def get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
-def check_rate_limit(request: Request) -> bool:
-    """Check if request is within rate limit"""
-    client_ip = get_client_ip(request)
-    current_time = int(time.time())
-    window_start = current_time - settings.rate_limit_window
-    
-    # Clean old entries
-    if client_ip in rate_limit_storage:
-        rate_limit_storage[client_ip] = {
-            timestamp: count for timestamp, count in rate_limit_storage[client_ip].items()
-            if int(timestamp) > window_start
-        }
-    else:
-        rate_limit_storage[client_ip] = {}
+def check_rate_limit(request: Request, keys: Optional[Dict[str, Optional[str]]] = None) -> Optional[RateLimitDenial]:
+    """Spend the route's rate-limit buckets; returns the denial when one is exhausted
     
-    # Count requests in current window
-    total_requests = sum(rate_limit_storage[client_ip].values())
+    keys defaults to the client IP and session key; routes pass the email later.
+    """
+    client_ip = get_client_ip(request)
+    if keys is None:
+        keys = {KEY_IP: client_ip, KEY_SESSION: request.headers.get("X-Session-Key")}
     
-    if total_requests >= settings.rate_limit_requests:
+    denial = rate_limiter.check(request.method, request.url.path, keys)
+    if denial is not None:
         sanitized_ip = client_ip.replace('\n', '').replace('\r', '')
-        logger.warning(f"Rate limit exceeded for IP: {sanitized_ip}")
-        log_security_event("RATE_LIMIT_EXCEEDED", client_ip, f"Requests: {total_requests}")
-        return False
-    
-    # Add current request
-    current_minute = str(current_time // 60)  # Group by minute
-    rate_limit_storage[client_ip][current_minute] = rate_limit_storage[client_ip].get(current_minute, 0) + 1
-    
-    return True
+        logger.warning(f"Rate limit '{denial.bucket.name}' exceeded for IP: {sanitized_ip}")
+        log_security_event("RATE_LIMIT_EXCEEDED", client_ip,
+                           f"Bucket: {denial.bucket.name}, requests: {denial.result.count}")
+    return denial
 
 
-async def rate_limit_middleware(request: Request, call_next):
-    """Rate limiting middleware"""
-    # Skip rate limiting for health check
-    if request.url.path == "/health":
-        return await call_next(request)
-    
-    if not check_rate_limit(request):
+def rate_limit_headers(denial: RateLimitDenial) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(denial.result.reset_at - time.time())))}
+
+
+def enforce_email_rate_limit(request: Request, email: str):
+    """Spend the route's email-keyed buckets once the body is validated (429 when exhausted)"""
+    denial = check_rate_limit(request, {KEY_EMAIL: email.lower()})
+    if denial is not None:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Try again later."
+            detail="Rate limit exceeded. Try again later.",
+            headers=rate_limit_headers(denial)
+        )
+
+
+async def rate_limit_middleware(request: Request, call_next):
+    """Per-route rate limiting (policies in app.services.rate_limits)"""
+    denial = check_rate_limit(request)
+    if denial is not None:
+        # Returned, not raised: exceptions from http middlewares skip the HTTPException handler
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Rate limit exceeded. Try again later."},
+            headers=rate_limit_headers(denial)
         )
     
     return await call_next(request)
@@ -0,0 +1,49 @@
+"""
+Shutdown Middleware
+- Pure ASGI and outermost, so a request counts as in flight until its
+  response (streams included) is fully sent
+- While the process drains, new requests get 503 with Connection: close
+  and Retry-After, so keep-alive clients reconnect to another instance;
+  /health and /ready still answer (/ready with 503)
+"""
+
+import json
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services.shutdown import ShutdownCoordinator, shutdown_coordinator
+
+PROBE_PATHS = frozenset({"/health", "/ready"})
+DRAINING_BODY = json.dumps({"detail": "Server is shutting down, retry later"}).encode()
+
+
+class ShutdownMiddleware:
+    def __init__(self, app: ASGIApp, coordinator: ShutdownCoordinator = shutdown_coordinator):
+        self.app = app
+        self.coordinator = coordinator
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.coordinator.draining and scope["path"] not in PROBE_PATHS:
+            self.coordinator.refused += 1
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(DRAINING_BODY)).encode()),
+                    (b"connection", b"close"),
+                    (b"retry-after", str(self.coordinator.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": DRAINING_BODY})
+            return
+
+        request_id = self.coordinator.request_started(scope["method"], scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.coordinator.request_finished(request_id)
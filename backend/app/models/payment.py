@@ -48,6 +48,11 @@ class PaymentRequest(BaseModel):
         return v
 
 
+class BulkPaymentRow(PaymentRequest):
+    """A row of a bulk billing run: checkout fields, no Turnstile (admin API key instead)"""
+    turnstile_token: Optional[str] = Field(None, exclude=True)
+
+
 class PaymentResponse(BaseModel):
     success: bool
     payment_id: Optional[str] = None
@@ -0,0 +1,195 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+import logging
+import stripe
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from app.config import settings
+from app.middleware.security import APIKeyAuth
+from app.services.admission import admission_controller
+from app.services.bulk_service import BulkRun, parse_rows
+from app.services.circuit_breaker import DependencyUnavailableError, circuit_breakers
+from app.services.export_service import EXPORTS, MEDIA_TYPES, open_export
+from app.services.ledger import ledger
+from app.services.loop_monitor import loop_monitor
+from app.services.portal_cache import portal_cache
+from app.services.profiling import profile_store
+from app.services.rate_limits import rate_limiter
+from app.services.runtime_config import runtime_config
+from app.services.shutdown import shutdown_coordinator
+from app.services.stripe_limiter import stripe_limiter
+from app.services.stripe_service import customer_cache
+from app.services.turnstile_service import token_cache
+from app.services.webhook_service import webhook_service
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(APIKeyAuth())])
+logger = logging.getLogger(__name__)
+
+
+@router.get("/circuit-breakers")
+async def get_circuit_breakers() -> Dict[str, Any]:
+    """Current state of every outbound dependency circuit breaker"""
+    return {name: breaker.snapshot() for name, breaker in circuit_breakers.items()}
+
+
+@router.get("/admission")
+async def get_admission_stats() -> Dict[str, Any]:
+    """In-flight requests, current load and requests shed per reason and priority"""
+    return admission_controller.stats()
+
+
+@router.get("/config")
+async def get_runtime_config() -> Dict[str, Any]:
+    """Runtime config version in this worker, reload counts and the fields a reload applies"""
+    return runtime_config.stats()
+
+
+@router.get("/rate-limits")
+async def get_rate_limits() -> Dict[str, Any]:
+    """Compiled rate-limit buckets, the routes spending them and rejections per bucket"""
+    return rate_limiter.stats()
+
+
+@router.get("/shutdown")
+async def get_shutdown_stats() -> Dict[str, Any]:
+    """In-flight requests and background tasks a shutdown would wait for"""
+    return shutdown_coordinator.stats()
+
+
+@router.get("/stripe-limiter")
+async def get_stripe_limiter() -> Dict[str, Any]:
+    """Outbound Stripe limiter usage and queue-wait latency per priority"""
+    return stripe_limiter.snapshot()
+
+
+@router.get("/webhooks")
+async def get_webhook_stats() -> Dict[str, Any]:
+    """Webhook ingestion counters, queue depth and customer cache usage"""
+    return {**webhook_service.stats(), "customer_cache": customer_cache.stats()}
+
+
+@router.get("/portal-cache")
+async def get_portal_cache_stats() -> Dict[str, Any]:
+    """Customer portal session reuse: hit rate, coalesced requests and Stripe time saved"""
+    return portal_cache.stats()
+
+
+@router.get("/turnstile")
+async def get_turnstile_stats() -> Dict[str, Any]:
+    """Turnstile token cache usage and tokens answered without a siteverify call"""
+    return token_cache.stats()
+
+
+@router.get("/event-loop")
+async def get_event_loop_stats(top: int = 10) -> Dict[str, Any]:
+    """Event loop lag percentiles and the call sites that blocked it, with stacks"""
+    return loop_monitor.stats(top=top)
+
+
+@router.get("/ledger")
+async def query_ledger(
+    email: Optional[str] = None,
+    stripe_id: Optional[str] = None,
+    hours: float = 24,
+    status: Optional[str] = None,
+    limit: int = 100,
+) -> Dict[str, Any]:
+    """Local payment records by email, by Stripe id, or the most recent ones"""
+    limit = max(1, min(limit, 1000))
+    if stripe_id:
+        payments = ledger.by_stripe_id(stripe_id)
+    elif email:
+        payments = ledger.by_email(email, limit)
+    else:
+        payments = ledger.since(time.time() - hours * 3600, status, limit)
+    return {"payments": payments, "ledger": ledger.stats()}
+
+
+@router.get("/ledger/paid")
+async def ledger_has_paid(email: str, amount: Optional[int] = None, currency: Optional[str] = None) -> Dict[str, Any]:
+    """Whether an email has a succeeded payment (confirmed by webhook)"""
+    return {"email": email, "paid": ledger.has_paid(email, amount, currency)}
+
+
+@router.get("/export/{kind}")
+async def export(
+    kind: str,
+    format: str = "csv",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> StreamingResponse:
+    """Stream payments or subscriptions from Stripe as CSV or NDJSON (newest first)"""
+    if kind not in EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export, use one of: {', '.join(EXPORTS)}")
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    created = {}
+    if since is not None:
+        created["gte"] = int(since.timestamp())
+    if until is not None:
+        created["lt"] = int(until.timestamp())
+
+    try:
+        chunks = await open_export(kind, format, created)
+    except DependencyUnavailableError as e:
+        raise HTTPException(status_code=503, detail="Stripe unavailable, try again later",
+                            headers={"Retry-After": str(e.retry_after)})
+    except stripe.error.StripeError as e:
+        logger.error(f"{kind} export failed: {e}")
+        raise HTTPException(status_code=502, detail="Stripe request failed")
+
+    filename = f"{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{format}"
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@router.post("/payments/bulk")
+async def bulk_payments(request: Request, notify: bool = True, concurrency: Optional[int] = None) -> StreamingResponse:
+    """Create payments/subscriptions for many customers, streaming one NDJSON result per row
+
+    Body: JSON array of rows (name, email, phone, amount, currency, payment_type, language)
+    or a CSV file with those columns and Content-Type: text/csv.
+    """
+    try:
+        rows = parse_rows(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not rows:
+        raise HTTPException(status_code=400, detail="No rows")
+    if len(rows) > settings.bulk_max_rows:
+        raise HTTPException(status_code=413, detail=f"At most {settings.bulk_max_rows} rows per run")
+
+    run = BulkRun(rows, concurrency=min(concurrency or settings.bulk_concurrency, settings.bulk_concurrency),
+                  notify=notify)
+    run.start()
+    return StreamingResponse(run.stream(), media_type="application/x-ndjson",
+                             headers={"X-Bulk-Batch-Id": run.batch_id})
+
+
+@router.get("/profiles")
+async def list_profiles() -> Dict[str, Any]:
+    """Saved request profiles, newest first"""
+    return {"profiles": profile_store.list()}
+
+
+@router.get("/profiles/{name}")
+async def download_profile(name: str) -> FileResponse:
+    """Raw cProfile dump, readable with pstats or snakeviz"""
+    path = profile_store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
+
+
+@router.get("/profiles/{name}/summary", response_class=PlainTextResponse)
+async def profile_summary(name: str, limit: int = 40, sort: str = "cumulative") -> str:
+    """Top functions of a profile as pstats text"""
+    if sort not in ("cumulative", "tottime", "ncalls"):
+        raise HTTPException(status_code=400, detail="sort must be cumulative, tottime or ncalls")
+    summary = profile_store.summary(name, limit, sort)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return summary
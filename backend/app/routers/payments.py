@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+import stripe
 from fastapi.security import HTTPAuthorizationCredentials
+import hashlib
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from app.models.payment import (
     PaymentRequest, 
@@ -11,10 +13,17 @@ from app.models.payment import (
     PaymentType
 )
 from app.services.stripe_service import StripeService
+from app.services.circuit_breaker import Deadline, DependencyUnavailableError
 from app.services.email_factory import get_email_service
 from app.services.turnstile_service import TurnstileService
+from app.services.webhook_service import webhook_service, QUEUE_FULL, DUPLICATE
+from app.services.ledger import ledger, ATTEMPTED, CREATED, FAILED
 from app.utils.logging import log_payment_attempt, log_error
+from app.utils.responses import ModelResponse, static_json_body
 from app.middleware.api_auth import SecureAPIAuth
+from app.middleware.security import enforce_email_rate_limit
+from app.services.runtime_config import ConfigSnapshot, runtime_config
+from app.config import Settings, settings
 import uuid
 
 router = APIRouter(prefix="/payments", tags=["payments"])
@@ -22,18 +31,44 @@ api_auth = SecureAPIAuth()
 logger = logging.getLogger(__name__)
 
 
-def get_stripe_service() -> StripeService:
+# async so FastAPI calls them on the loop instead of a threadpool hop each
+async def get_stripe_service() -> StripeService:
     return StripeService()
 
 
-def get_email_service_instance():
+async def get_email_service_instance():
     return get_email_service()
 
 
-def get_turnstile_service() -> TurnstileService:
+async def get_turnstile_service() -> TurnstileService:
     return TurnstileService()
 
 
+def dependency_unavailable(error: DependencyUnavailableError) -> HTTPException:
+    """Fast 503 for open circuits and exhausted latency budgets"""
+    logger.warning(f"Dependency unavailable ({error.dependency}): {error}")
+    return HTTPException(
+        status_code=503,
+        detail="Service temporarily unavailable. Try again later.",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def payment_key(session_key: Optional[str], payment_request: PaymentRequest) -> str:
+    """Ledger id and Stripe idempotency key of a checkout
+
+    The same payload resubmitted in the same session (a client retry, a
+    double click) maps to the same payment, so Stripe returns the objects
+    the first attempt created. The Turnstile token is left out: a retry
+    may carry a fresh one.
+    """
+    if not session_key:
+        return uuid.uuid4().hex
+    digest = hashlib.blake2b(session_key.encode(), digest_size=16)
+    digest.update(payment_request.model_dump_json(exclude={"turnstile_token"}).encode())
+    return digest.hexdigest()
+
+
 @router.post("/create", response_model=PaymentResponse)
 async def create_payment(
     payment_request: PaymentRequest,
@@ -41,10 +76,13 @@ async def create_payment(
     stripe_service: StripeService = Depends(get_stripe_service),
     email_service = Depends(get_email_service_instance),
     turnstile_service: TurnstileService = Depends(get_turnstile_service)
-) -> PaymentResponse:
+) -> Response:
     """Create a payment (one-time or subscription)"""
     
-    request_id = str(uuid.uuid4())[:8]
+    # Full key names the ledger row; the 8-char prefix only tags log lines
+    payment_id = payment_key(request.headers.get("X-Session-Key"), payment_request)
+    request_id = payment_id[:8]
+    deadline = Deadline(settings.payment_request_deadline)
     
     try:
         # Validate session key from frontend
@@ -59,15 +97,20 @@ async def create_payment(
         if not session_service.validate_session_key(session_key, client_ip, user_agent):
             raise HTTPException(status_code=401, detail="Invalid or expired session")
         
+        enforce_email_rate_limit(request, payment_request.email)
+        
         sanitized_email = payment_request.email.replace('\n', '').replace('\r', '')[:50]
         logger.info(f"[{request_id}] Processing payment request for {sanitized_email}")
         
         # Verify Turnstile token first
         client_ip = request.client.host if request.client else None
-        turnstile_result = await turnstile_service.verify_token(
-            payment_request.turnstile_token, 
-            client_ip
-        )
+        with deadline.stage("turnstile", settings.turnstile_timeout) as timeout:
+            turnstile_result = await turnstile_service.verify_token(
+                payment_request.turnstile_token, 
+                client_ip,
+                timeout=timeout,
+                session_key=session_key
+            )
         
         if not turnstile_result["success"]:
             logger.warning(f"[{request_id}] Turnstile verification failed: {turnstile_result.get('error')}")
@@ -76,67 +119,92 @@ async def create_payment(
         logger.info(f"[{request_id}] Turnstile verification successful")
         log_payment_attempt(request_id, payment_request.email, payment_request.amount, payment_request.currency.value, False)
         
+        def record(status: str, **ids):
+            ledger.record(payment_id, payment_request.email, payment_request.payment_type.value,
+                          payment_request.amount, payment_request.currency.value, status, **ids)
+        
+        record(ATTEMPTED)
+        
         # Create or get customer
-        customer_result = await stripe_service.create_customer(
-            name=payment_request.name,
-            email=payment_request.email,
-            phone=payment_request.phone
-        )
+        with deadline.stage("customer", settings.stripe_timeout) as timeout:
+            customer_result = await stripe_service.create_customer(
+                name=payment_request.name,
+                email=payment_request.email,
+                phone=payment_request.phone,
+                timeout=timeout,
+                idempotency_key=payment_id
+            )
         
         if not customer_result["success"]:
+            record(FAILED, error=customer_result["error"])
             raise HTTPException(status_code=400, detail=customer_result["error"])
         
         customer = customer_result["customer"]
         
         # Create payment based on type
         if payment_request.payment_type == PaymentType.ONE_TIME:
-            payment_result = await stripe_service.create_payment_intent(
-                payment_request, customer.id
-            )
+            with deadline.stage("payment", settings.stripe_timeout) as timeout:
+                payment_result = await stripe_service.create_payment_intent(
+                    payment_request, customer.id,
+                    timeout=timeout,
+                    idempotency_key=payment_id
+                )
             
             if payment_result["success"]:
-                # Send confirmation emails
-                await email_service.send_payment_confirmation(
-                    payment_request, 
-                    payment_result["payment_intent"].id, 
-                    True
-                )
+                record(CREATED, customer_id=customer.id, stripe_id=payment_result["payment_intent"].id)
+                
+                # Without webhooks, confirm at creation (webhooks confirm on success)
+                if not webhook_service.enabled:
+                    with deadline.stage("email"):
+                        await email_service.send_payment_confirmation(
+                            payment_request, 
+                            payment_result["payment_intent"].id, 
+                            True
+                        )
                 
                 log_payment_attempt(request_id, payment_request.email, payment_request.amount, payment_request.currency.value, True)
                 logger.info(f"[{request_id}] Payment successful: {payment_result['payment_intent'].id}")
                 
-                return PaymentResponse(
+                return ModelResponse(PaymentResponse(
                     success=True,
                     payment_id=payment_result["payment_intent"].id,
                     client_secret=payment_result["client_secret"],
                     customer_id=customer.id,
                     message="Payment intent created successfully"
-                )
+                ), headers={"Server-Timing": deadline.server_timing()})
         
         else:  # Monthly or Yearly subscription
-            subscription_result = await stripe_service.create_subscription(
-                payment_request, customer.id
-            )
+            with deadline.stage("payment", settings.stripe_timeout) as timeout:
+                subscription_result = await stripe_service.create_subscription(
+                    payment_request, customer.id,
+                    timeout=timeout,
+                    idempotency_key=payment_id
+                )
             
             if subscription_result["success"]:
-                # Send confirmation emails
-                await email_service.send_payment_confirmation(
-                    payment_request, 
-                    subscription_result["subscription"].id, 
-                    True
-                )
+                record(CREATED, customer_id=customer.id, stripe_id=subscription_result["subscription"].id)
+                
+                # Without webhooks, confirm at creation (webhooks confirm on success)
+                if not webhook_service.enabled:
+                    with deadline.stage("email"):
+                        await email_service.send_payment_confirmation(
+                            payment_request, 
+                            subscription_result["subscription"].id, 
+                            True
+                        )
                 
-                return PaymentResponse(
+                return ModelResponse(PaymentResponse(
                     success=True,
                     payment_id=subscription_result["subscription"].id,
                     client_secret=subscription_result["client_secret"],
                     customer_id=customer.id,
                     subscription_id=subscription_result["subscription"].id,
                     message="Subscription created successfully"
-                )
+                ), headers={"Server-Timing": deadline.server_timing()})
         
         # If we get here, something went wrong
         error_msg = payment_result.get("error") if payment_request.payment_type == PaymentType.ONE_TIME else subscription_result.get("error")
+        record(FAILED, customer_id=customer.id, error=error_msg)
         
         # Send failure email
         await email_service.send_payment_confirmation(
@@ -149,6 +217,8 @@ async def create_payment(
         
     except HTTPException:
         raise
+    except DependencyUnavailableError as e:
+        raise dependency_unavailable(e)
     except Exception as e:
         sanitized_email = payment_request.email.replace('\n', '').replace('\r', '')[:50]
         log_error(request_id, e, f"Payment creation for {sanitized_email}")
@@ -168,7 +238,7 @@ async def create_customer_portal(
     portal_request: CustomerPortalRequest,
     request: Request,
     stripe_service: StripeService = Depends(get_stripe_service)
-) -> CustomerPortalResponse:
+) -> Response:
     """Create customer portal session for subscription management"""
     
     try:
@@ -188,43 +258,102 @@ async def create_customer_portal(
         
         portal_result = await stripe_service.create_customer_portal_session(
             portal_request.customer_id,
-            portal_request.return_url
+            portal_request.return_url,
+            timeout=settings.stripe_timeout
         )
         
         if portal_result["success"]:
-            return CustomerPortalResponse(
+            return ModelResponse(CustomerPortalResponse(
                 success=True,
                 portal_url=portal_result["url"],
                 message="Portal session created successfully"
-            )
+            ))
         else:
             raise HTTPException(status_code=400, detail=portal_result["error"])
             
     except HTTPException:
         raise
+    except DependencyUnavailableError as e:
+        raise dependency_unavailable(e)
     except Exception as e:
         logger.error(f"Unexpected error in create_customer_portal: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/webhook")
+async def stripe_webhook(request: Request) -> Dict[str, Any]:
+    """Verify and enqueue a Stripe webhook event, processing happens in the background"""
+    if not webhook_service.enabled:
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    payload = await request.body()
+    signature = request.headers.get("Stripe-Signature", "")
+    
+    try:
+        event = webhook_service.verify(payload, signature)
+    except (stripe.error.SignatureVerificationError, ValueError) as e:
+        logger.warning(f"Rejected webhook: {e}")
+        raise HTTPException(status_code=400, detail="Invalid signature")
+    
+    result = webhook_service.enqueue(event)
+    if result == QUEUE_FULL:
+        # Stripe retries non-2xx deliveries with backoff
+        raise HTTPException(status_code=503, detail="Busy, retry later", headers={"Retry-After": "5"})
+    
+    return {"received": True, "duplicate": result == DUPLICATE}
+
+
+def _static_config(config: Settings) -> Dict[str, Any]:
+    return {
+        "publishable_key": config.stripe_publishable_key,
+        "supported_currencies": ["brl", "usd"],
+        "supported_payment_types": ["one_time", "monthly", "yearly"]
+    }
+
+
+def _serialize_config(snapshot: ConfigSnapshot):
+    """Serialize /config once per config version (at startup and after a reload)"""
+    global CONFIG_BODY, CONFIG_ETAG, CONFIG_CACHE_CONTROL
+    CONFIG_BODY = static_json_body(_static_config(snapshot.settings))
+    CONFIG_ETAG = f'"{hashlib.sha256(CONFIG_BODY).hexdigest()[:16]}"'
+    CONFIG_CACHE_CONTROL = f"public, max-age={snapshot.settings.config_max_age}"
+
+
+_serialize_config(runtime_config.current)
+runtime_config.subscribe(_serialize_config)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
 @router.get("/config")
-async def get_stripe_config(request: Request) -> Dict[str, Any]:
-    """Get Stripe publishable key and session token for frontend"""
-    from app.config import settings
+async def get_stripe_config(request: Request) -> Response:
+    """Static Stripe config for the frontend (cacheable, no session is created)"""
+    # Validate origin first
+    if not await api_auth.validate_request(request):
+        raise HTTPException(status_code=403, detail="Unauthorized request")
+    
+    headers = {"ETag": CONFIG_ETAG, "Cache-Control": CONFIG_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match", ""), CONFIG_ETAG):
+        return Response(status_code=304, headers=headers)
+    return Response(content=CONFIG_BODY, media_type="application/json", headers=headers)
+
+
+@router.post("/session")
+async def create_checkout_session(request: Request) -> Dict[str, Any]:
+    """Mint a session key when the user starts checkout"""
     from app.services.session_service import session_service
     
-    # Validate origin first
     if not await api_auth.validate_request(request):
         raise HTTPException(status_code=403, detail="Unauthorized request")
     
-    # Generate session key for this client
     client_ip = request.client.host if request.client else "unknown"
     user_agent = request.headers.get("user-agent", "")
     session_key = session_service.generate_session_key(client_ip, user_agent)
     
     return {
-        "publishable_key": settings.stripe_publishable_key,
         "session_key": session_key,
-        "supported_currencies": ["brl", "usd"],
-        "supported_payment_types": ["one_time", "monthly", "yearly"]
-    }
\ No newline at end of file
+        "expires_at": session_service.active_sessions[session_key]["expires_at"],
+    }
@@ -0,0 +1,146 @@
+"""
+Admission Control and Load Shedding
+- Per-IP cap on in-flight requests, so one client holding slow
+  /payments/create calls open can't take every slot (429)
+- Global admission by route priority: load is the worse of in-flight
+  requests / ADMISSION_MAX_IN_FLIGHT and event-loop lag / ADMISSION_MAX_LOOP_LAG,
+  and low-priority routes are refused first as it rises (503 + Retry-After)
+- Priorities: /payments/create beats sessions, webhooks and admin calls,
+  which beat /config and /customer-portal; /health and /ready are never shed
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional
+
+from app.config import Settings
+from app.services.loop_monitor import loop_monitor
+from app.services.runtime_config import ConfigSnapshot, runtime_config
+
+logger = logging.getLogger(__name__)
+
+# Lower value is shed last
+PRIORITY_CRITICAL = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_CRITICAL: "critical",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_LOW: "low",
+}
+
+# Load (0..1+) at which each priority starts being refused
+SHED_AT = {
+    PRIORITY_CRITICAL: 1.0,
+    PRIORITY_NORMAL: 0.85,
+    PRIORITY_LOW: 0.6,
+}
+
+ROUTE_PRIORITIES: Dict[str, Optional[int]] = {
+    "/health": None,
+    "/ready": None,
+    "/api/v1/payments/create": PRIORITY_CRITICAL,
+    "/api/v1/payments/config": PRIORITY_LOW,
+    "/api/v1/payments/customer-portal": PRIORITY_LOW,
+}
+
+# Admission decisions
+ADMITTED = "admitted"
+CLIENT_LIMIT = "client_limit"
+OVERLOADED = "overloaded"
+
+
+class AdmissionController:
+    """Tracks in-flight requests per client and overall, and decides who gets in"""
+
+    def __init__(self, max_in_flight: int, max_loop_lag: float, per_client: int, retry_after: int,
+                 lag_source: Callable[[], float] = loop_monitor.recent_lag):
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.per_client = per_client
+        self.retry_after = retry_after
+        self.lag_source = lag_source
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.by_client: Dict[str, int] = defaultdict(int)
+
+        self.admitted = 0
+        self.rejected: Dict[str, int] = defaultdict(int)  # "<reason>:<priority name>" -> count
+
+    def configure(self, max_in_flight: int, max_loop_lag: float, per_client: int, retry_after: int):
+        """New limits; requests already admitted are released as usual"""
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.per_client = per_client
+        self.retry_after = retry_after
+
+    @staticmethod
+    def priority(path: str) -> Optional[int]:
+        """Route priority, or None for routes that are never shed"""
+        return ROUTE_PRIORITIES.get(path, PRIORITY_NORMAL)
+
+    def load(self) -> float:
+        lag = self.lag_source() / self.max_loop_lag if self.max_loop_lag else 0.0
+        return max(self.in_flight / self.max_in_flight, lag)
+
+    def admit(self, client: str, priority: int) -> str:
+        """ADMITTED (call release() when done), CLIENT_LIMIT or OVERLOADED"""
+        if self.by_client[client] >= self.per_client:
+            return self._reject(CLIENT_LIMIT, priority)
+        if self.load() >= SHED_AT[priority]:
+            return self._reject(OVERLOADED, priority)
+
+        self.by_client[client] += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.admitted += 1
+        return ADMITTED
+
+    def release(self, client: str):
+        self.in_flight -= 1
+        remaining = self.by_client[client] - 1
+        if remaining > 0:
+            self.by_client[client] = remaining
+        else:
+            del self.by_client[client]
+
+    def _reject(self, reason: str, priority: int) -> str:
+        key = f"{reason}:{PRIORITY_NAMES[priority]}"
+        self.rejected[key] += 1
+        if self.rejected[key] in (1, 10, 100) or self.rejected[key] % 1000 == 0:
+            logger.warning(f"Admission {reason} for {PRIORITY_NAMES[priority]} routes: "
+                           f"{self.rejected[key]} rejected, in flight {self.in_flight}")
+        return reason
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_in_flight": self.max_in_flight,
+            "clients_in_flight": len(self.by_client),
+            "loop_lag_ms": round(self.lag_source() * 1000, 2),
+            "load": round(self.load(), 3),
+            "shed_at": {PRIORITY_NAMES[p]: level for p, level in SHED_AT.items()},
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+def admission_limits(config: Settings) -> Dict[str, Any]:
+    return {
+        "max_in_flight": config.admission_max_in_flight,
+        "max_loop_lag": config.admission_max_loop_lag,
+        "per_client": config.admission_per_client,
+        "retry_after": config.admission_retry_after,
+    }
+
+
+def _reconfigure(snapshot: ConfigSnapshot):
+    admission_controller.configure(**admission_limits(snapshot.settings))
+
+
+# Global instance
+admission_controller = AdmissionController(**admission_limits(runtime_config.current.settings))
+runtime_config.subscribe(_reconfigure)
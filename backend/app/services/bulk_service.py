@@ -0,0 +1,219 @@
+"""
+Bulk Payment Creation
+- Rows come as JSON or CSV and are validated one by one: a bad row is
+  reported in the results instead of rejecting the whole run
+- A pool of workers (BULK_CONCURRENCY) resolves customers and creates
+  PaymentIntents or subscriptions at background priority in the Stripe
+  limiter, so live checkouts keep precedence during a billing run
+- Results are streamed as NDJSON in completion order, then a summary line
+- Notifications are batched: one summary email to the admins per run;
+  customers are emailed by the webhook flow when they pay
+- A run finishes (and sends its summary) even if the client disconnects
+"""
+
+import asyncio
+import csv
+import html
+import io
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.config import settings
+from app.models.payment import BulkPaymentRow, PaymentType
+from app.services.circuit_breaker import DependencyUnavailableError
+from app.services.email_factory import get_email_service
+from app.services.ledger import ATTEMPTED, CREATED, FAILED, ledger
+from app.services.stripe_limiter import PRIORITY_BACKGROUND
+from app.services.runtime_config import runtime_config
+from app.services.shutdown import shutdown_coordinator
+from app.services.stripe_service import StripeService
+
+logger = logging.getLogger(__name__)
+
+# (row index, validated row or None, validation error or None)
+ParsedRow = Tuple[int, Optional[BulkPaymentRow], Optional[str]]
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors())
+
+
+def _validate(index: int, fields: Dict[str, Any]) -> ParsedRow:
+    try:
+        return index, BulkPaymentRow.model_validate(fields), None
+    except ValidationError as e:
+        return index, None, _validation_message(e)
+
+
+def parse_rows(body: bytes, content_type: str) -> List[ParsedRow]:
+    """Rows from a JSON array ({"rows": [...]} also accepted) or a CSV with a header line
+
+    Raises ValueError when the body as a whole can't be read.
+    """
+    if "csv" in content_type:
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        except UnicodeDecodeError:
+            raise ValueError("CSV must be UTF-8")
+        # Empty cells mean "not given", so optional fields get their defaults
+        return [
+            _validate(index, {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()})
+            for index, row in enumerate(reader)
+        ]
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise ValueError("Body must be a JSON array of rows or a CSV file (Content-Type: text/csv)")
+    if isinstance(payload, dict):
+        payload = payload.get("rows")
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON array of rows")
+    return [
+        _validate(index, fields) if isinstance(fields, dict) else (index, None, "row: must be an object")
+        for index, fields in enumerate(payload)
+    ]
+
+
+class BulkRun:
+    """One bulk run: a worker pool feeding a results queue"""
+
+    def __init__(self, rows: List[ParsedRow], concurrency: int, notify: bool = True,
+                 stripe_service: Optional[StripeService] = None):
+        # Full uuid keys the ledger rows; the 8-char batch id is for logs, emails and headers
+        self.run_id = uuid.uuid4().hex
+        self.batch_id = self.run_id[:8]
+        self.rows = rows
+        self.concurrency = max(1, concurrency)
+        self.notify = notify
+        self.stripe_service = stripe_service or StripeService()
+        self.results: asyncio.Queue = asyncio.Queue()
+        self.created: List[Dict[str, Any]] = []
+        self.failed: List[Dict[str, Any]] = []
+
+    async def _create(self, index: int, row: BulkPaymentRow) -> Dict[str, Any]:
+        request_id = f"bulk-{self.batch_id}-{index}"
+        ledger_id = f"bulk-{self.run_id}-{index}"
+
+        def record(status: str, **ids):
+            ledger.record(ledger_id, row.email, row.payment_type.value, row.amount, row.currency.value, status, **ids)
+
+        result: Dict[str, Any] = {"row": index, "email": row.email, "success": False}
+        record(ATTEMPTED)
+        try:
+            customer_result = await self.stripe_service.create_customer(
+                name=row.name, email=row.email, phone=row.phone, priority=PRIORITY_BACKGROUND,
+                idempotency_key=ledger_id
+            )
+            if not customer_result["success"]:
+                record(FAILED, error=customer_result["error"])
+                return {**result, "error": customer_result["error"]}
+            customer = customer_result["customer"]
+            result["customer_id"] = customer.id
+
+            if row.payment_type == PaymentType.ONE_TIME:
+                created = await self.stripe_service.create_payment_intent(
+                    row, customer.id, priority=PRIORITY_BACKGROUND, idempotency_key=ledger_id
+                )
+                stripe_object = created.get("payment_intent")
+            else:
+                created = await self.stripe_service.create_subscription(
+                    row, customer.id, priority=PRIORITY_BACKGROUND, idempotency_key=ledger_id
+                )
+                stripe_object = created.get("subscription")
+                if created["success"]:
+                    result["subscription_id"] = stripe_object.id
+
+            if not created["success"]:
+                record(FAILED, customer_id=customer.id, error=created["error"])
+                return {**result, "error": created["error"]}
+
+            record(CREATED, customer_id=customer.id, stripe_id=stripe_object.id)
+            return {**result, "success": True, "payment_id": stripe_object.id, "client_secret": created["client_secret"]}
+
+        except DependencyUnavailableError as e:
+            error = f"{e.dependency} unavailable, retry later"
+            record(FAILED, customer_id=result.get("customer_id"), error=error)
+            return {**result, "error": error}
+        except Exception as e:
+            logger.error(f"[{request_id}] Bulk row failed: {e}")
+            record(FAILED, customer_id=result.get("customer_id"), error=str(e))
+            return {**result, "error": "Internal error"}
+
+    async def _run(self):
+        started = time.perf_counter()
+        pending = deque()
+        for index, row, error in self.rows:
+            if row is None:
+                self._collect({"row": index, "success": False, "error": error})
+            else:
+                pending.append((index, row))
+
+        async def worker():
+            while pending:
+                index, row = pending.popleft()
+                self._collect(await self._create(index, row), row)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)))))
+
+        notified = False
+        if self.notify and (self.created or self.failed):
+            notified = await self._send_summary()
+
+        summary = {
+            "batch_id": self.batch_id,
+            "rows": len(self.rows),
+            "created": len(self.created),
+            "failed": len(self.failed),
+            "notified": notified,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info(f"Bulk run {self.batch_id}: {summary['created']} created, {summary['failed']} failed "
+                    f"in {summary['seconds']}s")
+        self.results.put_nowait({"summary": summary})
+        self.results.put_nowait(None)
+
+    def _collect(self, result: Dict[str, Any], row: Optional[BulkPaymentRow] = None):
+        (self.created if result["success"] else self.failed).append({**result, "_row": row})
+        self.results.put_nowait(result)
+
+    async def _send_summary(self) -> bool:
+        """One email listing every row, instead of one email per row"""
+        lines = []
+        for result in sorted(self.created + self.failed, key=lambda item: item["row"]):
+            row = result["_row"]
+            amount = f"{row.amount / 100:.2f} {row.currency.value.upper()} ({row.payment_type.value})" if row else ""
+            outcome = result.get("payment_id") if result["success"] else f"Erro: {result.get('error')}"
+            lines.append(
+                f"<tr><td>{result['row'] + 1}</td><td>{html.escape(row.name if row else '')}</td>"
+                f"<td>{html.escape(result.get('email') or '')}</td><td>{amount}</td>"
+                f"<td>{html.escape(str(outcome))}</td></tr>"
+            )
+
+        subject = (f"Cobrança em lote {self.batch_id}: {len(self.created)} criadas, "
+                   f"{len(self.failed)} falhas - {settings.company_name}")
+        body = (f"<h2>{html.escape(subject)}</h2><table border=\"1\" cellpadding=\"4\">"
+                f"<tr><th>Linha</th><th>Nome</th><th>Email</th><th>Valor</th><th>Resultado</th></tr>"
+                f"{''.join(lines)}</table>")
+        try:
+            return bool(await get_email_service().send_email(list(runtime_config.current.notification_emails), subject, body))
+        except Exception as e:
+            logger.error(f"Bulk run {self.batch_id}: summary email failed: {e}")
+            return False
+
+    def start(self):
+        # Tracked: a run whose client went away still finishes, and shutdown waits for it
+        shutdown_coordinator.track(asyncio.create_task(self._run()), f"bulk run {self.batch_id}")
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """NDJSON lines as rows complete, ending with the summary"""
+        while True:
+            result = await self.results.get()
+            if result is None:
+                return
+            yield (json.dumps(result, separators=(",", ":")) + "\n").encode()
@@ -0,0 +1,276 @@
+"""
+Outbound HTTP Record/Replay Cassettes
+- Recorded at the transport level: a requests adapter for the Stripe and
+  Mailtrap sessions and an httpx transport for Turnstile, so the SDKs
+  still encode requests and parse responses as they do in production
+- Requests match on method + path + sorted query, then on method + path
+  alone (e.g. a customer lookup for an email never recorded). Hosts are
+  not matched, so a recording made against the stand-ins (random ports)
+  replays wherever the base URLs point; bodies are not matched since they
+  carry per-request ids. Repeated requests get the recorded responses in
+  order, then start over
+- Replay waits the recorded latency (times HTTP_CASSETTE_LATENCY_SCALE),
+  or HTTP_CASSETTE_LATENCY seconds when set, so offline benchmarks keep
+  the I/O shape of the recording; a request with nothing recorded fails
+  like an unreachable host
+- File: header + fixed-width index (keys, status, latency, sizes) + one
+  data block of labels, headers and bodies, written atomically
+- Recordings are saved when the HTTP clients close; record with one worker
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from http.client import responses as REASONS
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+MODES = (MODE_RECORD, MODE_REPLAY)
+
+HEADER = struct.Struct("<4sIdI")  # magic, version, recorded at, exchange count
+ENTRY = struct.Struct("<16s16sHfIII")  # exact key, route key, status, latency, label/headers/body sizes
+MAGIC = b"EZYR"  # EZYC is the shared counter table, EZYS the state snapshot
+VERSION = 1
+
+# Bodies are stored decoded, and replayed responses are framed by the client
+SKIPPED_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"})
+
+Headers = Tuple[Tuple[str, str], ...]
+
+
+class Exchange(NamedTuple):
+    label: str  # "POST https://api.stripe.com/v1/customers"
+    status: int
+    headers: Headers
+    body: bytes
+    latency: float  # seconds the real call took
+
+
+def _digest(value: str) -> bytes:
+    return hashlib.blake2b(value.encode(), digest_size=16).digest()
+
+
+def request_keys(method: str, url: str) -> Tuple[bytes, bytes]:
+    """(exact key, route key) for a request, host left out"""
+    parts = urlsplit(url)
+    route = f"{method.upper()} {parts.path}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return _digest(f"{route}?{query}"), _digest(route)
+
+
+def _pack_headers(headers: Headers) -> bytes:
+    return "\r\n".join(f"{name}: {value}" for name, value in headers).encode("latin-1")
+
+
+def _unpack_headers(data: bytes) -> Headers:
+    if not data:
+        return ()
+    return tuple(tuple(line.split(": ", 1)) for line in data.decode("latin-1").split("\r\n"))
+
+
+def _kept_headers(items) -> Headers:
+    return tuple((name, value) for name, value in items if name.lower() not in SKIPPED_HEADERS)
+
+
+def read_cassette(path: Path) -> List[Tuple[bytes, bytes, Exchange]]:
+    """(exact key, route key, exchange) for every recorded exchange; ValueError if the file isn't a cassette"""
+    data = memoryview(path.read_bytes())
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a cassette (truncated)")
+    magic, version, _, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} cassette")
+
+    exchanges = []
+    offset = HEADER.size + count * ENTRY.size
+    for exact, route, status, latency, label_size, headers_size, body_size in ENTRY.iter_unpack(
+            data[HEADER.size:HEADER.size + count * ENTRY.size]):
+        label = bytes(data[offset:offset + label_size]).decode()
+        offset += label_size
+        headers = _unpack_headers(bytes(data[offset:offset + headers_size]))
+        offset += headers_size
+        body = bytes(data[offset:offset + body_size])
+        offset += body_size
+        exchanges.append((exact, route, Exchange(label, status, headers, body, latency)))
+    if offset != len(data):
+        raise ValueError(f"{path} is not a cassette (size mismatch)")
+    return exchanges
+
+
+def write_cassette(path: Path, exchanges: List[Tuple[bytes, bytes, Exchange]]):
+    """Write atomically: temp file, then rename over the old cassette"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    index, blocks = [], []
+    for exact, route, exchange in exchanges:
+        label, headers = exchange.label.encode(), _pack_headers(exchange.headers)
+        index.append(ENTRY.pack(exact, route, exchange.status, exchange.latency,
+                                len(label), len(headers), len(exchange.body)))
+        blocks += [label, headers, exchange.body]
+
+    with open(tmp_path, "wb") as cassette:
+        cassette.write(HEADER.pack(MAGIC, VERSION, time.time(), len(exchanges)))
+        cassette.write(b"".join(index))
+        cassette.write(b"".join(blocks))
+    os.replace(tmp_path, path)
+
+
+class Cassette:
+    """Recorded exchanges, indexed by request key; shared by the SDK threads and the event loop"""
+
+    def __init__(self, path: str, mode: str, latency: Optional[float] = None, latency_scale: float = 1.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {', '.join(MODES)}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+
+        self._lock = threading.Lock()
+        self.recorded: List[Tuple[bytes, bytes, Exchange]] = []
+        self.exact: Dict[bytes, List[Exchange]] = defaultdict(list)
+        self.routes: Dict[bytes, List[Exchange]] = defaultdict(list)
+        self._played: Dict[bytes, int] = defaultdict(int)
+
+        self.replayed = 0
+        self.misses = 0
+        if mode == MODE_REPLAY:
+            for exact, route, exchange in read_cassette(self.path):
+                self.exact[exact].append(exchange)
+                self.routes[route].append(exchange)
+            logger.info(f"Replaying {sum(len(e) for e in self.exact.values())} HTTP exchanges from {self.path}")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == MODE_REPLAY
+
+    def find(self, method: str, url: str) -> Optional[Exchange]:
+        """Next recorded exchange for the request, cycling through repeats"""
+        exact, route = request_keys(method, url)
+        with self._lock:
+            key, recorded = (exact, self.exact.get(exact)) if exact in self.exact else (route, self.routes.get(route))
+            if not recorded:
+                self.misses += 1
+                return None
+            played = self._played[key]
+            self._played[key] = played + 1
+            self.replayed += 1
+            return recorded[played % len(recorded)]
+
+    def delay(self, exchange: Exchange) -> float:
+        return self.latency if self.latency is not None else exchange.latency * self.latency_scale
+
+    def record(self, method: str, url: str, status: int, headers: Headers, body: bytes, latency: float):
+        exact, route = request_keys(method, url)
+        exchange = Exchange(f"{method.upper()} {url.split('?')[0]}", status, _kept_headers(headers), body, latency)
+        with self._lock:
+            self.recorded.append((exact, route, exchange))
+
+    def save(self):
+        """Write what was recorded (no-op when replaying)"""
+        if self.mode != MODE_RECORD:
+            return
+        with self._lock:
+            exchanges = list(self.recorded)
+        write_cassette(self.path, exchanges)
+        logger.info(f"Recorded {len(exchanges)} HTTP exchanges to {self.path}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "mode": self.mode,
+            "recorded": len(self.recorded),
+            "replayed": self.replayed,
+            "misses": self.misses,
+        }
+
+
+class CassetteAdapter(HTTPAdapter):
+    """requests transport adapter that records to or replays from a cassette"""
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.cassette.replaying:
+            exchange = self.cassette.find(request.method, request.url)
+            if exchange is None:
+                raise requests.exceptions.ConnectionError(
+                    f"No recorded exchange for {request.method} {request.url}", request=request)
+            time.sleep(self.cassette.delay(exchange))
+            return self._replayed_response(request, exchange)
+
+        started = time.perf_counter()
+        response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        body = response.content
+        self.cassette.record(request.method, request.url, response.status_code, tuple(response.headers.items()),
+                             body, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def _replayed_response(request, exchange: Exchange) -> requests.Response:
+        response = requests.Response()
+        response.status_code = exchange.status
+        response.reason = REASONS.get(exchange.status, "")
+        response.headers = CaseInsensitiveDict(exchange.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = exchange.body
+        response.url = request.url
+        response.request = request
+        return response
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records to or replays from a cassette, wrapping the real transport"""
+
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if self.cassette.replaying:
+            exchange = self.cassette.find(request.method, url)
+            if exchange is None:
+                raise httpx.ConnectError(f"No recorded exchange for {request.method} {url}", request=request)
+            await asyncio.sleep(self.cassette.delay(exchange))
+            return httpx.Response(exchange.status, headers=list(exchange.headers), content=exchange.body,
+                                  request=request)
+
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        body = await response.aread()
+        headers = _kept_headers(response.headers.items())
+        self.cassette.record(request.method, url, response.status_code, headers, body, time.perf_counter() - started)
+        return httpx.Response(response.status_code, headers=list(headers), content=body, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+# Global instance, only when HTTP_CASSETTE_MODE is set
+http_cassette: Optional[Cassette] = (
+    Cassette(settings.http_cassette_path, settings.http_cassette_mode,
+             settings.http_cassette_latency, settings.http_cassette_latency_scale)
+    if settings.http_cassette_mode else None
+)
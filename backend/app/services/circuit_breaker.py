@@ -0,0 +1,223 @@
+"""
+Circuit Breakers and Latency Budgets for Outbound Dependencies
+- One breaker per dependency (Stripe, Turnstile, Mailtrap, SMTP)
+- Rolling error-rate and slow-call windows open the circuit
+- Open circuits fail fast instead of waiting for timeouts
+- Deadline splits a per-request budget across stages
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+import stripe
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class DependencyUnavailableError(Exception):
+    """Outbound dependency cannot be used right now, retry later"""
+
+    def __init__(self, dependency: str, retry_after: int, message: str):
+        super().__init__(message)
+        self.dependency = dependency
+        self.retry_after = max(1, int(retry_after))
+
+
+class CircuitOpenError(DependencyUnavailableError):
+    """Circuit is open, the call was rejected without being attempted"""
+
+
+class DependencyTimeoutError(DependencyUnavailableError):
+    """Call did not finish within its stage timeout"""
+
+
+class DeadlineExceededError(DependencyUnavailableError):
+    """The request ran out of latency budget before a stage could start"""
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one outbound dependency"""
+
+    def __init__(self, name: str, is_failure: Optional[Callable[[BaseException], bool]] = None):
+        self.name = name
+        self.is_failure = is_failure or (lambda exc: True)
+        self.window_seconds = settings.breaker_window_seconds
+        self.min_calls = settings.breaker_min_calls
+        self.error_rate_threshold = settings.breaker_error_rate
+        self.slow_call_seconds = settings.breaker_slow_call_seconds
+        self.slow_call_rate_threshold = settings.breaker_slow_call_rate
+        self.open_seconds = settings.breaker_open_seconds
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.half_open_in_flight = False
+        self.transitions = 0
+        self.rejected = 0
+        # (timestamp, failed, latency_seconds)
+        self.calls: Deque[Tuple[float, bool, float]] = deque()
+
+    def _transition(self, new_state: str, reason: str):
+        old_state = self.state
+        self.state = new_state
+        self.transitions += 1
+        if new_state == OPEN:
+            self.opened_at = time.monotonic()
+        if new_state == CLOSED:
+            self.calls.clear()
+        logger.warning(f"Circuit {self.name}: {old_state} -> {new_state} ({reason})")
+
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        while self.calls and self.calls[0][0] < cutoff:
+            self.calls.popleft()
+
+    def retry_after(self) -> int:
+        return int(max(1.0, self.open_seconds - (time.monotonic() - self.opened_at)) + 0.999)
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not be attempted"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN, "open period elapsed")
+            else:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.retry_after(), f"{self.name} circuit is open")
+
+        if self.state == HALF_OPEN:
+            if self.half_open_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 1, f"{self.name} circuit is half-open")
+            self.half_open_in_flight = True
+
+    def record(self, failed: bool, latency: float):
+        """Record a call outcome and open or close the circuit as needed"""
+        now = time.monotonic()
+
+        if self.state == HALF_OPEN:
+            self.half_open_in_flight = False
+            slow = latency >= self.slow_call_seconds
+            if failed or slow:
+                self._transition(OPEN, "trial call failed" if failed else "trial call slow")
+            else:
+                self._transition(CLOSED, "trial call succeeded")
+            return
+
+        self.calls.append((now, failed, latency))
+        self._trim(now)
+
+        if self.state == CLOSED and len(self.calls) >= self.min_calls:
+            error_rate, slow_rate = self._rates()
+            if error_rate >= self.error_rate_threshold:
+                self._transition(OPEN, f"error rate {error_rate:.0%}")
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._transition(OPEN, f"slow call rate {slow_rate:.0%}")
+
+    def _rates(self) -> Tuple[float, float]:
+        total = len(self.calls)
+        if not total:
+            return 0.0, 0.0
+        failures = sum(1 for _, failed, _ in self.calls if failed)
+        slow = sum(1 for _, _, latency in self.calls if latency >= self.slow_call_seconds)
+        return failures / total, slow / total
+
+    async def call(self, func: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Run func() through the breaker with an optional timeout"""
+        self.before_call()
+
+        started = time.monotonic()
+        try:
+            if timeout is not None:
+                result = await asyncio.wait_for(func(), timeout=timeout)
+            else:
+                result = await func()
+        except asyncio.TimeoutError:
+            self.record(True, time.monotonic() - started)
+            raise DependencyTimeoutError(self.name, 1, f"{self.name} call timed out after {timeout:.2f}s")
+        except asyncio.CancelledError:
+            if self.state == HALF_OPEN:
+                self.half_open_in_flight = False
+            raise
+        except Exception as e:
+            self.record(self.is_failure(e), time.monotonic() - started)
+            raise
+
+        self.record(False, time.monotonic() - started)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        error_rate, slow_rate = self._rates()
+        latencies = sorted(latency for _, _, latency in self.calls)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+
+        return {
+            "state": self.state,
+            "window_calls": len(self.calls),
+            "error_rate": round(error_rate, 4),
+            "slow_call_rate": round(slow_rate, 4),
+            "p95_latency_ms": round(p95 * 1000, 2),
+            "rejected": self.rejected,
+            "transitions": self.transitions,
+            "retry_after": self.retry_after() if self.state == OPEN else 0,
+        }
+
+
+class Deadline:
+    """Per-request latency budget shared by sequential stages"""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.expires_at = self.started + budget
+        self.timings: Dict[str, float] = {}
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def timeout_for(self, stage: str, stage_budget: float) -> float:
+        """Timeout for the next stage, capped by what is left of the budget"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceededError(stage, 1, f"Request deadline exceeded before {stage}")
+        return min(stage_budget, remaining)
+
+    @contextmanager
+    def stage(self, name: str, stage_budget: Optional[float] = None) -> Iterator[Optional[float]]:
+        """Time a stage, yielding its timeout when it has a budget"""
+        timeout = self.timeout_for(name, stage_budget) if stage_budget is not None else None
+        started = time.monotonic()
+        try:
+            yield timeout
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.monotonic() - started
+
+    def server_timing(self) -> str:
+        """Stage durations formatted for a Server-Timing header"""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items())
+
+
+def _is_stripe_failure(exc: BaseException) -> bool:
+    """Only infrastructure errors count against Stripe, not card or request errors"""
+    return isinstance(exc, (stripe.error.APIConnectionError, stripe.error.APIError, stripe.error.RateLimitError))
+
+
+circuit_breakers: Dict[str, CircuitBreaker] = {
+    "stripe": CircuitBreaker("stripe", _is_stripe_failure),
+    "turnstile": CircuitBreaker("turnstile"),
+    "mailtrap": CircuitBreaker("mailtrap"),
+    "smtp": CircuitBreaker("smtp"),
+}
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    return circuit_breakers[name]
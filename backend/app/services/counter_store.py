@@ -0,0 +1,305 @@
+"""
+Fixed-window Counter Stores for Rate Limits and Session Quotas
+- One interface: hit(key, limit, window) -> HitResult
+- MemoryCounterStore: per-process dict, swept every 5 minutes
+- SharedMemoryCounterStore: memory-mapped fixed-slot hash table shared by
+  every worker on the host (no network hop), one fcntl lock per bucket
+- STATE_BACKEND selects the implementation (memory | shm)
+- Both export/import fixed-width (digest, window start, expiry, count)
+  records for snapshots
+"""
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# key digest, window start, expires at, count
+RECORD = struct.Struct("<16sddI4x")
+EMPTY_DIGEST = bytes(16)
+
+Record = Tuple[bytes, float, float, int]
+
+
+class HitResult(NamedTuple):
+    allowed: bool
+    count: int  # hits counted in the current window, including this one if allowed
+    reset_at: float  # unix time the window ends
+
+
+def key_digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+class MemoryCounterStore:
+    """Per-process fixed-window counters"""
+
+    shared = False
+
+    def __init__(self, sweep_interval: float = 300):
+        # key digest -> (digest, window_start, expires_at, count): the snapshot record
+        # itself, so a restore stores the unpacked tuples without building anything per key
+        self.counters: Dict[bytes, Record] = {}
+        self.sweep_interval = sweep_interval
+        self.last_sweep = time.time()
+
+    def hit(self, key: str, limit: int, window: float) -> HitResult:
+        now = time.time()
+        self._sweep(now)
+
+        digest = key_digest(key)
+        counter = self.counters.get(digest)
+        if counter is None or now >= counter[2]:
+            counter = (digest, now, now + window, 0)
+
+        if counter[3] >= limit:
+            return HitResult(False, counter[3], counter[2])
+        counter = self.counters[digest] = (digest, counter[1], counter[2], counter[3] + 1)
+        return HitResult(True, counter[3], counter[2])
+
+    def _sweep(self, now: float):
+        """Drop expired windows (otherwise every key ever seen stays)"""
+        if now - self.last_sweep < self.sweep_interval:
+            return
+        self.last_sweep = now
+
+        expired = [key for key, counter in self.counters.items() if now >= counter[2]]
+        for key in expired:
+            del self.counters[key]
+        if expired:
+            logger.info(f"Swept {len(expired)} expired counters")
+
+    def __contains__(self, key: str) -> bool:
+        counter = self.counters.get(key_digest(key))
+        return counter is not None and time.time() < counter[2]
+
+    def __len__(self) -> int:
+        return len(self.counters)
+
+    def records(self) -> List[Record]:
+        """Live counters, copied so they can be packed off the event loop"""
+        now = time.time()
+        return [counter for counter in self.counters.values() if counter[2] > now]
+
+    def load(self, records: Iterable[Record]) -> int:
+        """Merge records, keeping the higher count for keys already present"""
+        now = time.time()
+        if not self.counters:
+            # Startup restore: the unpacked records are stored as they are and the
+            # dict is built in C, no per-key Python objects beyond the records
+            live = [record for record in records if record[2] > now]
+            self.counters = dict(zip(map(itemgetter(0), live), live))
+            return len(self.counters)
+
+        loaded = 0
+        for record in records:
+            if record[2] <= now:
+                continue
+            current = self.counters.get(record[0])
+            if current is None or current[3] < record[3]:
+                self.counters[record[0]] = record
+                loaded += 1
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "keys": len(self.counters)}
+
+
+HEADER = struct.Struct("<4sIII")  # magic, version, slots, bucket size
+RESTORED = struct.Struct("<d")  # after HEADER: when a snapshot was loaded into this table, 0 if never
+HEADER_SIZE = 64
+MAGIC = b"EZYC"
+VERSION = 1
+
+
+class SharedMemoryCounterStore:
+    """Fixed-window counters in an mmap'd open-addressing table
+
+    Keys hash to a bucket of `bucket_size` slots. A bucket is locked with a
+    POSIX byte-range lock while it is scanned and updated, so workers only
+    contend when they touch the same bucket. A full bucket evicts the entry
+    whose window ends first, which keeps the table a fixed size.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, slots: int, bucket_size: int = 8):
+        self.path = path
+        self.bucket_size = bucket_size
+        self.buckets = max(1, slots // bucket_size)
+        self.slots = self.buckets * bucket_size
+        self.bucket_bytes = bucket_size * RECORD.size
+        self.evictions = 0
+        # POSIX locks don't exclude threads of the same process
+        self._thread_lock = threading.Lock()
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = HEADER_SIZE + self.slots * RECORD.size
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size == 0:
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, HEADER.pack(MAGIC, VERSION, self.slots, bucket_size), 0)
+            else:
+                magic, version, existing_slots, existing_bucket = HEADER.unpack(os.pread(self.fd, HEADER.size, 0))
+                if (magic, version, existing_slots, existing_bucket) != (MAGIC, VERSION, self.slots, bucket_size):
+                    raise ValueError(
+                        f"{path} holds a different table ({existing_slots} slots, version {version}); "
+                        f"remove it or match SHARED_STATE_SLOTS"
+                    )
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+        self.map = mmap.mmap(self.fd, size)
+
+    def _bucket_start(self, digest: bytes) -> int:
+        bucket = int.from_bytes(digest[:8], "little") % self.buckets
+        return HEADER_SIZE + bucket * self.bucket_bytes
+
+    def hit(self, key: str, limit: int, window: float) -> HitResult:
+        digest = key_digest(key)
+        start = self._bucket_start(digest)
+        now = time.time()
+
+        with self._thread_lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, self.bucket_bytes, start, os.SEEK_SET)
+            try:
+                offset, count, window_start, expires_at = self._find_slot(digest, start, now)
+                if count is None or now >= expires_at:
+                    count, window_start, expires_at = 0, now, now + window
+
+                allowed = count < limit
+                if allowed:
+                    count += 1
+                RECORD.pack_into(self.map, offset, digest, window_start, expires_at, count)
+                return HitResult(allowed, count, expires_at)
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, self.bucket_bytes, start, os.SEEK_SET)
+
+    def _find_slot(self, digest: bytes, start: int, now: float):
+        """Slot holding digest, else a free/expired one, else the one expiring first"""
+        free_offset = None
+        oldest_offset, oldest_expiry = start, float("inf")
+
+        for offset in range(start, start + self.bucket_bytes, RECORD.size):
+            slot_digest, window_start, expires_at, count = RECORD.unpack_from(self.map, offset)
+            if slot_digest == digest:
+                return offset, count, window_start, expires_at
+            if free_offset is None and (slot_digest == EMPTY_DIGEST or now >= expires_at):
+                free_offset = offset
+            if expires_at < oldest_expiry:
+                oldest_offset, oldest_expiry = offset, expires_at
+
+        if free_offset is None:
+            self.evictions += 1
+            free_offset = oldest_offset
+        return free_offset, None, 0.0, 0.0
+
+    def records(self) -> List[Record]:
+        """Live counters (unlocked read; a record torn by a concurrent hit is harmless here)"""
+        now = time.time()
+        table = self.map[HEADER_SIZE:HEADER_SIZE + self.slots * RECORD.size]
+        return [record for record in RECORD.iter_unpack(table) if record[0] != EMPTY_DIGEST and record[2] > now]
+
+    def load(self, records: Iterable[Record]) -> int:
+        """Restore records into the table, once per host
+
+        The table outlives workers: one recycled by max_requests (or a second
+        worker starting) finds the restored marker and loads nothing, instead
+        of writing snapshot counts over live ones. Records are grouped by
+        bucket so each bucket is locked once.
+        """
+        if self._restored_at():
+            return 0
+        now = time.time()
+        by_bucket: Dict[int, List[Record]] = defaultdict(list)
+        for record in records:
+            if record[2] > now:
+                by_bucket[self._bucket_start(record[0])].append(record)
+
+        loaded = 0
+        with self._thread_lock:
+            # The marker's byte range serializes restores across workers
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, RESTORED.size, HEADER.size, os.SEEK_SET)
+            try:
+                if self._restored_at():
+                    return 0
+                for start, bucket_records in by_bucket.items():
+                    fcntl.lockf(self.fd, fcntl.LOCK_EX, self.bucket_bytes, start, os.SEEK_SET)
+                    try:
+                        loaded += self._merge_bucket(start, bucket_records, now)
+                    finally:
+                        fcntl.lockf(self.fd, fcntl.LOCK_UN, self.bucket_bytes, start, os.SEEK_SET)
+                RESTORED.pack_into(self.map, HEADER.size, time.time())
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, RESTORED.size, HEADER.size, os.SEEK_SET)
+        return loaded
+
+    def _restored_at(self) -> float:
+        restored_at, = RESTORED.unpack_from(self.map, HEADER.size)
+        if restored_at:
+            logger.info(f"Shared counters already restored at {restored_at:.0f}, skipping snapshot")
+        return restored_at
+
+    def _merge_bucket(self, start: int, records: List[Record], now: float) -> int:
+        """Same slot choice as _find_slot, on one read and one write of the bucket (caller holds its lock)"""
+        slots = list(RECORD.iter_unpack(self.map[start:start + self.bucket_bytes]))
+        positions = {slot[0]: index for index, slot in enumerate(slots) if slot[0] != EMPTY_DIGEST}
+        # Lowest free/expired slot last, so pop() takes it first like _find_slot
+        free = [index for index, slot in enumerate(slots) if slot[0] == EMPTY_DIGEST or now >= slot[2]][::-1]
+        loaded = 0
+        for record in records:
+            index = positions.get(record[0])
+            if index is None:
+                if free:
+                    index = free.pop()
+                else:
+                    self.evictions += 1
+                    index = min(range(len(slots)), key=lambda i: slots[i][2])
+                positions.pop(slots[index][0], None)
+                positions[record[0]] = index
+            elif now < slots[index][2] and slots[index][3] >= record[3]:
+                continue
+            slots[index] = record
+            loaded += 1
+        self.map[start:start + self.bucket_bytes] = b"".join([RECORD.pack(*slot) for slot in slots])
+        return loaded
+
+    def __len__(self) -> int:
+        return len(self.records())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "shm",
+            "path": self.path,
+            "slots": self.slots,
+            "keys": len(self),
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+
+def create_counter_store():
+    if settings.state_backend == "shm":
+        logger.info(f"Using shared-memory counters at {settings.shared_state_path}")
+        return SharedMemoryCounterStore(settings.shared_state_path, settings.shared_state_slots)
+    return MemoryCounterStore()
+
+
+# Global instance
+counter_store = create_counter_store()
@@ -3,14 +3,15 @@ import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List
-from jinja2 import Template
 from email.utils import parseaddr
 import re
 import html
 
 from app.config import settings
+from app.services.circuit_breaker import get_circuit_breaker
+from app.services.runtime_config import runtime_config
 from app.models.payment import PaymentRequest, PaymentType
-from app.templates.email_templates import EMAIL_TEMPLATES, BASE_EMAIL_TEMPLATE
+from app.templates.email_templates import EMAIL_TEMPLATES, BASE_EMAIL_TEMPLATE, SMTP_ADMIN_EMAIL_TEMPLATE, get_template
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,7 @@ class EmailService:
         self.smtp_port = settings.smtp_port
         self.smtp_user = settings.smtp_user
         self.smtp_password = settings.smtp_password
+        self.breaker = get_circuit_breaker("smtp")
     
     def _validate_email(self, email: str) -> bool:
         """Validate email format and security"""
@@ -78,7 +80,10 @@ class EmailService:
                     "password": self.smtp_password,
                 })
             
-            await aiosmtplib.send(message, **smtp_kwargs)
+            await self.breaker.call(
+                lambda: aiosmtplib.send(message, **smtp_kwargs),
+                timeout=settings.email_timeout
+            )
             
             logger.info(f"[MAILPIT] Email sent successfully to: {valid_emails}")
             return True
@@ -113,7 +118,7 @@ class EmailService:
         customer_subject = customer_template["subject"].format(company_name=settings.company_name)
         
         # Render content first
-        content_html = Template(customer_template["content"]).render(
+        content_html = get_template(customer_template["content"]).render(
             name=html.escape(payment_request.name),
             amount_display=amount_display,
             payment_type_display=payment_type_display,
@@ -123,7 +128,7 @@ class EmailService:
         )
         
         # Then render full email with base template
-        customer_html = Template(BASE_EMAIL_TEMPLATE).render(
+        customer_html = get_template(BASE_EMAIL_TEMPLATE).render(
             lang=lang,
             subject=customer_subject,
             header_title="Pagamento" if lang == "pt" else "Payment",
@@ -147,35 +152,14 @@ class EmailService:
         
         # Send to admin emails
         await self.send_email(
-            settings.notification_email_list,
+            list(runtime_config.current.notification_emails),
             admin_subject,
             admin_html
         )
     
     def _render_admin_template(self, success: bool, payment_request: PaymentRequest, amount_display: str, payment_type_display: str, payment_id: str) -> str:
         """Render admin email template"""
-        template = Template("""
-        <html>
-        <body style="font-family: Arial, sans-serif;">
-            <h2>{{ 'Novo Pagamento Recebido' if success else 'Falha no Pagamento' }} - {{ company_name }}</h2>
-            
-            <div style="background: #f5f5f5; padding: 20px; border-radius: 5px;">
-                <h3>Informações do Cliente:</h3>
-                <p><strong>Nome:</strong> {{ name }}</p>
-                <p><strong>Email:</strong> {{ email }}</p>
-                {% if phone %}<p><strong>Telefone:</strong> {{ phone }}</p>{% endif %}
-                <p><strong>Idioma:</strong> {{ language }}</p>
-                
-                <h3>Detalhes do Pagamento:</h3>
-                <p><strong>Valor:</strong> {{ amount_display }}</p>
-                <p><strong>Moeda:</strong> {{ currency }}</p>
-                <p><strong>Tipo:</strong> {{ payment_type_display }}</p>
-                <p><strong>ID do Pagamento:</strong> {{ payment_id }}</p>
-                <p><strong>Status:</strong> {{ 'SUCESSO' if success else 'FALHA' }}</p>
-            </div>
-        </body>
-        </html>
-        """)
+        template = get_template(SMTP_ADMIN_EMAIL_TEMPLATE)
         
         return template.render(
             success=success,
@@ -0,0 +1,131 @@
+"""
+Streaming Payment / Subscription Export
+- Pages come from StripeService.list_pages (prefetched, background priority)
+- Each page is flattened to rows and encoded as one CSV or NDJSON chunk,
+  so only a few pages are ever held in memory
+- The first page is fetched before the response starts, so Stripe errors
+  become a normal 503 instead of a truncated file
+"""
+
+import csv
+import io
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import stripe
+
+from app.config import settings
+from app.services.stripe_service import StripeService
+
+logger = logging.getLogger(__name__)
+
+CSV = "csv"
+NDJSON = "ndjson"
+MEDIA_TYPES = {CSV: "text/csv; charset=utf-8", NDJSON: "application/x-ndjson"}
+
+
+def _timestamp(value: Optional[int]) -> Optional[str]:
+    return datetime.fromtimestamp(value, timezone.utc).isoformat() if value else None
+
+
+def payment_row(intent: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = intent.get("metadata") or {}
+    return {
+        "id": intent["id"],
+        "created": _timestamp(intent.get("created")),
+        "status": intent.get("status"),
+        "amount": intent.get("amount"),
+        "currency": intent.get("currency"),
+        "customer": intent.get("customer"),
+        "email": metadata.get("customer_email") or intent.get("receipt_email"),
+        "name": metadata.get("customer_name"),
+        "payment_type": metadata.get("payment_type"),
+        "invoice": intent.get("invoice"),
+    }
+
+
+def subscription_row(subscription: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = subscription.get("metadata") or {}
+    items = (subscription.get("items") or {}).get("data") or [{}]
+    price = items[0].get("price") or {}
+    return {
+        "id": subscription["id"],
+        "created": _timestamp(subscription.get("created")),
+        "status": subscription.get("status"),
+        "amount": price.get("unit_amount"),
+        "currency": price.get("currency"),
+        "interval": (price.get("recurring") or {}).get("interval"),
+        "customer": subscription.get("customer"),
+        "email": metadata.get("customer_email"),
+        "name": metadata.get("customer_name"),
+        "current_period_end": _timestamp(subscription.get("current_period_end")),
+        "cancel_at_period_end": subscription.get("cancel_at_period_end"),
+    }
+
+
+# kind -> (Stripe resource, extra list params, row builder)
+EXPORTS: Dict[str, tuple] = {
+    "payments": (stripe.PaymentIntent, {}, payment_row),
+    "subscriptions": (stripe.Subscription, {"status": "all"}, subscription_row),
+}
+
+
+def encode_csv(rows: List[Dict[str, Any]], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def encode_ndjson(rows: List[Dict[str, Any]], header: bool) -> bytes:
+    return "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows).encode()
+
+
+ENCODERS: Dict[str, Callable[[List[Dict[str, Any]], bool], bytes]] = {CSV: encode_csv, NDJSON: encode_ndjson}
+
+
+async def open_export(kind: str, fmt: str, created: Optional[Dict[str, int]] = None,
+                      stripe_service: Optional[StripeService] = None) -> AsyncIterator[bytes]:
+    """Fetch the first page, then return a generator of encoded chunks
+
+    Raises whatever the first Stripe call raises (open circuit, limiter
+    timeout, StripeError) so the caller can answer with an error status.
+    """
+    resource, params, to_row = EXPORTS[kind]
+    encode = ENCODERS[fmt]
+    if created:
+        params = {**params, "created": created}
+
+    pages = (stripe_service or StripeService()).list_pages(
+        resource, page_size=settings.export_page_size, prefetch=settings.export_prefetch_pages, **params
+    )
+    try:
+        first_page = await pages.__anext__()
+    except StopAsyncIteration:
+        first_page = []
+    except BaseException:
+        await pages.aclose()
+        raise
+
+    async def chunks() -> AsyncIterator[bytes]:
+        exported = 0
+        try:
+            page = first_page
+            while True:
+                if page:
+                    yield encode([to_row(obj) for obj in page], header=exported == 0)
+                    exported += len(page)
+                page = await pages.__anext__()
+        except StopAsyncIteration:
+            logger.info(f"Exported {exported} {kind} as {fmt}")
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated file
+            logger.error(f"{kind} export failed after {exported} rows: {e}")
+        finally:
+            await pages.aclose()
+
+    return chunks()
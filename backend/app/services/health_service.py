@@ -0,0 +1,160 @@
+"""
+Readiness Probe Service
+- Probes outbound dependencies on a background interval
+- Caches the last probe round so /ready never makes outbound calls
+- Only reports ready after the first fully successful round
+"""
+
+import asyncio
+import logging
+import ssl
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.config import settings
+from app.services.http_clients import mailtrap_api_base, stripe_api_base
+
+logger = logging.getLogger(__name__)
+
+
+def _url_target(url: str) -> Tuple[str, int, bool]:
+    """Turn a base URL into a (host, port, tls) probe target"""
+    parsed = urlparse(url)
+    use_tls = parsed.scheme == "https"
+    return parsed.hostname, parsed.port or (443 if use_tls else 80), use_tls
+
+
+class HealthService:
+    """Runs dependency probes in the background and caches the outcome"""
+
+    def __init__(self):
+        self.interval = settings.readiness_probe_interval
+        self.timeout = settings.readiness_probe_timeout
+        self.max_loop_lag = settings.readiness_max_loop_lag
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.ready = False
+        self.first_round_ok = False
+        self.last_round_at: Optional[float] = None
+        self._response: Dict[str, Any] = {"status": "starting", "checks": {}}
+        self._task: Optional[asyncio.Task] = None
+
+    def _targets(self) -> Dict[str, Tuple[str, int, bool]]:
+        """Outbound dependencies to probe as (host, port, tls)"""
+        targets = {
+            "stripe": _url_target(stripe_api_base()),
+            "turnstile": _url_target(settings.turnstile_verify_url),
+        }
+
+        # Email transport depends on environment (see email_factory)
+        if settings.environment == "development":
+            if settings.smtp_host:
+                targets["smtp"] = (settings.smtp_host, settings.smtp_port, False)
+        else:
+            targets["mailtrap"] = _url_target(mailtrap_api_base())
+
+        return targets
+
+    async def _probe_connection(self, host: str, port: int, use_tls: bool) -> Dict[str, Any]:
+        """Open (and close) a TCP/TLS connection to a dependency"""
+        started = time.perf_counter()
+        try:
+            ssl_context = ssl.create_default_context() if use_tls else None
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=ssl_context),
+                timeout=self.timeout
+            )
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), timeout=self.timeout)
+            except Exception:
+                pass
+
+            return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": "timeout"}
+        except Exception as e:
+            return {"ok": False, "error": type(e).__name__}
+
+    async def _probe_event_loop(self) -> Dict[str, Any]:
+        """Measure how late a short sleep is woken up by the event loop"""
+        loop = asyncio.get_running_loop()
+        delay = 0.01
+        started = loop.time()
+        await asyncio.sleep(delay)
+        lag = max(0.0, loop.time() - started - delay)
+
+        return {"ok": lag <= self.max_loop_lag, "lag_ms": round(lag * 1000, 2)}
+
+    async def run_probe_round(self) -> bool:
+        """Probe every dependency once and publish the cached result"""
+        targets = self._targets()
+        names = list(targets.keys())
+
+        outcomes = await asyncio.gather(
+            *(self._probe_connection(*targets[name]) for name in names)
+        )
+        results = dict(zip(names, outcomes))
+        results["event_loop"] = await self._probe_event_loop()
+
+        round_ok = all(result["ok"] for result in results.values())
+
+        for name, result in results.items():
+            previous = self.results.get(name)
+            if previous is not None and previous["ok"] != result["ok"]:
+                state = "recovered" if result["ok"] else "failing"
+                logger.warning(f"Readiness probe {name} is now {state}: {result}")
+
+        if round_ok and not self.first_round_ok:
+            self.first_round_ok = True
+            logger.info("First readiness probe round succeeded")
+
+        self.results = results
+        self.last_round_at = time.time()
+        self.ready = self.first_round_ok and round_ok
+
+        # Build the response once per round so /ready is a plain lookup
+        self._response = {
+            "status": "ready" if self.ready else ("degraded" if self.first_round_ok else "starting"),
+            "checked_at": self.last_round_at,
+            "checks": results,
+        }
+
+        return round_ok
+
+    async def _probe_loop(self):
+        """Background loop that refreshes the cached probe results"""
+        while True:
+            try:
+                await self.run_probe_round()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Readiness probe round failed: {e}")
+                self.ready = False
+
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background probe loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self):
+        """Stop the background probe loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_status(self) -> Tuple[bool, Dict[str, Any]]:
+        """Return the cached readiness verdict and payload"""
+        return self.ready, self._response
+
+
+# Global instance
+health_service = HealthService()
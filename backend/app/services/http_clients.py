@@ -0,0 +1,188 @@
+"""
+Shared Outbound HTTP Clients
+- One pooled client per dependency, reused across requests
+- Keeps TLS connections to Stripe, Turnstile and Mailtrap alive
+- Base URLs are overridable so local stand-ins can be used
+- Sizes the thread pool the blocking SDK calls (Stripe, Mailtrap) run in
+- Record/replay cassettes plug in at the transport (adapter) level
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+import mailtrap as mt
+import requests
+import stripe
+from mailtrap.api.sending import SendingApi
+from mailtrap.config import SENDING_HOST
+try:
+    from mailtrap.http import HttpClient  # not public API, see PooledMailtrapHttpClient
+except ImportError:
+    HttpClient = object  # construction then fails with TypeError and the stock client is used
+
+from app.config import settings
+from app.services.cassette import Cassette, CassetteAdapter, CassetteTransport, http_cassette
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 20
+
+_turnstile_client: Optional[httpx.AsyncClient] = None
+_stripe_session: Optional[requests.Session] = None
+_mailtrap_sending_api: Optional[SendingApi] = None
+_mailtrap_session: Optional[requests.Session] = None  # None when the stock client is in use
+_cassette: Optional[Cassette] = http_cassette
+
+
+def _pooled_adapter() -> requests.adapters.HTTPAdapter:
+    if _cassette is not None:
+        return CassetteAdapter(_cassette, pool_connections=1, pool_maxsize=POOL_SIZE)
+    return requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+
+
+class PooledMailtrapHttpClient(HttpClient):
+    """Mailtrap HTTP client on our pooled session that honours a full base URL (scheme included)
+
+    mailtrap's HttpClient is not public API: if the hooks overridden here
+    (_session, _url) are gone, this raises AttributeError and the stock
+    client is used instead.
+    """
+
+    def __init__(self, base_url: str, session: requests.Session, timeout: int):
+        super().__init__(host=base_url, timeout=timeout)
+        if not isinstance(getattr(self, "_session", None), requests.Session) or \
+                not callable(getattr(HttpClient, "_url", None)):
+            raise AttributeError("mailtrap HttpClient no longer has _session/_url")
+        self._session.close()
+        self._session = session
+        self._base_url = base_url.rstrip("/")
+
+    def _url(self, path: str) -> str:
+        return f"{self._base_url}/{path.lstrip('/')}"
+
+
+def _new_pooled_session() -> requests.Session:
+    session = requests.Session()
+    adapter = _pooled_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def configure_thread_pool():
+    """Replace the loop's default executor (used by asyncio.to_thread)
+
+    The default is min(32, cpus + 4) threads: 5 in a one-CPU container, fewer
+    than STRIPE_MAX_CONCURRENCY, so calls holding a limiter slot queued for a thread.
+    """
+    size = max(settings.thread_pool_size, settings.stripe_max_concurrency + 4)
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=size, thread_name_prefix="blocking"))
+
+
+def stripe_api_base() -> str:
+    return (settings.stripe_api_base or stripe.DEFAULT_API_BASE).rstrip("/")
+
+
+def mailtrap_api_base() -> str:
+    return (settings.mailtrap_api_base or f"https://{SENDING_HOST}").rstrip("/")
+
+
+def configure_stripe():
+    """Point the Stripe SDK at a shared keep-alive session"""
+    global _stripe_session
+
+    stripe.api_key = settings.stripe_secret_key
+    if settings.stripe_api_base:
+        stripe.api_base = stripe_api_base()
+
+    if _stripe_session is None:
+        _stripe_session = _new_pooled_session()
+        stripe.default_http_client = stripe.RequestsClient(
+            timeout=settings.stripe_timeout, session=_stripe_session
+        )
+
+
+def get_stripe_session() -> requests.Session:
+    configure_stripe()
+    return _stripe_session
+
+
+def get_turnstile_client() -> httpx.AsyncClient:
+    """Shared async client for Turnstile siteverify calls"""
+    global _turnstile_client
+
+    if _turnstile_client is None or _turnstile_client.is_closed:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+        )
+        if _cassette is not None:
+            transport = CassetteTransport(_cassette, transport)
+        _turnstile_client = httpx.AsyncClient(transport=transport)
+    return _turnstile_client
+
+
+def get_mailtrap_sending_api() -> SendingApi:
+    """Shared Mailtrap sending API backed by one keep-alive session"""
+    global _mailtrap_sending_api, _mailtrap_session
+
+    if _mailtrap_sending_api is None:
+        session = _new_pooled_session()
+        session.headers.update({
+            "Authorization": f"Bearer {settings.mailtrap_api_token}",
+            "Content-Type": "application/json",
+            "User-Agent": "mailtrap-python (https://github.com/railsware/mailtrap-python)",
+        })
+        try:
+            client = PooledMailtrapHttpClient(mailtrap_api_base(), session, timeout=30)
+            _mailtrap_session = session
+            _mailtrap_sending_api = SendingApi(client=client)
+        except (AttributeError, TypeError) as e:
+            session.close()
+            logger.warning(f"Pooled Mailtrap client unavailable ({e}), using the stock client "
+                           f"(no pool sizing, cassettes or MAILTRAP_API_BASE scheme)")
+            host = urlsplit(mailtrap_api_base()).netloc or SENDING_HOST
+            _mailtrap_sending_api = mt.MailtrapClient(token=settings.mailtrap_api_token, api_host=host).sending_api
+    return _mailtrap_sending_api
+
+
+def get_mailtrap_session() -> Optional[requests.Session]:
+    """The pooled session behind the sending API (None if the stock client is in use)"""
+    get_mailtrap_sending_api()
+    return _mailtrap_session
+
+
+def use_cassette(cassette: Optional[Cassette]):
+    """Record or replay outbound calls with cassette (None: real network) from the next client created on"""
+    global _cassette, _turnstile_client, _stripe_session, _mailtrap_sending_api, _mailtrap_session
+
+    _cassette = cassette
+    for session in (_stripe_session, _mailtrap_session):
+        if session is not None:
+            session.close()
+    _turnstile_client = _stripe_session = _mailtrap_sending_api = _mailtrap_session = None
+    configure_stripe()
+
+
+async def close_http_clients():
+    """Close pooled clients on shutdown, saving a recording cassette"""
+    global _turnstile_client, _stripe_session, _mailtrap_sending_api, _mailtrap_session
+
+    if _turnstile_client is not None:
+        await _turnstile_client.aclose()
+        _turnstile_client = None
+
+    if _stripe_session is not None:
+        _stripe_session.close()
+        _stripe_session = None
+
+    if _mailtrap_session is not None:
+        _mailtrap_session.close()
+        _mailtrap_session = None
+    _mailtrap_sending_api = None
+
+    if _cassette is not None:
+        await asyncio.to_thread(_cassette.save)
@@ -0,0 +1,307 @@
+"""
+Payment Ledger
+- Every payment and subscription attempt recorded locally in SQLite (WAL mode)
+- request_id, email, Stripe customer/payment ids, amount, currency, type,
+  status and timestamps; webhooks move the status forward by Stripe id
+- A webhook can beat the row it updates (another worker's batch not flushed
+  yet): its status is parked by Stripe id and applied when the row lands
+- Writes are buffered in memory and flushed in batches from a background
+  task (one transaction per batch, in a worker thread), never on the request path
+- Indexed on email, Stripe id and creation time for admin lookups and
+  "did this email pay?" checks without calling Stripe
+- Each worker has its own connections; WAL lets them write one at a time
+  while readers keep reading
+- Customer notices are claimed per Stripe id with an immediate write, so
+  only one worker on the host sends each of them
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Statuses
+ATTEMPTED = "attempted"  # passed Turnstile, Stripe not called yet
+CREATED = "created"  # payment intent / subscription created, awaiting payment
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+PAID_STATUSES = (SUCCEEDED,)
+# Set by webhooks; a late write from the request path must not move the row back
+FINAL_STATUSES = (SUCCEEDED, FAILED)
+
+# Parked webhook updates for Stripe ids no row ever claimed are dropped after this
+PARKED_STATUS_TTL = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payments (
+    request_id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    customer_id TEXT,
+    stripe_id TEXT,
+    payment_type TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payments_email ON payments (email, created_at);
+CREATE INDEX IF NOT EXISTS payments_stripe_id ON payments (stripe_id);
+CREATE INDEX IF NOT EXISTS payments_created_at ON payments (created_at);
+CREATE TABLE IF NOT EXISTS status_updates (
+    stripe_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS notices (
+    stripe_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    PRIMARY KEY (stripe_id, kind)
+);
+"""
+
+COLUMNS = ("request_id", "email", "customer_id", "stripe_id", "payment_type", "amount",
+           "currency", "status", "error", "created_at", "updated_at")
+
+# Later writes for the same request fill in ids and move the status on; ids are never
+# cleared and a final status is never replaced
+UPSERT = f"""
+INSERT INTO payments ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})
+ON CONFLICT (request_id) DO UPDATE SET
+    customer_id = COALESCE(excluded.customer_id, customer_id),
+    stripe_id = COALESCE(excluded.stripe_id, stripe_id),
+    status = CASE WHEN status IN ({", ".join(repr(status) for status in FINAL_STATUSES)})
+                  THEN status ELSE excluded.status END,
+    error = excluded.error,
+    updated_at = excluded.updated_at
+"""
+
+# Webhook updates are parked first and applied at the end of each flush, so one
+# whose row arrives in a later batch (or from another worker) still lands
+UPDATE_STATUS = """
+INSERT INTO status_updates (stripe_id, status, updated_at) VALUES (?, ?, ?)
+ON CONFLICT (stripe_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+"""
+APPLY_STATUS_UPDATES = """
+UPDATE payments SET status = updates.status, updated_at = updates.updated_at
+FROM status_updates AS updates WHERE payments.stripe_id = updates.stripe_id
+"""
+PRUNE_STATUS_UPDATES = """
+DELETE FROM status_updates WHERE stripe_id IN (SELECT stripe_id FROM payments) OR updated_at < ?
+"""
+
+CLAIM_NOTICE = "INSERT OR IGNORE INTO notices (stripe_id, kind, sent_at) VALUES (?, ?, ?)"
+
+
+class PaymentLedger:
+    """Batched SQLite ledger of payment attempts"""
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 500, max_pending: int = 10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # (statement, params) in arrival order; oldest dropped if the database stays unwritable
+        self.pending: Deque[Tuple[str, tuple]] = deque(maxlen=max_pending)
+        # Guards pending between the loop (appends) and the flush thread (drain, re-queue)
+        self._pending_lock = threading.Lock()
+        self._reader: Optional[sqlite3.Connection] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+        self.written = 0
+        self.dropped = 0
+        self.flush_failures = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints; a power loss can drop the last batches, not corrupt the file
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect()
+            self._writer.executescript(SCHEMA)
+        return self._writer
+
+    @property
+    def reader(self) -> sqlite3.Connection:
+        if self._reader is None:
+            self._reader = self._connect()
+            self._reader.executescript(SCHEMA)
+        return self._reader
+
+    # Writes (buffered)
+
+    def _enqueue(self, statement: str, params: tuple):
+        with self._pending_lock:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append((statement, params))
+        if self._wake is not None and len(self.pending) >= self.batch_size:
+            self._wake.set()
+
+    def record(self, request_id: str, email: str, payment_type: str, amount: int, currency: str, status: str,
+               customer_id: Optional[str] = None, stripe_id: Optional[str] = None, error: Optional[str] = None):
+        """Insert or update the row for request_id"""
+        now = time.time()
+        self._enqueue(UPSERT, (request_id, email.lower(), customer_id, stripe_id, payment_type, amount,
+                               currency, status, error, now, now))
+
+    def update_status(self, stripe_id: str, status: str):
+        """Move every row created for a Stripe payment intent or subscription to status
+
+        If no row has stripe_id yet, the status is applied once one does.
+        """
+        self._enqueue(UPDATE_STATUS, (stripe_id, status, time.time()))
+
+    def flush(self) -> int:
+        """Write everything pending in one transaction (blocking; run in a thread)"""
+        with self._write_lock:
+            with self._pending_lock:
+                batch = list(self.pending)
+                self.pending.clear()
+            if not batch:
+                return 0
+
+            self._writer_connection()
+            try:
+                self._writer.execute("BEGIN IMMEDIATE")
+                for statement, params in batch:
+                    self._writer.execute(statement, params)
+                self._writer.execute(APPLY_STATUS_UPDATES)
+                self._writer.execute(PRUNE_STATUS_UPDATES, (time.time() - PARKED_STATUS_TTL,))
+                self._writer.execute("COMMIT")
+            except sqlite3.Error:
+                if self._writer.in_transaction:
+                    self._writer.execute("ROLLBACK")
+                self._requeue(batch)
+                raise
+
+            self.written += len(batch)
+            return len(batch)
+
+    def claim_notice(self, stripe_id: str, kind: str) -> bool:
+        """Whether the caller is the first to send the kind notice for stripe_id (blocking; run in a thread)
+
+        Committed at once rather than buffered, so two workers handling events
+        for the same payment can't both win.
+        """
+        with self._write_lock:
+            cursor = self._writer_connection().execute(CLAIM_NOTICE, (stripe_id, kind, time.time()))
+            return cursor.rowcount == 1
+
+    def _requeue(self, batch: List[Tuple[str, tuple]]):
+        """Put a failed batch back in front so the next flush retries it in order
+
+        Writes that arrived during the flush stay behind it; if both no longer
+        fit, the oldest are dropped (and counted), never the newest.
+        """
+        with self._pending_lock:
+            overflow = len(batch) + len(self.pending) - self.pending.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+                batch = batch[overflow:]
+            self.pending.extendleft(reversed(batch))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush_async()
+
+    async def _flush_async(self):
+        try:
+            await asyncio.to_thread(self.flush)
+        except sqlite3.Error as e:
+            self.flush_failures += 1
+            logger.error(f"Ledger flush failed, {len(self.pending)} writes pending: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._flush_async()
+        for connection in (self._writer, self._reader):
+            if connection is not None:
+                connection.close()
+        self._writer = self._reader = None
+
+    # Reads (indexed, fast enough to run on the event loop)
+
+    def _rows(self, query: str, params: tuple) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.reader.execute(query, params)]
+
+    def by_email(self, email: str, limit: int = 50) -> List[Dict[str, Any]]:
+        return self._rows("SELECT * FROM payments WHERE email = ? ORDER BY created_at DESC LIMIT ?",
+                          (email.lower(), limit))
+
+    def by_stripe_id(self, stripe_id: str) -> List[Dict[str, Any]]:
+        return self._rows("SELECT * FROM payments WHERE stripe_id = ?", (stripe_id,))
+
+    def since(self, created_after: float, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        if status is None:
+            return self._rows("SELECT * FROM payments WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?",
+                              (created_after, limit))
+        return self._rows("SELECT * FROM payments WHERE created_at >= ? AND status = ? "
+                          "ORDER BY created_at DESC LIMIT ?", (created_after, status, limit))
+
+    def has_paid(self, email: str, amount: Optional[int] = None, currency: Optional[str] = None,
+                 within: Optional[float] = None) -> bool:
+        """Whether email has a succeeded payment (optionally of amount/currency, in the last `within` seconds)"""
+        query = "SELECT 1 FROM payments WHERE email = ? AND status = ?"
+        params: list = [email.lower(), SUCCEEDED]
+        if amount is not None:
+            query += " AND amount = ?"
+            params.append(amount)
+        if currency is not None:
+            query += " AND currency = ?"
+            params.append(currency)
+        if within is not None:
+            query += " AND created_at >= ?"
+            params.append(time.time() - within)
+        return self.reader.execute(query + " LIMIT 1", params).fetchone() is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "pending": len(self.pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flush_failures": self.flush_failures,
+        }
+
+
+# Global instance
+ledger = PaymentLedger(
+    settings.ledger_path,
+    flush_interval=settings.ledger_flush_interval,
+    batch_size=settings.ledger_batch_size,
+    max_pending=settings.ledger_max_pending,
+)
@@ -0,0 +1,198 @@
+"""
+Event Loop Lag Monitor
+- A heartbeat task measures how late the loop wakes it up (scheduling lag)
+- A watchdog thread notices when the heartbeat stalls and captures the
+  stack of whatever is holding the loop at that moment
+- Offenders are grouped by their innermost app frame and counted
+- Lag percentiles and top offenders are logged periodically as JSON
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from pathlib import Path
+from types import FrameType
+from typing import Any, Deque, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger("ezyba.loop")
+
+BACKEND_DIR = str(Path(__file__).resolve().parent.parent.parent)
+STACK_DEPTH = 15
+
+
+def _frame_label(frame: FrameType) -> str:
+    filename = frame.f_code.co_filename
+    if filename.startswith(BACKEND_DIR):
+        filename = filename[len(BACKEND_DIR) + 1:]
+    return f"{filename}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def offender_key(frame: FrameType) -> str:
+    """Innermost frame in our own code, or the innermost frame if none is ours"""
+    innermost = frame
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(BACKEND_DIR) and "site-packages" not in frame.f_code.co_filename:
+            return _frame_label(frame)
+        frame = frame.f_back
+    return _frame_label(innermost)
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * pct))] if samples else 0.0
+
+
+class LoopMonitor:
+    """Heartbeat-based lag measurement with a stack-capturing watchdog"""
+
+    def __init__(self, interval: float, slow_threshold: float, log_interval: float,
+                 max_offenders: int = 50):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.log_interval = log_interval
+        self.max_offenders = max_offenders
+
+        self.lags: Deque[float] = deque(maxlen=3000)
+        self.recent_lags: Deque[float] = deque(maxlen=5)
+        self.current_lag = 0.0
+        self._recent_since = 0.0  # loop time; beats that started earlier don't count towards recent_lag
+        self.slow_steps = 0
+        self.stalls = 0
+        self.offenders: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self._lock = threading.Lock()
+        self._last_beat = time.monotonic()
+        self._stall_key: Optional[str] = None
+        self._loop_thread_id: Optional[int] = None
+        self._tasks: List[asyncio.Task] = []
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # Event loop side
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            if expected - self.interval >= self._recent_since:
+                self.recent_lags.append(lag)
+                self.current_lag = max(self.recent_lags)
+
+            with self._lock:
+                self.lags.append(lag)
+                self._last_beat = time.monotonic()
+                if lag >= self.slow_threshold:
+                    self.slow_steps += 1
+                    if self._stall_key is not None:
+                        offender = self.offenders[self._stall_key]
+                        offender["max_ms"] = max(offender["max_ms"], round(lag * 1000, 1))
+                self._stall_key = None
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.log_interval)
+            stats = self.stats(top=5, include_stacks=False)
+            logger.info(f"Event loop stats {json.dumps(stats)}")
+
+    # Watchdog thread
+
+    def _watch(self):
+        limit = self.interval + self.slow_threshold
+        while not self._stop.wait(self.slow_threshold / 4):
+            with self._lock:
+                stalled_for = time.monotonic() - self._last_beat
+                if stalled_for < limit or self._stall_key is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                self._record_stall(frame, stalled_for)
+
+    def _record_stall(self, frame: FrameType, stalled_for: float):
+        key = offender_key(frame)
+        stack = traceback.format_stack(frame)[-STACK_DEPTH:]
+        self.stalls += 1
+        self._stall_key = key
+
+        offender = self.offenders.pop(key, None) or {"count": 0, "max_ms": 0.0}
+        offender["count"] += 1
+        offender["max_ms"] = max(offender["max_ms"], round(stalled_for * 1000, 1))
+        offender["last_seen"] = time.time()
+        offender["stack"] = [line.rstrip() for line in stack]
+        self.offenders[key] = offender
+        while len(self.offenders) > self.max_offenders:
+            self.offenders.popitem(last=False)
+
+        logger.warning(f"Event loop blocked for {stalled_for * 1000:.0f}ms+ at {key}\n{''.join(stack)}")
+
+    # Lifecycle
+
+    def start(self):
+        """Start the heartbeat, reporter and watchdog for the running loop"""
+        if self._tasks:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._tasks = [asyncio.create_task(self._heartbeat()), asyncio.create_task(self._reporter())]
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def reset_recent(self):
+        """Forget the recent lag (e.g. from startup), so admission control judges only what comes next
+
+        A beat already waiting is skipped too: it started before the reset
+        and would report the startup stall when it wakes.
+        """
+        self._recent_since = asyncio.get_running_loop().time()
+        self.recent_lags.clear()
+        self.current_lag = 0.0
+
+    def recent_lag(self) -> float:
+        """Worst lag over the last few heartbeats, in seconds (updated by the heartbeat, no lock needed)"""
+        return self.current_lag
+
+    def stats(self, top: int = 10, include_stacks: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            lags = sorted(self.lags)
+            offenders = sorted(self.offenders.items(), key=lambda item: -item[1]["count"])[:top]
+            return {
+                "samples": len(lags),
+                "lag_p50_ms": round(_percentile(lags, 0.50) * 1000, 2),
+                "lag_p95_ms": round(_percentile(lags, 0.95) * 1000, 2),
+                "lag_p99_ms": round(_percentile(lags, 0.99) * 1000, 2),
+                "lag_max_ms": round(lags[-1] * 1000, 2) if lags else 0.0,
+                "slow_threshold_ms": self.slow_threshold * 1000,
+                "slow_steps": self.slow_steps,
+                "stalls_captured": self.stalls,
+                "offenders": [
+                    {"site": key, **({k: v for k, v in offender.items() if include_stacks or k != "stack"})}
+                    for key, offender in offenders
+                ],
+            }
+
+
+# Global instance
+loop_monitor = LoopMonitor(
+    interval=settings.loop_monitor_interval,
+    slow_threshold=settings.loop_slow_threshold,
+    log_interval=settings.loop_monitor_log_interval,
+)
@@ -1,22 +1,33 @@
+import asyncio
 import mailtrap as mt
 import logging
 from typing import List
-from jinja2 import Template
 import html
 
 from app.config import settings
+from app.services.circuit_breaker import get_circuit_breaker
+from app.services.http_clients import get_mailtrap_sending_api
+from app.services.runtime_config import runtime_config
 from app.models.payment import PaymentRequest, PaymentType
-from app.templates.email_templates import EMAIL_TEMPLATES, BASE_EMAIL_TEMPLATE
+from app.templates.email_templates import EMAIL_TEMPLATES, BASE_EMAIL_TEMPLATE, MAILTRAP_ADMIN_EMAIL_TEMPLATE, get_template
 
 logger = logging.getLogger(__name__)
 
 
 class MailtrapService:
     def __init__(self):
-        self.client = mt.MailtrapClient(token=settings.mailtrap_api_token)
+        self.client = get_mailtrap_sending_api()
+        self.breaker = get_circuit_breaker("mailtrap")
         self.sender_email = settings.sender_email
         self.sender_name = settings.sender_name
     
+    async def _send(self, mail: mt.Mail):
+        """Send off the event loop through the Mailtrap circuit breaker"""
+        return await self.breaker.call(
+            lambda: asyncio.to_thread(self.client.send, mail),
+            timeout=settings.email_timeout
+        )
+    
     async def send_payment_confirmation(self, payment_request: PaymentRequest, payment_id: str, success: bool):
         """Send payment confirmation emails using Mailtrap API"""
         
@@ -43,7 +54,7 @@ class MailtrapService:
         customer_subject = customer_template["subject"].format(company_name=settings.company_name)
         
         # Render content first
-        content_html = Template(customer_template["content"]).render(
+        content_html = get_template(customer_template["content"]).render(
             name=html.escape(payment_request.name),
             amount_display=amount_display,
             payment_type_display=payment_type_display,
@@ -53,7 +64,7 @@ class MailtrapService:
         )
         
         # Then render full email with base template
-        customer_html = Template(BASE_EMAIL_TEMPLATE).render(
+        customer_html = get_template(BASE_EMAIL_TEMPLATE).render(
             lang=lang,
             subject=customer_subject,
             header_title="Pagamento" if lang == "pt" else "Payment",
@@ -76,7 +87,7 @@ class MailtrapService:
             success, payment_request, amount_display, payment_type_display, payment_id
         )
         
-        admin_emails = [mt.Address(email=email) for email in settings.notification_email_list]
+        admin_emails = [mt.Address(email=email) for email in runtime_config.current.notification_emails]
         admin_mail = mt.Mail(
             sender=mt.Address(email=self.sender_email, name=self.sender_name),
             to=admin_emails,
@@ -88,12 +99,12 @@ class MailtrapService:
         try:
             # Send customer email
             # logger.info(f"[MAILTRAP] Sending customer email to: {payment_request.email}")
-            self.client.send(customer_mail)
+            await self._send(customer_mail)
             logger.info(f"[MAILTRAP] Customer email sent successfully")
             
             # Send admin email
-            # logger.info(f"[MAILTRAP] Sending admin email to: {settings.notification_email_list}")
-            self.client.send(admin_mail)
+            # logger.info(f"[MAILTRAP] Sending admin email to: {runtime_config.current.notification_emails}")
+            await self._send(admin_mail)
             logger.info(f"[MAILTRAP] Admin email sent successfully")
             
             # logger.info(f"[MAILTRAP] All payment confirmation emails sent for payment {payment_id} (lang: {lang})")
@@ -107,30 +118,7 @@ class MailtrapService:
     
     def _render_admin_template(self, success: bool, payment_request: PaymentRequest, amount_display: str, payment_type_display: str, payment_id: str) -> str:
         """Render admin email template (always in Portuguese)"""
-        template = Template("""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <h2 style="color: #333;">{{ 'Novo Pagamento Recebido' if success else 'Falha no Pagamento' }} 💳</h2>
-            
-            <div style="background: #f8f9fa; border-left: 4px solid {{ '#28a745' if success else '#dc3545' }}; padding: 20px; margin: 20px 0;">
-                <h3 style="margin-top: 0; color: #333;">👤 Informações do Cliente:</h3>
-                <p><strong>Nome:</strong> {{ name }}</p>
-                <p><strong>Email:</strong> {{ email }}</p>
-                {% if phone %}<p><strong>Telefone:</strong> {{ phone }}</p>{% endif %}
-                <p><strong>Idioma:</strong> {{ language }}</p>
-                
-                <h3 style="color: #333;">💰 Detalhes do Pagamento:</h3>
-                <p><strong>Valor:</strong> {{ amount_display }}</p>
-                <p><strong>Moeda:</strong> {{ currency }}</p>
-                <p><strong>Tipo:</strong> {{ payment_type_display }}</p>
-                <p><strong>ID:</strong> <code>{{ payment_id }}</code></p>
-                <p><strong>Status:</strong> <span style="color: {{ '#28a745' if success else '#dc3545' }}; font-weight: bold;">{{ 'SUCESSO ✅' if success else 'FALHA ❌' }}</span></p>
-            </div>
-            
-            <p style="color: #666; font-size: 14px;">Email automático do sistema de pagamentos</p>
-        </body>
-        </html>
-        """)
+        template = get_template(MAILTRAP_ADMIN_EMAIL_TEMPLATE)
         
         return template.render(
             success=success,
@@ -158,7 +146,7 @@ class MailtrapService:
                 category=category
             )
             
-            self.client.send(mail)
+            await self._send(mail)
             logger.info(f"Email sent successfully to: {to_emails}")
             return True
             
@@ -0,0 +1,107 @@
+"""
+Customer Portal Session Cache
+- Portal URLs are reused for a short time per (customer_id, return_url),
+  so double clicks and back-and-forth on the manage pages don't each
+  create a Stripe billing portal session
+- The TTL is capped well under the lifetime of an unvisited portal URL
+- Concurrent requests for the same key share one Stripe call
+- Hits, coalesced requests, Stripe calls and the Stripe time they saved
+  are counted for GET /admin/portal-cache
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from app.config import settings
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Stripe expires a portal session URL that isn't opened within 5 minutes
+PORTAL_URL_LIFETIME = 300.0
+MAX_TTL = PORTAL_URL_LIFETIME - 60.0
+
+PortalKey = Tuple[str, str]
+
+
+class PortalSessionCache:
+    """Short-lived portal URLs with request coalescing"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        if ttl > MAX_TTL:
+            logger.warning(f"Portal cache TTL {ttl}s capped at {MAX_TTL}s (portal URLs expire after "
+                           f"{PORTAL_URL_LIFETIME}s)")
+            ttl = MAX_TTL
+        self.enabled = ttl > 0
+        self.urls = TTLCache(maxsize=maxsize, ttl=ttl)
+        # key -> Stripe call in progress, awaited by every request for that key
+        self.pending: Dict[PortalKey, asyncio.Task] = {}
+
+        self.coalesced = 0
+        self.stripe_calls = 0
+        self.stripe_seconds = 0.0
+
+    async def get_or_create(self, customer_id: str, return_url: str,
+                            create: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Cached result for the key, the result of a call already in flight, or create()'s"""
+        if not self.enabled:
+            return await create()
+
+        key = (customer_id, return_url)
+        url = self.urls.get(key)
+        if url is not None:
+            logger.info(f"Reused portal session for customer: {customer_id}")
+            return {"success": True, "url": url}
+
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._create(key, create))
+            self.pending[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+
+        # Shielded: a client that goes away doesn't cancel the call others wait on
+        return await asyncio.shield(task)
+
+    async def _create(self, key: PortalKey, create: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            result = await create()
+        finally:
+            self.stripe_calls += 1
+            self.stripe_seconds += time.perf_counter() - started
+        if result.get("success"):
+            self.urls.set(key, result["url"])
+        return result
+
+    def _finished(self, key: PortalKey, task: asyncio.Task):
+        self.pending.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every waiter went away
+
+    def clear(self):
+        self.urls.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        average = self.stripe_seconds / self.stripe_calls if self.stripe_calls else 0.0
+        saved_calls = self.urls.hits + self.coalesced
+        requests = self.stripe_calls + saved_calls
+        return {
+            **self.urls.stats(),
+            "ttl": self.urls.ttl,
+            "enabled": self.enabled,
+            "in_flight": len(self.pending),
+            "coalesced": self.coalesced,
+            "stripe_calls": self.stripe_calls,
+            "saved_rate": round(saved_calls / requests, 4) if requests else 0.0,
+            "avg_stripe_ms": round(average * 1000, 2),
+            # Each reuse skipped roughly one average Stripe call
+            "saved_stripe_seconds": round(saved_calls * average, 3),
+        }
+
+
+# Global instance
+portal_cache = PortalSessionCache(maxsize=settings.portal_cache_size, ttl=settings.portal_cache_ttl)
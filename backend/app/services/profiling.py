@@ -0,0 +1,84 @@
+"""
+Request Profile Storage
+- cProfile dumps written next to the logs (settings.profile_dir)
+- Bounded: oldest profiles are deleted beyond settings.profile_max_files
+- Text summaries rendered on demand for the admin endpoints
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NAME = re.compile(r"^[\w.-]+\.prof$")
+
+
+class ProfileStore:
+    """Rotating directory of .prof files"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def new_name(self, trigger: str, method: str, path: str, request_id: str) -> str:
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        route = re.sub(r"[^\w]+", "_", path).strip("_") or "root"
+        return f"{timestamp}-{request_id}-{trigger}-{method.lower()}_{route}.prof"
+
+    def _write(self, profiler: cProfile.Profile, name: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(self.directory / name))
+
+        profiles = sorted(self.directory.glob("*.prof"), key=lambda path: path.stat().st_mtime)
+        for old in profiles[:-self.max_files]:
+            old.unlink(missing_ok=True)
+
+    async def save(self, profiler: cProfile.Profile, name: str):
+        """Dump and rotate off the event loop"""
+        try:
+            await asyncio.to_thread(self._write, profiler, name)
+            logger.info(f"Saved request profile {name}")
+        except OSError as e:
+            logger.error(f"Failed to save request profile {name}: {e}")
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not self.directory.is_dir():
+            return []
+        profiles = sorted(self.directory.glob("*.prof"), key=lambda path: path.stat().st_mtime, reverse=True)
+        return [
+            {
+                "name": path.name,
+                "size": path.stat().st_size,
+                "created_at": datetime.fromtimestamp(path.stat().st_mtime, timezone.utc).isoformat(),
+            }
+            for path in profiles
+        ]
+
+    def path_for(self, name: str) -> Optional[Path]:
+        """Resolve a profile name, rejecting anything that isn't a plain file name"""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    def summary(self, name: str, limit: int = 40, sort: str = "cumulative") -> Optional[str]:
+        path = self.path_for(name)
+        if path is None:
+            return None
+        output = io.StringIO()
+        stats = pstats.Stats(str(path), stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+# Global instance
+profile_store = ProfileStore(settings.profile_dir, settings.profile_max_files)
@@ -0,0 +1,165 @@
+"""
+Per-route Rate-limit Policies
+- Buckets are named limits keyed by client IP, session key or customer
+  email, counted in the counter store; a bucket listed by several routes
+  is one budget shared between them
+- Policies map method + path to the buckets a request spends; unknown
+  routes spend the default bucket, exempt routes none
+- Compiled at startup, and again on a config reload, into a single dict
+  lookup per request (bad policies fail the startup or the reload, not a
+  request)
+- Email-keyed buckets are spent by the route once the body is validated
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from app.config import Settings, settings
+from app.services.counter_store import HitResult, counter_store
+from app.services.runtime_config import ConfigSnapshot, runtime_config
+
+logger = logging.getLogger(__name__)
+
+# Bucket keys
+KEY_IP = "ip"
+KEY_SESSION = "session"  # X-Session-Key header, the client IP when absent
+KEY_EMAIL = "email"
+KEYS = (KEY_IP, KEY_SESSION, KEY_EMAIL)
+
+ANY_METHOD = "*"
+
+
+class RateLimitBucket(NamedTuple):
+    name: str
+    limit: int  # per host; split between workers unless counters are shared
+    window: float
+    key: str = KEY_IP
+
+
+class RateLimitPolicy(NamedTuple):
+    path: str
+    buckets: Tuple[str, ...]  # empty: exempt
+    methods: Tuple[str, ...] = (ANY_METHOD,)
+
+
+class RateLimitDenial(NamedTuple):
+    bucket: RateLimitBucket
+    result: HitResult
+
+
+def bucket_table(config: Settings) -> Tuple[RateLimitBucket, ...]:
+    return (
+        RateLimitBucket("default", config.rate_limit_requests, config.rate_limit_window),
+        RateLimitBucket("config", config.rate_limit_config_requests, config.rate_limit_window),
+        RateLimitBucket("session", config.rate_limit_session_requests, config.rate_limit_window),
+        # Calls that reach Stripe, one budget for checkout and the billing portal
+        RateLimitBucket("checkout", config.rate_limit_checkout_requests, config.rate_limit_window),
+        RateLimitBucket("checkout_session", config.rate_limit_checkout_session_requests,
+                        config.rate_limit_window, KEY_SESSION),
+        RateLimitBucket("checkout_email", config.rate_limit_email_requests, config.rate_limit_window, KEY_EMAIL),
+    )
+
+
+BUCKETS = bucket_table(runtime_config.current.settings)
+
+DEFAULT_BUCKETS = ("default",)
+
+POLICIES = (
+    RateLimitPolicy("/health", ()),
+    RateLimitPolicy("/ready", ()),
+    RateLimitPolicy("/api/v1/payments/webhook", ()),  # signature-verified Stripe deliveries
+    RateLimitPolicy("/api/v1/payments/config", ("config",), ("GET",)),
+    RateLimitPolicy("/api/v1/payments/session", ("session",), ("POST",)),
+    RateLimitPolicy("/api/v1/payments/create", ("checkout", "checkout_session", "checkout_email"), ("POST",)),
+    RateLimitPolicy("/api/v1/payments/customer-portal", ("checkout", "checkout_session"), ("POST",)),
+)
+
+
+class RateLimiter:
+    """Route -> buckets table built from the policies, spending buckets in the counter store"""
+
+    def __init__(self, buckets: Iterable[RateLimitBucket], policies: Iterable[RateLimitPolicy],
+                 default: Tuple[str, ...] = DEFAULT_BUCKETS, store=counter_store,
+                 workers: int = settings.web_concurrency):
+        self.store = store
+        self.workers = workers
+        self.policies = tuple(policies)
+        self.default_names = tuple(default)
+        self.configure(buckets)
+        self.rejected: Dict[str, int] = defaultdict(int)
+
+    def configure(self, buckets: Iterable[RateLimitBucket]):
+        """Compile the route table for these buckets, replacing the current one only if it is valid"""
+        table: Dict[str, RateLimitBucket] = {}
+        for bucket in buckets:
+            if bucket.name in table:
+                raise ValueError(f"Rate-limit bucket {bucket.name!r} defined twice")
+            if bucket.key not in KEYS:
+                raise ValueError(f"Rate-limit bucket {bucket.name!r} has unknown key {bucket.key!r}")
+            limit = bucket.limit if self.store.shared else max(1, bucket.limit // self.workers)
+            table[bucket.name] = bucket._replace(limit=limit)
+
+        default = self._resolve(table, self.default_names)
+        # (METHOD or "*", path) -> buckets spent, in order
+        routes: Dict[Tuple[str, str], Tuple[RateLimitBucket, ...]] = {}
+        for policy in self.policies:
+            compiled = self._resolve(table, policy.buckets)
+            for method in policy.methods:
+                route = (method.upper(), policy.path)
+                if route in routes:
+                    raise ValueError(f"Rate-limit policy for {route[0]} {route[1]} defined twice")
+                routes[route] = compiled
+
+        self.buckets, self.default, self.routes = table, default, routes
+
+    @staticmethod
+    def _resolve(table: Dict[str, RateLimitBucket], names: Tuple[str, ...]) -> Tuple[RateLimitBucket, ...]:
+        missing = [name for name in names if name not in table]
+        if missing:
+            raise ValueError(f"Rate-limit policy uses undefined buckets: {', '.join(missing)}")
+        return tuple(table[name] for name in names)
+
+    def buckets_for(self, method: str, path: str) -> Tuple[RateLimitBucket, ...]:
+        buckets = self.routes.get((method, path))
+        if buckets is None:
+            buckets = self.routes.get((ANY_METHOD, path), self.default)
+        return buckets
+
+    def check(self, method: str, path: str, keys: Dict[str, Optional[str]]) -> Optional[RateLimitDenial]:
+        """Spend the route's buckets whose key is given; returns the first one over its limit
+
+        Buckets keyed by something not in keys (the email, before the body is
+        parsed) are left for a later check.
+        """
+        for bucket in self.buckets_for(method, path):
+            if bucket.key not in keys:
+                continue
+            value = keys[bucket.key] or keys.get(KEY_IP)
+            result = self.store.hit(f"rl:{bucket.name}:{value}", bucket.limit, bucket.window)
+            if not result.allowed:
+                self.rejected[bucket.name] += 1
+                return RateLimitDenial(bucket, result)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buckets": {
+                name: {"limit": bucket.limit, "window": bucket.window, "key": bucket.key,
+                       "rejected": self.rejected.get(name, 0)}
+                for name, bucket in self.buckets.items()
+            },
+            "routes": {
+                f"{method} {path}": [bucket.name for bucket in buckets] for (method, path), buckets in self.routes.items()
+            },
+            "default": [bucket.name for bucket in self.default],
+        }
+
+
+def _reconfigure(snapshot: ConfigSnapshot):
+    rate_limiter.configure(bucket_table(snapshot.settings))
+
+
+# Global instance
+rate_limiter = RateLimiter(BUCKETS, POLICIES)
+runtime_config.subscribe(_reconfigure)
@@ -0,0 +1,194 @@
+"""
+Hot-reloadable Runtime Configuration
+- ConfigSnapshot holds the Settings and every structure derived from them
+  (host and origin sets, recipient tuple), built once and never mutated;
+  request code reads runtime_config.current instead of re-parsing strings
+- A reload re-reads the environment plus CONFIG_OVERRIDES_PATH (a .env
+  style file whose values win), validates everything, then swaps the
+  snapshot reference; an invalid file keeps the running config
+- Triggered by SIGHUP to the worker process or by a change of the
+  overrides file (polled every CONFIG_RELOAD_INTERVAL seconds)
+- Subscribers rebuild their own state (rate-limit table, limiter and
+  admission parameters, the pre-serialized /config body) right after the
+  swap, on the event loop, so no request sees a mix of old and new; if one
+  fails the previous snapshot is put back
+- Only RELOADABLE fields take effect, other changes are logged as needing
+  a restart
+"""
+
+import asyncio
+import logging
+import os
+import signal
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from dotenv import dotenv_values
+from pydantic import ValidationError
+
+from app.config import Settings, settings
+
+logger = logging.getLogger(__name__)
+
+RELOADABLE = frozenset({
+    "allowed_hosts",
+    "cors_origins",
+    "notification_emails",
+    "stripe_publishable_key",
+    "config_max_age",
+    "rate_limit_requests",
+    "rate_limit_window",
+    "rate_limit_config_requests",
+    "rate_limit_session_requests",
+    "rate_limit_checkout_requests",
+    "rate_limit_checkout_session_requests",
+    "rate_limit_email_requests",
+    "admission_per_client",
+    "admission_max_in_flight",
+    "admission_max_loop_lag",
+    "admission_retry_after",
+    "stripe_rate_limit",
+    "stripe_rate_burst",
+    "stripe_max_concurrency",
+    "stripe_max_queue_wait",
+})
+
+
+class ConfigSnapshot(NamedTuple):
+    version: int
+    settings: Settings
+    allowed_hosts: FrozenSet[str]  # exact host names
+    host_wildcards: Tuple[str, ...]  # "*.example.com" patterns
+    cors_origins: FrozenSet[str]
+    notification_emails: Tuple[str, ...]
+
+
+def _split(value: str) -> Tuple[str, ...]:
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+def build_snapshot(config: Settings, version: int) -> ConfigSnapshot:
+    """Derived structures for config; raises ValueError for values the middlewares can't use"""
+    hosts = _split(config.allowed_hosts)
+    wildcards = tuple(host for host in hosts if host.startswith("*") and host != "*")
+    for pattern in hosts:
+        if "*" in pattern[1:] or (pattern in wildcards and not pattern.startswith("*.")):
+            raise ValueError(f"Invalid allowed host {pattern!r}: wildcards must look like '*.example.com'")
+
+    return ConfigSnapshot(
+        version=version,
+        settings=config,
+        allowed_hosts=frozenset(host for host in hosts if host not in wildcards),
+        host_wildcards=wildcards,
+        cors_origins=frozenset(_split(config.cors_origins)),
+        notification_emails=_split(config.notification_emails),
+    )
+
+
+def load_settings(overrides_path: Optional[str]) -> Settings:
+    """Settings from the environment and .env, with the overrides file on top"""
+    overrides: Dict[str, str] = {}
+    if overrides_path and os.path.exists(overrides_path):
+        overrides = {key.lower(): value for key, value in dotenv_values(overrides_path).items() if value is not None}
+    return Settings(**overrides)
+
+
+class RuntimeConfig:
+    """Current config snapshot, reloaded in place"""
+
+    def __init__(self, overrides_path: Optional[str], reload_interval: float):
+        self.overrides_path = overrides_path
+        self.reload_interval = reload_interval
+        self.current = build_snapshot(load_settings(overrides_path), version=1)
+        self._subscribers: List[Callable[[ConfigSnapshot], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._file_stamp = self._stamp()
+
+        self.reloads = 0
+        self.failures = 0
+
+    def subscribe(self, callback: Callable[[ConfigSnapshot], None]):
+        """Call callback(snapshot) after every successful swap"""
+        self._subscribers.append(callback)
+
+    def _apply(self, snapshot: ConfigSnapshot):
+        self.current = snapshot
+        for callback in self._subscribers:
+            callback(snapshot)
+
+    def reload(self, reason: str) -> bool:
+        previous = self.current
+        try:
+            snapshot = build_snapshot(load_settings(self.overrides_path), previous.version + 1)
+        except (ValidationError, ValueError, OSError) as e:
+            self.failures += 1
+            logger.error(f"Config reload ({reason}) rejected, keeping version {previous.version}: {e}")
+            return False
+
+        try:
+            self._apply(snapshot)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Config reload ({reason}) failed while applying, restoring version {previous.version}: {e}")
+            self._apply(previous)
+            return False
+
+        self.reloads += 1
+        changed = [name for name in Settings.model_fields
+                   if getattr(snapshot.settings, name) != getattr(previous.settings, name)]
+        logger.info(f"Config reloaded ({reason}): version {snapshot.version}, changed: {', '.join(changed) or 'nothing'}")
+        needs_restart = [name for name in changed if name not in RELOADABLE]
+        if needs_restart:
+            logger.warning(f"Config changes that need a restart to take effect: {', '.join(needs_restart)}")
+        return True
+
+    # Triggers
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        if not self.overrides_path:
+            return None
+        try:
+            stat = os.stat(self.overrides_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            stamp = self._stamp()
+            if stamp != self._file_stamp:
+                self._file_stamp = stamp
+                self.reload("file changed")
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self.reload, "SIGHUP")
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Not the main thread (test clients) or no signal support
+            logger.debug("SIGHUP config reload not available in this process")
+        if self.overrides_path and self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.current.version,
+            "overrides_path": self.overrides_path,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "reloadable": sorted(RELOADABLE),
+        }
+
+
+# Global instance
+runtime_config = RuntimeConfig(settings.config_overrides_path, settings.config_reload_interval)
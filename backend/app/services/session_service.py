@@ -3,13 +3,22 @@ Session-based API Key Service
 - Generates temporary API keys for frontend
 - Keys expire after short time
 - Tied to specific sessions/IPs
+- Keys are HMAC-signed, so any worker (or a restarted process) can
+  validate a key minted elsewhere
+- Request counts live in the counter store (per worker, or shared by
+  every worker on the host with STATE_BACKEND=shm)
 """
 
+import hashlib
+import hmac
 import secrets
 import time
 from typing import Dict, Optional
 import logging
 
+from app.config import settings
+from app.services.counter_store import counter_store
+
 logger = logging.getLogger(__name__)
 
 class SessionAPIService:
@@ -20,6 +29,13 @@ class SessionAPIService:
         self.active_sessions: Dict[str, Dict] = {}
         self.cleanup_interval = 300  # 5 minutes
         self.last_cleanup = time.time()
+        self.session_lifetime = 1800  # 30 minutes
+        self.max_requests = 50  # Rate limit per session
+        self._signing_key = hmac.new(settings.api_key.encode(), b"session-keys", hashlib.sha256).digest()
+    
+    def _sign(self, payload: str, client_ip: str) -> str:
+        message = f"{payload}|{client_ip}".encode()
+        return hmac.new(self._signing_key, message, hashlib.sha256).hexdigest()[:32]
     
     def generate_session_key(self, client_ip: str, user_agent: str) -> str:
         """Generate temporary API key for a session"""
@@ -27,28 +43,52 @@ class SessionAPIService:
         # Cleanup old sessions periodically
         self._cleanup_expired_sessions()
         
-        # Generate secure session key
-        session_key = f"sess_{secrets.token_urlsafe(32)}"
+        # Generate secure session key: expiry and nonce, signed together with the IP
+        expires_at = int(time.time()) + self.session_lifetime
+        payload = f"{expires_at}.{secrets.token_urlsafe(16)}"
+        session_key = f"sess_{payload}.{self._sign(payload, client_ip)}"
         
         # Store session info
+        self._store_session(session_key, expires_at, client_ip, user_agent)
+        
+        logger.info(f"Generated session key for IP: {client_ip}")
+        return session_key
+    
+    def _store_session(self, session_key: str, expires_at: float, client_ip: str, user_agent: str):
         self.active_sessions[session_key] = {
-            "created_at": time.time(),
-            "expires_at": time.time() + 1800,  # 30 minutes
+            "created_at": expires_at - self.session_lifetime,
+            "expires_at": expires_at,
             "client_ip": client_ip,
             "user_agent": user_agent,
-            "requests_count": 0,
-            "max_requests": 50  # Rate limit per session
+            "max_requests": self.max_requests
         }
+    
+    def _adopt_session_key(self, session_key: str, client_ip: str, user_agent: str) -> bool:
+        """Accept a key minted by another worker if its signature and expiry check out"""
+        try:
+            expires_at, nonce, signature = session_key[len("sess_"):].split(".")
+            expires_at = int(expires_at)
+        except ValueError:
+            return False
         
-        logger.info(f"Generated session key for IP: {client_ip}")
-        return session_key
+        if not hmac.compare_digest(signature, self._sign(f"{expires_at}.{nonce}", client_ip)):
+            return False
+        if time.time() > expires_at:
+            return False
+        
+        self._store_session(session_key, expires_at, client_ip, user_agent)
+        return True
     
     def validate_session_key(self, session_key: str, client_ip: str, user_agent: str) -> bool:
         """Validate session key and context"""
         
-        if not session_key or session_key not in self.active_sessions:
+        if not session_key or not session_key.startswith("sess_"):
             return False
         
+        if session_key not in self.active_sessions:
+            if not self._adopt_session_key(session_key, client_ip, user_agent):
+                return False
+        
         session = self.active_sessions[session_key]
         
         # Check expiration
@@ -61,14 +101,12 @@ class SessionAPIService:
             logger.warning(f"IP mismatch for session {session_key}: {session['client_ip']} vs {client_ip}")
             return False
         
-        # Check rate limit
-        if session["requests_count"] >= session["max_requests"]:
+        # Check rate limit and count this request
+        usage = counter_store.hit(f"session:{session_key}", session["max_requests"], self.session_lifetime)
+        if not usage.allowed:
             logger.warning(f"Rate limit exceeded for session {session_key}")
             return False
         
-        # Update usage
-        session["requests_count"] += 1
-        
         return True
     
     def _cleanup_expired_sessions(self):
@@ -0,0 +1,192 @@
+"""
+Graceful Shutdown Coordinator
+- Tracks in-flight requests (ShutdownMiddleware) and background tasks
+  registered with track() (bulk runs)
+- On SIGTERM, before the server's own handler runs, stops taking new
+  requests (503 + Connection: close, /ready fails) and gives what is
+  running SHUTDOWN_DRAIN_TIMEOUT seconds to finish
+- Whatever is still running at the deadline is cancelled and reported,
+  so the server moves on to the lifespan shutdown instead of waiting
+  until the worker is killed
+- The lifespan shutdown steps (webhook queue, ledger flush, counter
+  snapshot, clients) then run in order, each timed; one failing doesn't
+  skip the rest
+"""
+
+import asyncio
+import itertools
+import logging
+import signal
+import time
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for in-flight work while draining
+POLL_INTERVAL = 0.05
+
+
+class InFlightRequest(NamedTuple):
+    method: str
+    path: str
+    started: float
+    task: Optional[asyncio.Task]  # cancelled if still running at the deadline
+
+
+class DrainReport(NamedTuple):
+    reason: str
+    drain_seconds: float
+    requests_drained: int
+    tasks_drained: int
+    unfinished: Tuple[str, ...]  # cancelled at the deadline
+    steps: Optional[Dict[str, Dict[str, Any]]] = None  # shutdown step -> ok/error and ms
+    total_seconds: Optional[float] = None
+
+
+class ShutdownCoordinator:
+    """In-flight work registry and the drain that runs when the process is asked to stop"""
+
+    def __init__(self, drain_timeout: float, retry_after: int):
+        self.drain_timeout = drain_timeout
+        self.retry_after = retry_after
+
+        self.draining = False
+        self.started: Optional[float] = None
+        self.requests: Dict[int, InFlightRequest] = {}
+        self.tasks: Dict[asyncio.Task, str] = {}
+        self._ids = itertools.count()
+        self._drain: Optional[asyncio.Task] = None
+
+        self.refused = 0
+        self.report: Optional[DrainReport] = None
+
+    # Tracking
+
+    def request_started(self, method: str, path: str) -> int:
+        request_id = next(self._ids)
+        self.requests[request_id] = InFlightRequest(method, path, time.monotonic(), asyncio.current_task())
+        return request_id
+
+    def request_finished(self, request_id: int):
+        self.requests.pop(request_id, None)
+
+    def track(self, task: asyncio.Task, name: str) -> asyncio.Task:
+        """Keep a reference to task until it finishes and wait for it on shutdown"""
+        self.tasks[task] = name
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self.tasks.pop(task, None)
+
+    # Draining
+
+    def start(self):
+        """Take requests again (a new lifespan) and drain on SIGTERM"""
+        self.draining = False
+        self.started = None
+        self._drain = None
+        self._install_signal_handler()
+
+    def _install_signal_handler(self):
+        """Start draining on SIGTERM, then hand the signal to the server's handler"""
+        previous = signal.getsignal(signal.SIGTERM)
+        if not callable(previous):
+            # No server handler to chain to (SIGTERM would just kill the process)
+            return
+        loop = asyncio.get_running_loop()
+
+        def on_sigterm(signum, frame):
+            loop.call_soon_threadsafe(self.begin, "SIGTERM")
+            previous(signum, frame)
+
+        try:
+            signal.signal(signal.SIGTERM, on_sigterm)
+        except ValueError:
+            # Not the main thread (test clients)
+            logger.debug("SIGTERM drain not available in this thread")
+
+    def begin(self, reason: str):
+        """Stop taking requests and start draining; later calls are no-ops"""
+        if self.draining:
+            return
+        self.draining = True
+        self.started = time.monotonic()
+        logger.warning(f"Shutdown ({reason}): draining {len(self.requests)} requests and "
+                       f"{len(self.tasks)} background tasks, deadline {self.drain_timeout}s")
+        self._drain = asyncio.get_running_loop().create_task(self._wait_drained(reason))
+
+    async def _wait_drained(self, reason: str) -> DrainReport:
+        requests, tasks = len(self.requests), len(self.tasks)
+        deadline = self.started + self.drain_timeout
+        while (self.requests or self.tasks) and time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+
+        now = time.monotonic()
+        leftover_requests = list(self.requests.values())
+        leftover_tasks = dict(self.tasks)
+        unfinished = tuple(
+            [f"{request.method} {request.path} (running {now - request.started:.1f}s)" for request in leftover_requests]
+            + [f"task {name}" for name in leftover_tasks.values()]
+        )
+        for request in leftover_requests:
+            if request.task is not None:
+                request.task.cancel()
+        for task in leftover_tasks:
+            task.cancel()
+        await asyncio.gather(*leftover_tasks, return_exceptions=True)
+
+        report = DrainReport(
+            reason=reason,
+            drain_seconds=round(now - self.started, 3),
+            requests_drained=max(0, requests - len(leftover_requests)),
+            tasks_drained=max(0, tasks - len(leftover_tasks)),
+            unfinished=unfinished,
+        )
+        if unfinished:
+            logger.error(f"Shutdown deadline of {self.drain_timeout}s passed, cancelled: {'; '.join(unfinished)}")
+        else:
+            logger.info(f"Drained {report.requests_drained} requests and {report.tasks_drained} background tasks "
+                        f"in {report.drain_seconds}s")
+        return report
+
+    async def shutdown(self, steps: Dict[str, Callable[[], Awaitable[Any]]]) -> DrainReport:
+        """Drain (unless SIGTERM already started it), then run the shutdown steps in order"""
+        self.begin("lifespan shutdown")
+        report = await self._drain
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for name, step in steps.items():
+            started = time.perf_counter()
+            try:
+                await step()
+                results[name] = {"ok": True}
+            except Exception as e:
+                results[name] = {"ok": False, "error": type(e).__name__}
+                logger.error(f"Shutdown step {name} failed: {e}")
+            results[name]["ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+        self.report = report._replace(steps=results, total_seconds=round(time.monotonic() - self.started, 3))
+        logger.info(f"Shutdown finished in {self.report.total_seconds}s "
+                    f"({len(self.report.unfinished)} unfinished): {results}")
+        return self.report
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "draining": self.draining,
+            "drain_timeout": self.drain_timeout,
+            "in_flight_requests": len(self.requests),
+            "oldest_request_seconds": round(max((now - r.started for r in self.requests.values()), default=0.0), 3),
+            "background_tasks": sorted(self.tasks.values()),
+            "refused_while_draining": self.refused,
+        }
+
+
+# Global instance
+shutdown_coordinator = ShutdownCoordinator(
+    drain_timeout=settings.shutdown_drain_timeout,
+    retry_after=settings.shutdown_retry_after,
+)
@@ -0,0 +1,151 @@
+"""
+Counter Store Snapshots
+- Rate-limit and session request counters are written to a compact binary
+  file periodically and on shutdown, and restored on startup
+- File: header + fixed-width records, written to a temp file and swapped
+  in with os.replace so readers never see a partial snapshot
+- Expired windows are dropped on save and on restore
+- Workers sharing a snapshot merge under a file lock (highest count wins)
+
+Sessions themselves need no snapshot: keys are signed and carry their
+expiry, so a restarted worker adopts them on first use.
+"""
+
+import asyncio
+import fcntl
+import gc
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from app.config import settings
+from app.services.counter_store import RECORD, Record, counter_store
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<4sIdQ")  # magic, version, written at, record count
+MAGIC = b"EZYS"
+VERSION = 1
+
+
+def read_snapshot(path: Path) -> Iterable[Record]:
+    """Records from a snapshot file, or nothing when it is missing or unreadable"""
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return []
+
+    if len(data) < HEADER.size:
+        logger.warning(f"Ignoring truncated counter snapshot {path}")
+        return []
+    magic, version, _, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or len(data) != HEADER.size + count * RECORD.size:
+        logger.warning(f"Ignoring incompatible counter snapshot {path}")
+        return []
+
+    return RECORD.iter_unpack(memoryview(data)[HEADER.size:])
+
+
+def write_snapshot(path: Path, records: List[Record]):
+    """Write atomically: temp file, fsync, rename over the old snapshot"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    with open(tmp_path, "wb") as snapshot:
+        snapshot.write(HEADER.pack(MAGIC, VERSION, time.time(), len(records)))
+        snapshot.write(b"".join([RECORD.pack(*record) for record in records]))
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(tmp_path, path)
+
+
+class StateSnapshotService:
+    """Periodic and shutdown snapshots of the counter store"""
+
+    def __init__(self, store, path: str, interval: float):
+        self.store = store
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(f"{self.path.name}.lock")
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.last_saved_at: Optional[float] = None
+        self.last_saved_records = 0
+
+    def _locked(self, operation):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return operation()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def restore(self) -> int:
+        """Load live records into the store (call before serving)"""
+        started = time.perf_counter()
+        gc_was_enabled = gc.isenabled()
+        # Millions of small lists would otherwise trigger repeated full collections
+        gc.disable()
+        try:
+            restored = self._locked(lambda: self.store.load(read_snapshot(self.path)))
+        except OSError as e:
+            logger.error(f"Failed to restore counter snapshot {self.path}: {e}")
+            return 0
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        logger.info(f"Restored {restored} counters from {self.path} in {time.perf_counter() - started:.3f}s")
+        return restored
+
+    def _save(self, records: List[Record]) -> int:
+        def merge_and_write():
+            merged = records
+            if settings.web_concurrency > 1 and not self.store.shared:
+                # Other workers' counters live only in their snapshots; keep the higher count
+                now = time.time()
+                combined = {record[0]: record for record in read_snapshot(self.path) if record[2] > now}
+                for record in records:
+                    existing = combined.get(record[0])
+                    if existing is None or existing[3] < record[3]:
+                        combined[record[0]] = record
+                merged = list(combined.values())
+            write_snapshot(self.path, merged)
+            return len(merged)
+
+        return self._locked(merge_and_write)
+
+    async def save(self):
+        """Copy live records on the loop, pack and write them in a thread"""
+        records = self.store.records()
+        try:
+            self.last_saved_records = await asyncio.to_thread(self._save, records)
+            self.last_saved_at = time.time()
+        except OSError as e:
+            logger.error(f"Failed to write counter snapshot {self.path}: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic task and write a final snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.save()
+
+
+# Global instance
+state_snapshot_service = StateSnapshotService(
+    counter_store, settings.state_snapshot_path, settings.state_snapshot_interval
+)
@@ -0,0 +1,207 @@
+"""
+Outbound Rate and Concurrency Limiter for Stripe API Calls
+- Token bucket keeps us under Stripe's per-account request rate
+- Concurrency cap bounds parallel in-flight calls
+- Waiters queue by priority (payment path first) with a bounded wait
+- Queue-wait latency is tracked separately from Stripe latency
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.config import Settings, settings
+from app.services.circuit_breaker import DependencyUnavailableError
+from app.services.runtime_config import ConfigSnapshot, runtime_config
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+PRIORITY_PAYMENT = 0  # customer lookup/creation, intents, prices, subscriptions
+PRIORITY_PORTAL = 1  # billing portal sessions
+PRIORITY_BACKGROUND = 2  # list/export style calls
+
+PRIORITY_NAMES = {
+    PRIORITY_PAYMENT: "payment",
+    PRIORITY_PORTAL: "portal",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+class LimiterTimeoutError(DependencyUnavailableError):
+    """Waited longer than allowed for an outbound slot"""
+
+
+class OutboundLimiter:
+    """Token bucket + concurrency limiter with a priority wait queue"""
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrency: int, max_wait: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.in_flight = 0
+
+        # (priority, sequence, future)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.acquired = 0
+        self.timeouts = 0
+        self.queue_waits: Dict[int, Deque[float]] = {
+            priority: deque(maxlen=1000) for priority in PRIORITY_NAMES
+        }
+
+    def configure(self, rate: float, burst: int, max_concurrency: int, max_wait: float):
+        """Change the limits in place; queued callers keep their place"""
+        self._refill()
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.tokens = min(self.tokens, float(burst))
+        if self._waiters:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            # A higher concurrency cap may let queued callers in right away
+            self._dispatch()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def _can_grant(self) -> bool:
+        self._refill()
+        return self.in_flight < self.max_concurrency and self.tokens >= 1
+
+    def _grant(self):
+        self.tokens -= 1
+        self.in_flight += 1
+        self.acquired += 1
+
+    def _schedule_refill(self):
+        """Wake the queue up again once the next token is available"""
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is loop:
+            return
+        delay = max(0.001, (1 - self.tokens) / self.rate)
+        self._timer = loop.call_later(delay, self._on_timer)
+        self._timer_loop = loop
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand slots to queued waiters in priority order"""
+        while self._waiters:
+            _, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= self.max_concurrency:
+                return
+            if not self._can_grant():
+                self._schedule_refill()
+                return
+            heapq.heappop(self._waiters)
+            self._grant()
+            future.set_result(None)
+
+    async def acquire(self, priority: int = PRIORITY_PAYMENT, max_wait: Optional[float] = None):
+        """Wait for a slot, raising LimiterTimeoutError after max_wait seconds"""
+        started = time.monotonic()
+
+        if not self._waiters and self._can_grant():
+            self._grant()
+            self.queue_waits[priority].append(0.0)
+            return
+
+        max_wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(future, timeout=max_wait)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"{self.name} limiter: {PRIORITY_NAMES[priority]} call waited more than {max_wait:.2f}s")
+            raise LimiterTimeoutError(self.name, 1, f"{self.name} outbound queue is full")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+        self.queue_waits[priority].append(time.monotonic() - started)
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_PAYMENT, max_wait: Optional[float] = None):
+        await self.acquire(priority, max_wait)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refill()
+        queue_wait = {}
+        for priority, waits in self.queue_waits.items():
+            samples = sorted(waits)
+            if samples:
+                queue_wait[PRIORITY_NAMES[priority]] = {
+                    "samples": len(samples),
+                    "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+                    "max_ms": round(samples[-1] * 1000, 2),
+                }
+
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": sum(1 for _, _, future in self._waiters if not future.done()),
+            "tokens": round(self.tokens, 2),
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "queue_wait": queue_wait,
+        }
+
+
+def stripe_limits(config: Settings) -> Dict[str, Any]:
+    """Limiter parameters for this worker; Stripe's limit is per account, so
+    each worker gets its share of the rate"""
+    return {
+        "rate": config.stripe_rate_limit / settings.web_concurrency,
+        "burst": max(1, config.stripe_rate_burst // settings.web_concurrency),
+        "max_concurrency": config.stripe_max_concurrency,
+        "max_wait": config.stripe_max_queue_wait,
+    }
+
+
+def _reconfigure(snapshot: ConfigSnapshot):
+    stripe_limiter.configure(**stripe_limits(snapshot.settings))
+
+
+# Global instance shared by every StripeService
+stripe_limiter = OutboundLimiter("stripe", **stripe_limits(runtime_config.current.settings))
+runtime_config.subscribe(_reconfigure)
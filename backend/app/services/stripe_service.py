@@ -1,21 +1,69 @@
+import asyncio
+import time
 import stripe
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional, Callable
 from app.models.payment import PaymentRequest, PaymentType, Currency
 from app.config import settings
+from app.services.circuit_breaker import get_circuit_breaker
+from app.services.http_clients import configure_stripe
+from app.services.portal_cache import portal_cache
+from app.services.stripe_limiter import PRIORITY_BACKGROUND, PRIORITY_PAYMENT, PRIORITY_PORTAL, stripe_limiter
+from app.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# email -> Stripe customer, kept fresh by customer.* webhook events
+customer_cache = TTLCache(maxsize=settings.customer_cache_size, ttl=settings.customer_cache_ttl)
+
 
 class StripeService:
     def __init__(self):
-        stripe.api_key = settings.stripe_secret_key
+        configure_stripe()
+        self.breaker = get_circuit_breaker("stripe")
+        self.limiter = stripe_limiter
+    
+    async def _call(self, func: Callable, timeout: Optional[float] = None, priority: int = PRIORITY_PAYMENT, **params) -> Any:
+        """Run a blocking Stripe SDK call off the event loop, behind the limiter and circuit breaker
+        
+        A timeout only stops the waiting: the thread keeps going and may still
+        create the object, so its limiter slot is released when the thread
+        returns, not when the caller gives up.
+        """
+        timeout = timeout or settings.stripe_timeout
+        started = time.monotonic()
+        
+        await self.limiter.acquire(priority, max_wait=timeout)
+        call: Optional[asyncio.Future] = None
+        
+        def start():
+            nonlocal call
+            call = asyncio.ensure_future(asyncio.to_thread(func, **params))
+            call.add_done_callback(lambda _: self.limiter.release())
+            return asyncio.shield(call)
+        
+        try:
+            return await self.breaker.call(start, timeout=max(0.001, timeout - (time.monotonic() - started)))
+        finally:
+            if call is None:
+                # Rejected by the breaker before the thread started
+                self.limiter.release()
     
-    async def create_customer(self, name: str, email: str, phone: Optional[str] = None) -> Dict[str, Any]:
+    @staticmethod
+    def _idempotency(key: Optional[str], stage: str) -> Dict[str, str]:
+        """Stripe idempotency key for one create call of a payment, so a repeated call returns the first object"""
+        return {"idempotency_key": f"{key}-{stage}"} if key else {}
+    
+    async def create_customer(self, name: str, email: str, phone: Optional[str] = None, timeout: Optional[float] = None, priority: int = PRIORITY_PAYMENT, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """Create or retrieve Stripe customer"""
         try:
+            cached = customer_cache.get(email)
+            if cached is not None:
+                logger.info(f"Retrieved cached customer: {cached.id}")
+                return {"success": True, "customer": cached}
+            
             # Check if customer already exists
-            customers = stripe.Customer.list(email=email, limit=1)
+            customers = await self._call(stripe.Customer.list, timeout, priority, email=email, limit=1)
             
             if customers.data:
                 customer = customers.data[0]
@@ -29,19 +77,24 @@ class StripeService:
                 if phone:
                     customer_data["phone"] = phone
                 
-                customer = stripe.Customer.create(**customer_data)
+                customer = await self._call(stripe.Customer.create, timeout, priority, **customer_data,
+                                            **self._idempotency(idempotency_key, "customer"))
                 logger.info(f"Created new customer: {customer.id}")
             
+            customer_cache.set(email, customer)
             return {"success": True, "customer": customer}
             
         except stripe.error.StripeError as e:
             logger.error(f"Stripe customer error: {e}")
             return {"success": False, "error": str(e)}
     
-    async def create_payment_intent(self, payment_request: PaymentRequest, customer_id: str) -> Dict[str, Any]:
+    async def create_payment_intent(self, payment_request: PaymentRequest, customer_id: str, timeout: Optional[float] = None, priority: int = PRIORITY_PAYMENT, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """Create one-time payment intent"""
         try:
-            payment_intent = stripe.PaymentIntent.create(
+            payment_intent = await self._call(
+                stripe.PaymentIntent.create,
+                timeout,
+                priority,
                 amount=payment_request.amount,
                 currency=payment_request.currency.value,
                 customer=customer_id,
@@ -49,8 +102,10 @@ class StripeService:
                 metadata={
                     "customer_name": payment_request.name,
                     "customer_email": payment_request.email,
-                    "payment_type": payment_request.payment_type.value
-                }
+                    "payment_type": payment_request.payment_type.value,
+                    "language": payment_request.language or "pt"
+                },
+                **self._idempotency(idempotency_key, "payment-intent")
             )
             
             logger.info(f"Created payment intent: {payment_intent.id}")
@@ -64,23 +119,30 @@ class StripeService:
             logger.error(f"Payment intent error: {e}")
             return {"success": False, "error": str(e)}
     
-    async def create_subscription(self, payment_request: PaymentRequest, customer_id: str) -> Dict[str, Any]:
+    async def create_subscription(self, payment_request: PaymentRequest, customer_id: str, timeout: Optional[float] = None, priority: int = PRIORITY_PAYMENT, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """Create recurring subscription"""
         try:
             # Create price for the subscription
             interval = "month" if payment_request.payment_type == PaymentType.MONTHLY else "year"
             
-            price = stripe.Price.create(
+            price = await self._call(
+                stripe.Price.create,
+                timeout,
+                priority,
                 unit_amount=payment_request.amount,
                 currency=payment_request.currency.value,
                 recurring={"interval": interval},
                 product_data={
                     "name": f"Ezyba Service - {payment_request.name}",
-                }
+                },
+                **self._idempotency(idempotency_key, "price")
             )
             
             # Create subscription
-            subscription = stripe.Subscription.create(
+            subscription = await self._call(
+                stripe.Subscription.create,
+                timeout,
+                priority,
                 customer=customer_id,
                 items=[{"price": price.id}],
                 payment_behavior="default_incomplete",
@@ -89,8 +151,10 @@ class StripeService:
                 metadata={
                     "customer_name": payment_request.name,
                     "customer_email": payment_request.email,
-                    "payment_type": payment_request.payment_type.value
-                }
+                    "payment_type": payment_request.payment_type.value,
+                    "language": payment_request.language or "pt"
+                },
+                **self._idempotency(idempotency_key, "subscription")
             )
             
             logger.info(f"Created subscription: {subscription.id}")
@@ -104,10 +168,18 @@ class StripeService:
             logger.error(f"Subscription error: {e}")
             return {"success": False, "error": str(e)}
     
-    async def create_customer_portal_session(self, customer_id: str, return_url: str) -> Dict[str, Any]:
-        """Create customer portal session for subscription management"""
+    async def create_customer_portal_session(self, customer_id: str, return_url: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Customer portal session for subscription management, reused briefly per customer and return URL"""
+        return await portal_cache.get_or_create(
+            customer_id, return_url, lambda: self._create_portal_session(customer_id, return_url, timeout)
+        )
+    
+    async def _create_portal_session(self, customer_id: str, return_url: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         try:
-            session = stripe.billing_portal.Session.create(
+            session = await self._call(
+                stripe.billing_portal.Session.create,
+                timeout,
+                priority=PRIORITY_PORTAL,
                 customer=customer_id,
                 return_url=return_url,
             )
@@ -117,4 +189,42 @@ class StripeService:
             
         except stripe.error.StripeError as e:
             logger.error(f"Portal session error: {e}")
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            return {"success": False, "error": str(e)}
+    
+    async def list_pages(self, resource: Any, page_size: int = 100, prefetch: int = 2, **params) -> AsyncIterator[List[Any]]:
+        """Every page of a Stripe list endpoint, newest first
+        
+        Same cursor walk as auto_paging_iter, but each page goes through the
+        limiter (background priority) and circuit breaker. A producer task
+        fetches ahead into a queue of `prefetch` pages: the next page is in
+        flight while the caller handles the current one, and a slow caller
+        stops the fetching, so memory stays bounded whatever the export size.
+        """
+        pages: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+        
+        async def produce():
+            cursor: Dict[str, Any] = {}
+            try:
+                while True:
+                    page = await self._call(resource.list, priority=PRIORITY_BACKGROUND, limit=page_size, **params, **cursor)
+                    await pages.put(page.data)
+                    if not page.has_more or not page.data:
+                        break
+                    cursor = {"starting_after": page.data[-1].id}
+                await pages.put(None)
+            except Exception as e:
+                await pages.put(e)
+        
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                page = await pages.get()
+                if page is None:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            # Also runs when the client disconnects mid-export
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
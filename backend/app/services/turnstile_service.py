@@ -1,29 +1,105 @@
+import hashlib
 import httpx
 import logging
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 from app.config import settings
+from app.services.circuit_breaker import DependencyUnavailableError, get_circuit_breaker
+from app.services.http_clients import get_turnstile_client
+from app.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# What siteverify answers for a token it has already seen
+SPENT_TOKEN = {
+    "success": False,
+    "error": "Invalid turnstile token",
+    "error_codes": ["timeout-or-duplicate"]
+}
+
+# Failures that verdict the token itself; anything else (internal-error,
+# bad secret, ...) may pass on retry and is never cached
+DEFINITIVE_ERROR_CODES = frozenset({"invalid-input-response", "timeout-or-duplicate"})
+
+
+class TokenReplayCache:
+    """Siteverify outcomes by token hash, so a token is only ever sent once
+
+    Rejected and already-used tokens are answered locally. A successful
+    verification is bound to the session that submitted it: the same
+    session retrying within retry_window gets the stored success, any
+    other use of the token is a replay.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, retry_window: float):
+        # token hash -> (result, session_key, verified_at)
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.retry_window = retry_window
+        self.replays_rejected = 0
+        self.retries_allowed = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def lookup(self, token: str, session_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Known outcome for token, or None if siteverify has to be asked"""
+        entry = self.entries.get(self._key(token))
+        if entry is None:
+            return None
+
+        result, bound_session, verified_at = entry
+        if result["success"] and session_key and session_key == bound_session \
+                and time.monotonic() - verified_at < self.retry_window:
+            self.retries_allowed += 1
+            return result
+
+        self.replays_rejected += 1
+        return result if not result["success"] else SPENT_TOKEN
+
+    def remember(self, token: str, result: Dict[str, Any], session_key: Optional[str] = None):
+        self.entries.set(self._key(token), (result, session_key, time.monotonic()))
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.entries.stats(),
+            "replays_rejected": self.replays_rejected,
+            "retries_allowed": self.retries_allowed,
+        }
+
 
 class TurnstileService:
     """Service for validating Cloudflare Turnstile tokens"""
     
-    VERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
-    
     def __init__(self):
+        self.verify_url = settings.turnstile_verify_url
+        self.breaker = get_circuit_breaker("turnstile")
         self.secret_key = getattr(settings, 'turnstile_secret_key', None)
         logger.info(f"Turnstile secret key loaded: {self.secret_key[:10]}..." if self.secret_key else "No secret key")
         if not self.secret_key:
             logger.warning("Turnstile secret key not configured")
     
-    async def verify_token(self, token: str, remote_ip: str = None) -> Dict[str, Any]:
+    async def _siteverify(self, data: Dict[str, str], timeout: float) -> httpx.Response:
+        """POST to siteverify, server errors raise so they count against the breaker"""
+        response = await get_turnstile_client().post(self.verify_url, data=data, timeout=timeout)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response
+    
+    async def verify_token(self, token: str, remote_ip: str = None, timeout: Optional[float] = None,
+                           session_key: Optional[str] = None) -> Dict[str, Any]:
         """
         Verify Turnstile token with Cloudflare
         
         Args:
             token: Turnstile token from frontend
             remote_ip: Client IP address (optional)
+            timeout: Seconds allowed for the siteverify call (optional)
+            session_key: Checkout session submitting the token (optional);
+                lets that session retry with the same token without a second call
             
         Returns:
             Dict with success status and details
@@ -51,6 +127,11 @@ class TurnstileService:
                 "error": "Missing turnstile token"
             }
         
+        known = token_cache.lookup(token, session_key)
+        if known is not None:
+            logger.info(f"Turnstile token already verified: success={known['success']}")
+            return known
+        
         try:
             data = {
                 "secret": self.secret_key,
@@ -60,38 +141,45 @@ class TurnstileService:
             if remote_ip:
                 data["remoteip"] = remote_ip
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.VERIFY_URL,
-                    data=data,
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Turnstile API error: {response.status_code}")
-                    return {
-                        "success": False,
-                        "error": "Turnstile verification failed"
-                    }
-                
-                result = response.json()
+            timeout = timeout or settings.turnstile_timeout
+            response = await self.breaker.call(
+                lambda: self._siteverify(data, timeout),
+                timeout=timeout
+            )
+            
+            if response.status_code != 200:
+                logger.error(f"Turnstile API error: {response.status_code}")
+                return {
+                    "success": False,
+                    "error": "Turnstile verification failed"
+                }
+            
+            result = response.json()
+            
+            if result.get("success", False):
+                logger.info("Turnstile verification successful")
+                verified = {
+                    "success": True,
+                    "challenge_ts": result.get("challenge_ts"),
+                    "hostname": result.get("hostname")
+                }
+            else:
+                error_codes = result.get("error-codes", [])
+                logger.warning(f"Turnstile verification failed: {error_codes}")
+                verified = {
+                    "success": False,
+                    "error": "Invalid turnstile token",
+                    "error_codes": error_codes
+                }
+            
+            # Only definite answers are remembered; timeouts, API errors and
+            # non-definitive error codes can be retried
+            if verified["success"] or DEFINITIVE_ERROR_CODES.intersection(verified["error_codes"]):
+                token_cache.remember(token, verified, session_key)
+            return verified
                 
-                if result.get("success", False):
-                    logger.info("Turnstile verification successful")
-                    return {
-                        "success": True,
-                        "challenge_ts": result.get("challenge_ts"),
-                        "hostname": result.get("hostname")
-                    }
-                else:
-                    error_codes = result.get("error-codes", [])
-                    logger.warning(f"Turnstile verification failed: {error_codes}")
-                    return {
-                        "success": False,
-                        "error": "Invalid turnstile token",
-                        "error_codes": error_codes
-                    }
-                    
+        except DependencyUnavailableError:
+            raise
         except httpx.TimeoutException:
             logger.error("Turnstile verification timeout")
             return {
@@ -103,4 +191,12 @@ class TurnstileService:
             return {
                 "success": False,
                 "error": "Turnstile verification failed"
-            }
\ No newline at end of file
+            }
+
+
+# Global instance
+token_cache = TokenReplayCache(
+    maxsize=settings.turnstile_cache_size,
+    ttl=settings.turnstile_token_ttl,
+    retry_window=settings.turnstile_retry_window,
+)
@@ -0,0 +1,88 @@
+"""
+Startup Warm-up
+- Pays cold-start costs before the first request is served
+- Opens and primes pooled connections to Stripe, Turnstile and Mailtrap
+- Compiles email templates (settings-derived lookups are built with the
+  runtime config snapshot at import)
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict
+
+from app.config import settings
+from app.services.http_clients import (
+    get_mailtrap_session,
+    get_stripe_session,
+    get_turnstile_client,
+    mailtrap_api_base,
+    stripe_api_base,
+)
+from app.templates.email_templates import compile_email_templates
+
+logger = logging.getLogger(__name__)
+
+
+def _prime_stripe_connection() -> int:
+    """Open a keep-alive TLS connection to the Stripe API"""
+    response = get_stripe_session().get(stripe_api_base(), timeout=5)
+    return response.status_code
+
+
+def _prime_mailtrap_connection() -> int:
+    """Open a keep-alive TLS connection to the Mailtrap sending API"""
+    session = get_mailtrap_session()
+    if session is None:
+        return 0  # stock client, its connection opens on the first email
+    response = session.get(mailtrap_api_base(), timeout=5)
+    return response.status_code
+
+
+async def _prime_turnstile_connection() -> int:
+    """Open a keep-alive TLS connection to Cloudflare Turnstile"""
+    response = await get_turnstile_client().get(settings.turnstile_verify_url, timeout=5)
+    return response.status_code
+
+
+async def _timed_step(name: str, step: Callable, results: Dict[str, Any]):
+    started = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(step):
+            value = await step()
+        else:
+            value = await asyncio.to_thread(step)
+        results[name] = {"ok": True, "result": value}
+    except Exception as e:
+        results[name] = {"ok": False, "error": type(e).__name__}
+        logger.warning(f"Warm-up step {name} failed: {e}")
+    results[name]["ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+
+async def run_warmup(budget: float = None) -> Dict[str, Any]:
+    """Run all warm-up steps concurrently within the time budget"""
+    budget = settings.warmup_budget if budget is None else budget
+    results: Dict[str, Any] = {}
+
+    steps = {
+        "email_templates": compile_email_templates,
+        "stripe_connection": _prime_stripe_connection,
+        "turnstile_connection": _prime_turnstile_connection,
+    }
+    if settings.environment != "development":
+        steps["mailtrap_connection"] = _prime_mailtrap_connection
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(_timed_step(name, step, results)) for name, step in steps.items()]
+    done, pending = await asyncio.wait(tasks, timeout=budget)
+    for task in pending:
+        task.cancel()
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    unfinished = [name for name in steps if name not in results]
+
+    if unfinished:
+        logger.warning(f"Warm-up budget of {budget}s exceeded, unfinished steps: {unfinished}")
+    logger.info(f"Warm-up finished in {elapsed_ms}ms: {results}")
+
+    return {"elapsed_ms": elapsed_ms, "steps": results, "unfinished": unfinished}
@@ -0,0 +1,212 @@
+"""
+Stripe Webhook Ingestion
+- Verifies the Stripe-Signature header and acknowledges immediately
+- Events go into a bounded queue drained by a small worker pool
+- Duplicate deliveries are dropped using a bounded LRU of event ids; the LRU
+  is per process, so a redelivery that reaches another worker is handled
+  again (ledger updates are idempotent, emails are claimed in the ledger)
+- A payment intent can fail several times (one event per declined attempt);
+  its failure email is sent once
+- Handlers send confirmation emails, keep the customer cache fresh and
+  move ledger rows to succeeded/failed
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import stripe
+
+from app.config import settings
+from app.models.payment import Currency, PaymentRequest, PaymentType
+from app.services.email_factory import get_email_service
+from app.services.ledger import FAILED, SUCCEEDED, ledger
+from app.services.stripe_service import customer_cache
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ENQUEUED = "enqueued"
+DUPLICATE = "duplicate"
+QUEUE_FULL = "queue_full"
+
+
+class WebhookService:
+    """Bounded async processing of verified Stripe webhook events"""
+
+    def __init__(self):
+        self.secret = settings.stripe_webhook_secret
+        self.worker_count = settings.webhook_workers
+        self.queue_size = settings.webhook_queue_size
+        self.seen_events = TTLCache(maxsize=settings.webhook_dedup_size)
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+        self.handlers = {
+            "payment_intent.succeeded": self._handle_payment_intent_succeeded,
+            "payment_intent.payment_failed": self._handle_payment_intent_failed,
+            "invoice.paid": self._handle_invoice_paid,
+            "customer.created": self._handle_customer_updated,
+            "customer.updated": self._handle_customer_updated,
+            "customer.deleted": self._handle_customer_deleted,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret)
+
+    def verify(self, payload: bytes, signature: str) -> Dict[str, Any]:
+        """Verify the signature and decode the event (raises on bad signature)"""
+        stripe.WebhookSignature.verify_header(payload.decode("utf-8"), signature, self.secret)
+        return json.loads(payload)
+
+    def enqueue(self, event: Dict[str, Any]) -> str:
+        """Queue a verified event without waiting, dropping duplicates"""
+        self.received += 1
+        event_id = event.get("id")
+
+        if event_id in self.seen_events:
+            self.duplicates += 1
+            return DUPLICATE
+
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Webhook queue full, rejecting event {event_id}")
+            return QUEUE_FULL
+
+        self.seen_events.set(event_id, True)
+        return ENQUEUED
+
+    async def _worker(self):
+        while True:
+            event = await self.queue.get()
+            try:
+                await self.handle(event)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                # Forget the id so a manual resend from the dashboard is processed
+                self.seen_events.pop(event.get("id"))
+                logger.error(f"Webhook event {event.get('id')} ({event.get('type')}) failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def handle(self, event: Dict[str, Any]):
+        handler = self.handlers.get(event.get("type"))
+        if handler is not None:
+            await handler(event["data"]["object"])
+
+    def start(self):
+        """Start the worker pool on the running event loop"""
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self, timeout: float = 10.0):
+        """Drain queued events within timeout, then stop the workers"""
+        if self.queue is not None and self._workers:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Webhook queue not drained on shutdown: {self.queue.qsize()} events left")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "workers": len(self._workers),
+        }
+
+    # Handlers
+
+    def _payment_request_from(self, metadata: Dict[str, Any], amount: int, currency: str) -> Optional[PaymentRequest]:
+        """Rebuild the fields the email templates need from Stripe metadata"""
+        if not metadata.get("customer_email"):
+            return None
+
+        return PaymentRequest.model_construct(
+            name=metadata.get("customer_name", ""),
+            email=metadata["customer_email"],
+            phone=None,
+            amount=amount,
+            currency=Currency(currency),
+            payment_type=PaymentType(metadata.get("payment_type", PaymentType.ONE_TIME.value)),
+            language=metadata.get("language", "pt"),
+        )
+
+    async def _send_confirmation(self, obj: Dict[str, Any], metadata: Dict[str, Any], amount: int, success: bool):
+        payment_request = self._payment_request_from(metadata, amount, obj["currency"])
+        if payment_request is None:
+            logger.info(f"Skipping confirmation for {obj.get('id')}: no customer metadata")
+            return
+
+        await get_email_service().send_payment_confirmation(payment_request, obj["id"], success)
+
+    @staticmethod
+    async def _first_notice(stripe_id: str, kind: str) -> bool:
+        """Claim the kind email for stripe_id across workers; sends anyway if the ledger is unwritable"""
+        try:
+            return await asyncio.to_thread(ledger.claim_notice, stripe_id, kind)
+        except sqlite3.Error as e:
+            logger.error(f"Could not claim {kind} notice for {stripe_id}: {e}")
+            return True
+
+    async def _handle_payment_intent_succeeded(self, intent: Dict[str, Any]):
+        ledger.update_status(intent["id"], SUCCEEDED)
+        # Subscription payments are confirmed by invoice.paid
+        if intent.get("invoice"):
+            return
+        await self._send_confirmation(intent, intent.get("metadata") or {}, intent["amount"], True)
+
+    async def _handle_payment_intent_failed(self, intent: Dict[str, Any]):
+        ledger.update_status(intent["id"], FAILED)
+        if intent.get("invoice"):
+            return
+        if not await self._first_notice(intent["id"], FAILED):
+            logger.info(f"Failure notice for {intent['id']} already sent")
+            return
+        await self._send_confirmation(intent, intent.get("metadata") or {}, intent["amount"], False)
+
+    async def _handle_invoice_paid(self, invoice: Dict[str, Any]):
+        if invoice.get("billing_reason") != "subscription_create":
+            return
+        metadata = (invoice.get("subscription_details") or {}).get("metadata") or {}
+        subscription = {"id": invoice.get("subscription") or invoice["id"], "currency": invoice["currency"]}
+        ledger.update_status(subscription["id"], SUCCEEDED)
+        await self._send_confirmation(subscription, metadata, invoice["amount_paid"], True)
+
+    async def _handle_customer_updated(self, customer: Dict[str, Any]):
+        if customer.get("email"):
+            customer_cache.set(customer["email"], stripe.Customer.construct_from(customer, stripe.api_key))
+
+    async def _handle_customer_deleted(self, customer: Dict[str, Any]):
+        if customer.get("email"):
+            customer_cache.pop(customer["email"])
+
+
+# Global instance
+webhook_service = WebhookService()
@@ -1,5 +1,9 @@
 """Email templates for different languages with professional design"""
 
+from functools import lru_cache
+
+from jinja2 import Template
+
 # Base template with logo and professional styling
 BASE_EMAIL_TEMPLATE = """
 <!DOCTYPE html>
@@ -171,4 +175,74 @@ EMAIL_TEMPLATES = {
             "yearly": "Yearly subscription"
         }
     }
-}
\ No newline at end of file
+}
+
+# Admin notification (SMTP / Mailpit)
+SMTP_ADMIN_EMAIL_TEMPLATE = """
+        <html>
+        <body style="font-family: Arial, sans-serif;">
+            <h2>{{ 'Novo Pagamento Recebido' if success else 'Falha no Pagamento' }} - {{ company_name }}</h2>
+            
+            <div style="background: #f5f5f5; padding: 20px; border-radius: 5px;">
+                <h3>Informações do Cliente:</h3>
+                <p><strong>Nome:</strong> {{ name }}</p>
+                <p><strong>Email:</strong> {{ email }}</p>
+                {% if phone %}<p><strong>Telefone:</strong> {{ phone }}</p>{% endif %}
+                <p><strong>Idioma:</strong> {{ language }}</p>
+                
+                <h3>Detalhes do Pagamento:</h3>
+                <p><strong>Valor:</strong> {{ amount_display }}</p>
+                <p><strong>Moeda:</strong> {{ currency }}</p>
+                <p><strong>Tipo:</strong> {{ payment_type_display }}</p>
+                <p><strong>ID do Pagamento:</strong> {{ payment_id }}</p>
+                <p><strong>Status:</strong> {{ 'SUCESSO' if success else 'FALHA' }}</p>
+            </div>
+        </body>
+        </html>
+        """
+
+# Admin notification (Mailtrap API)
+MAILTRAP_ADMIN_EMAIL_TEMPLATE = """
+        <html>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #333;">{{ 'Novo Pagamento Recebido' if success else 'Falha no Pagamento' }} 💳</h2>
+            
+            <div style="background: #f8f9fa; border-left: 4px solid {{ '#28a745' if success else '#dc3545' }}; padding: 20px; margin: 20px 0;">
+                <h3 style="margin-top: 0; color: #333;">👤 Informações do Cliente:</h3>
+                <p><strong>Nome:</strong> {{ name }}</p>
+                <p><strong>Email:</strong> {{ email }}</p>
+                {% if phone %}<p><strong>Telefone:</strong> {{ phone }}</p>{% endif %}
+                <p><strong>Idioma:</strong> {{ language }}</p>
+                
+                <h3 style="color: #333;">💰 Detalhes do Pagamento:</h3>
+                <p><strong>Valor:</strong> {{ amount_display }}</p>
+                <p><strong>Moeda:</strong> {{ currency }}</p>
+                <p><strong>Tipo:</strong> {{ payment_type_display }}</p>
+                <p><strong>ID:</strong> <code>{{ payment_id }}</code></p>
+                <p><strong>Status:</strong> <span style="color: {{ '#28a745' if success else '#dc3545' }}; font-weight: bold;">{{ 'SUCESSO ✅' if success else 'FALHA ❌' }}</span></p>
+            </div>
+            
+            <p style="color: #666; font-size: 14px;">Email automático do sistema de pagamentos</p>
+        </body>
+        </html>
+        """
+
+
+@lru_cache(maxsize=None)
+def get_template(source: str) -> Template:
+    """Compile a template source once and reuse the compiled template"""
+    return Template(source)
+
+
+def compile_email_templates() -> int:
+    """Precompile every email template, returns the number compiled"""
+    sources = [BASE_EMAIL_TEMPLATE, SMTP_ADMIN_EMAIL_TEMPLATE, MAILTRAP_ADMIN_EMAIL_TEMPLATE]
+    for templates in EMAIL_TEMPLATES.values():
+        for template in templates.values():
+            if "content" in template:
+                sources.append(template["content"])
+
+    for source in sources:
+        get_template(source)
+
+    return len(sources)
@@ -0,0 +1,29 @@
+"""
+Fast JSON Responses
+- Dict results are rendered with orjson (app-wide default response class)
+- ModelResponse serializes a model the handler already built with
+  pydantic-core and is returned as-is, so FastAPI skips re-validating it
+  against response_model (which stays on the route for the OpenAPI schema)
+- static_json_body() serializes constant payloads once
+"""
+
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import Response
+
+__all__ = ["ORJSONResponse", "ModelResponse", "static_json_body"]
+
+
+class ModelResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, model: BaseModel, status_code: int = 200, headers: Optional[Dict[str, str]] = None):
+        super().__init__(content=to_json(model), status_code=status_code, headers=headers)
+
+
+def static_json_body(content: Any) -> bytes:
+    return orjson.dumps(content)
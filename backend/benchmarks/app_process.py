@@ -0,0 +1,124 @@
+"""
+Helpers to run the real backend in a subprocess for benchmarks
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+BENCH_ORIGIN = "http://localhost"
+BENCH_HEADERS = {"Origin": BENCH_ORIGIN, "User-Agent": "ezyba-bench/1.0"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_env(standin_env: Dict[str, str], **overrides: str) -> Dict[str, str]:
+    """Production-mode settings wired to local stand-ins"""
+    env = dict(os.environ)
+    env.update({
+        "ENVIRONMENT": "production",
+        "API_KEY": "bench-api-key",
+        "STRIPE_PUBLISHABLE_KEY": "pk_bench",
+        "STRIPE_SECRET_KEY": "sk_bench",
+        "TURNSTILE_SECRET_KEY": "bench-turnstile-secret",
+        "NOTIFICATION_EMAILS": "admin@example.com",
+        "MAILTRAP_API_TOKEN": "bench-token",
+        "SENDER_EMAIL": "noreply@example.com",
+        "SENDER_NAME": "Bench",
+        "COMPANY_NAME": "Bench",
+        "SUPPORT_EMAIL": "support@example.com",
+        "CORS_ORIGINS": BENCH_ORIGIN,
+        "ALLOWED_HOSTS": "localhost,127.0.0.1",
+        # Every benchmark client is 127.0.0.1: lift the per-IP budgets
+        "RATE_LIMIT_REQUESTS": "100000000",
+        "RATE_LIMIT_CONFIG_REQUESTS": "100000000",
+        "RATE_LIMIT_SESSION_REQUESTS": "100000000",
+        "RATE_LIMIT_CHECKOUT_REQUESTS": "100000000",
+        "RATE_LIMIT_CHECKOUT_SESSION_REQUESTS": "100000000",
+        "RATE_LIMIT_EMAIL_REQUESTS": "100000000",
+        "ADMISSION_PER_CLIENT": "100000",
+        "READINESS_PROBE_INTERVAL": "1",
+    })
+    env.update(standin_env)
+    env.update(overrides)
+    return env
+
+
+class AppProcess:
+    """Spawns uvicorn (or another server command) serving main:app"""
+
+    def __init__(self, env: Dict[str, str], port: Optional[int] = None,
+                 command: Optional[List[str]] = None):
+        self.port = port or free_port()
+        self.env = env
+        self.command = command or [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning",
+        ]
+        self.proc: Optional[subprocess.Popen] = None
+        self.spawned_at = 0.0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "AppProcess":
+        self.spawned_at = time.perf_counter()
+        self.proc = subprocess.Popen(
+            self.command, cwd=BACKEND_DIR, env=self.env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        return self
+
+    def wait_until(self, path: str = "/health", timeout: float = 60.0) -> float:
+        """Poll until path returns 200, returns seconds since spawn"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"App exited with code {self.proc.returncode}")
+            try:
+                if httpx.get(self.base_url + path, timeout=1.0).status_code == 200:
+                    return time.perf_counter() - self.spawned_at
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f"{path} not ready after {timeout}s")
+
+    def stop(self, timeout: float = 30.0):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    def __enter__(self) -> "AppProcess":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def payment_payload(index: int = 0, payment_type: str = "one_time") -> Dict:
+    return {
+        "name": f"Bench Customer {index}",
+        "email": f"bench{index}@example.com",
+        "phone": "+5511999999999",
+        "amount": 1000 + index % 100,
+        "currency": "brl",
+        "payment_type": payment_type,
+        "turnstile_token": f"token-{index}",
+        "language": "pt",
+    }
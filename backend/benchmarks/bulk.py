@@ -0,0 +1,127 @@
+"""
+Bulk payment creation benchmark
+Posts one bulk run (default 1000 rows, mixed one-time and subscriptions)
+to the real app against local stand-ins, once per concurrency level, and
+reports time to first result, total time, rows/s and Stripe calls made.
+
+The Stripe outbound limiter is lifted by default so the concurrency cap is
+what's measured; pass --stripe-rate to see a run under the production limit.
+
+Usage:
+    python benchmarks/bulk.py [--rows 1000] [--concurrency 1,8,32] [--stripe-latency 0.05]
+    python benchmarks/bulk.py --format csv --stripe-rate 20
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app_process import BENCH_HEADERS, AppProcess, bench_env  # noqa: E402
+from standins import StandInsProcess  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+PAYMENT_TYPES = ["one_time", "one_time", "one_time", "monthly", "yearly"]
+
+
+def make_rows(count: int) -> List[Dict[str, Any]]:
+    return [
+        {"name": f"Bulk Customer {index}", "email": f"bulk{index}@example.com", "amount": 1000 + index,
+         "currency": "brl" if index % 2 else "usd", "payment_type": PAYMENT_TYPES[index % len(PAYMENT_TYPES)]}
+        for index in range(count)
+    ]
+
+
+def encode(rows: List[Dict[str, Any]], fmt: str) -> tuple:
+    if fmt == "json":
+        return json.dumps(rows).encode(), "application/json"
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode(), "text/csv"
+
+
+def run_once(base_url: str, body: bytes, content_type: str, concurrency: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    first_result = None
+    summary: Dict[str, Any] = {}
+    results = 0
+
+    with httpx.Client(base_url=base_url, timeout=600.0) as client:
+        with client.stream("POST", "/api/v1/admin/payments/bulk", content=body,
+                           params={"concurrency": concurrency},
+                           headers={**BENCH_HEADERS, "Authorization": "Bearer bench-api-key",
+                                    "Content-Type": content_type}) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                if "summary" in item:
+                    summary = item["summary"]
+                    continue
+                results += 1
+                if first_result is None:
+                    first_result = time.perf_counter() - started
+
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "results": results,
+        "created": summary.get("created"),
+        "failed": summary.get("failed"),
+        "first_result_ms": round((first_result or 0) * 1000, 1),
+        "total_seconds": round(elapsed, 2),
+        "rows_per_second": round(results / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated levels")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--stripe-latency", type=float, default=0.05, help="seconds per stand-in Stripe call")
+    parser.add_argument("--stripe-rate", type=float, help="STRIPE_RATE_LIMIT for the app (default: unlimited)")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    body, content_type = encode(make_rows(args.rows), args.format)
+    rate = str(args.stripe_rate) if args.stripe_rate else "100000"
+
+    rows = []
+    with StandInsProcess(latency={"stripe": args.stripe_latency, "mailtrap": 0.01}) as standins, \
+            tempfile.TemporaryDirectory() as state_dir:
+        for concurrency in levels:
+            env = bench_env(standins.app_env(), BULK_CONCURRENCY=str(max(levels)), BULK_MAX_ROWS=str(args.rows),
+                            STRIPE_RATE_LIMIT=rate, STRIPE_RATE_BURST=rate, STRIPE_MAX_CONCURRENCY="1000",
+                            LEDGER_PATH=f"{state_dir}/ledger-{concurrency}.db", WARMUP_ENABLED="false")
+            with AppProcess(env) as app:
+                app.wait_until("/health")
+                row = run_once(app.base_url, body, content_type, concurrency)
+            rows.append(row)
+            print(f"concurrency {concurrency:>3}: {row['rows_per_second']:>7} rows/s  total {row['total_seconds']}s  "
+                  f"first result {row['first_result_ms']}ms  created {row['created']}  failed {row['failed']}")
+
+    result = {"rows": args.rows, "format": args.format, "stripe_latency": args.stripe_latency,
+              "stripe_rate": args.stripe_rate, "results": rows, "standin_requests": standins.final_counts}
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = RESULTS_DIR / f"bulk-{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Cold-start benchmark: time to first successful payment after a deploy
+
+Spawns the real app against local stand-ins with warm-up disabled and
+enabled, then measures:
+- listen: spawn -> /health answers
+- first_payment: latency of the first /config + /payments/create
+- total: spawn -> first successful payment
+
+Usage:
+    python benchmarks/cold_start.py [--runs 5] [--latency 0.05]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app_process import BENCH_HEADERS, AppProcess, bench_env, payment_payload  # noqa: E402
+from standins import StandIns  # noqa: E402
+
+
+def first_payment(base_url: str) -> float:
+    started = time.perf_counter()
+    with httpx.Client(base_url=base_url, headers=BENCH_HEADERS, timeout=30.0) as client:
+        config = client.get("/api/v1/payments/config")
+        config.raise_for_status()
+        session = client.post("/api/v1/payments/session")
+        session.raise_for_status()
+        session_key = session.json()["session_key"]
+        response = client.post("/api/v1/payments/create", json=payment_payload(),
+                               headers={"X-Session-Key": session_key})
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+def run_once(standins: StandIns, warmup: bool) -> dict:
+    env = bench_env(standins.app_env(), WARMUP_ENABLED=str(warmup).lower())
+    with AppProcess(env) as app:
+        listen = app.wait_until("/health")
+        payment = first_payment(app.base_url)
+        total = time.perf_counter() - app.spawned_at
+    return {"listen": listen, "first_payment": payment, "total": total}
+
+
+def summarize(samples: list) -> dict:
+    return {
+        key: round(statistics.median(sample[key] for sample in samples) * 1000, 1)
+        for key in ("listen", "first_payment", "total")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="stand-in latency per call (s)")
+    args = parser.parse_args()
+
+    latency = {name: args.latency for name in ("stripe", "turnstile", "mailtrap")}
+    results = {}
+    with StandIns(latency=latency) as standins:
+        for warmup in (False, True):
+            samples = [run_once(standins, warmup) for _ in range(args.runs)]
+            results["warmup" if warmup else "cold"] = summarize(samples)
+
+    print(json.dumps({"unit": "ms (median)", "runs": args.runs, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
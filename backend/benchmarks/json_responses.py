@@ -0,0 +1,144 @@
+"""
+JSON response path benchmark
+Requests/sec for the hot JSON endpoints, called in-process with synthetic
+ASGI requests (Stripe, Turnstile and email replaced by instant fakes):
+- health, config, create (one-time payment) and customer_portal
+- "route": the router alone, i.e. handler + FastAPI validation/serialization
+- "stack": the full app with every middleware
+The service classes are patched in place (not dependency_overrides, which
+make FastAPI re-inspect the override on every request).
+
+Usage:
+    python benchmarks/json_responses.py --save results/json-before.json
+    python benchmarks/json_responses.py --compare results/json-before.json
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from microbench import CLIENT_IP, PAYMENT_PAYLOAD, USER_AGENT, Runner, make_scope, send  # noqa: E402
+
+from app.services.email_service import EmailService  # noqa: E402
+from app.services.mailtrap_service import MailtrapService  # noqa: E402
+from app.services.session_service import session_service  # noqa: E402
+from app.services.stripe_service import StripeService  # noqa: E402
+from app.services.turnstile_service import TurnstileService  # noqa: E402
+from main import app  # noqa: E402
+
+
+async def instant_customer(self, **kwargs):
+    return {"success": True, "customer": SimpleNamespace(id="cus_bench")}
+
+
+async def instant_payment_intent(self, payment_request, customer_id, **kwargs):
+    return {"success": True, "payment_intent": SimpleNamespace(id="pi_bench"), "client_secret": "pi_bench_secret_bench"}
+
+
+async def instant_portal_session(self, customer_id, return_url, **kwargs):
+    return {"success": True, "url": "https://billing.stripe.com/session/bench"}
+
+
+async def instant_turnstile(self, token, client_ip=None, **kwargs):
+    return {"success": True}
+
+
+async def instant_email(self, *args, **kwargs):
+    return True
+
+
+def patch_services():
+    StripeService.create_customer = instant_customer
+    StripeService.create_payment_intent = instant_payment_intent
+    StripeService.create_customer_portal_session = instant_portal_session
+    TurnstileService.verify_token = instant_turnstile
+    EmailService.send_payment_confirmation = instant_email
+    MailtrapService.send_payment_confirmation = instant_email
+
+
+def request_case(asgi_app, path: str, method: str = "GET", body: Optional[Dict[str, Any]] = None,
+                 headers: Optional[Dict[str, str]] = None) -> Callable[[], Awaitable[None]]:
+    scope = make_scope(path, method, {**(headers or {}), **({"content-type": "application/json"} if body else {})})
+    scope["app"] = app
+    payload = json.dumps(body).encode() if body else b""
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def check_send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    async def call():
+        await asgi_app(dict(scope), receive, send)
+
+    async def first_call():
+        await asgi_app(dict(scope), receive, check_send)
+        if status[-1] != 200:
+            raise SystemExit(f"{method} {path} returned {status[-1]}")
+
+    call.check = first_call
+    return call
+
+
+def build_cases() -> Dict[str, Callable]:
+    patch_services()
+
+    session_key = session_service.generate_session_key(CLIENT_IP, USER_AGENT)
+    session_service.active_sessions[session_key]["max_requests"] = float("inf")
+    session_headers = {"x-session-key": session_key}
+    portal_body = {"customer_id": "cus_bench", "return_url": "https://example.com/account"}
+
+    cases = {}
+    for layer, asgi_app in (("route", app.router), ("stack", app)):
+        cases[f"{layer}:health"] = request_case(asgi_app, "/health")
+        cases[f"{layer}:config"] = request_case(asgi_app, "/api/v1/payments/config")
+        cases[f"{layer}:create"] = request_case(asgi_app, "/api/v1/payments/create", "POST",
+                                                PAYMENT_PAYLOAD, session_headers)
+        cases[f"{layer}:customer_portal"] = request_case(asgi_app, "/api/v1/payments/customer-portal", "POST",
+                                                         portal_body, session_headers)
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=3000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--save", type=Path, help="write results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="earlier results to compare against")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    baseline = json.loads(args.compare.read_text()) if args.compare else {}
+
+    runner = Runner()
+    results: Dict[str, float] = {}
+    print(f"{'case':<26}{'req/s':>10}{'us/req':>10}" + (f"{'before':>10}{'change':>9}" if baseline else ""))
+    try:
+        for name, case in build_cases().items():
+            runner.loop.run_until_complete(case.check())
+            runner.run(case, min(500, args.iterations))  # warm caches
+            ns_per_op = runner.time_ns(case, args.iterations, args.repeats)
+            results[name] = round(1e9 / ns_per_op, 1)
+            line = f"{name:<26}{results[name]:>10.0f}{ns_per_op / 1000:>10.1f}"
+            if name in baseline:
+                line += f"{baseline[name]:>10.0f}{results[name] / baseline[name] - 1:>+9.1%}"
+            print(line)
+    finally:
+        runner.close()
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(results, indent=2))
+        print(f"Saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
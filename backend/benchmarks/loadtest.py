@@ -0,0 +1,240 @@
+"""
+End-to-end load test
+Runs the real app against local stand-ins for Stripe, Turnstile and
+Mailtrap/SMTP (with optional latency and error injection) and drives the
+checkout flow (GET /config -> POST /session -> POST /create) at a fixed
+arrival rate.
+
+Reports, and writes to benchmarks/results/ as JSON for comparison across commits:
+- achieved throughput and status counts per route
+- p50/p95/p99 latency per route
+- p50/p95/p99 per payment stage, read from the Server-Timing header
+
+Usage:
+    python benchmarks/loadtest.py [--rate 50] [--duration 30] [--subscription-ratio 0.2]
+    python benchmarks/loadtest.py --latency stripe=0.15 --error-rate stripe=0.02
+    python benchmarks/loadtest.py --email smtp              # development mode, SMTP stand-in
+    python benchmarks/loadtest.py --app-env STRIPE_RATE_LIMIT=100 --app-env STRIPE_RATE_BURST=100
+    python benchmarks/loadtest.py --compare results/old.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app_process import BACKEND_DIR, BENCH_HEADERS, AppProcess, bench_env, payment_payload  # noqa: E402
+from standins import StandInsProcess  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+CONFIG_ROUTE = "GET /api/v1/payments/config"
+SESSION_ROUTE = "POST /api/v1/payments/session"
+CREATE_ROUTE = "POST /api/v1/payments/create"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 0.50), 2),
+        "p95_ms": round(percentile(samples_ms, 0.95), 2),
+        "p99_ms": round(percentile(samples_ms, 0.99), 2),
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """'turnstile;dur=12.3, customer;dur=40.1' -> {'turnstile': 12.3, 'customer': 40.1}"""
+    stages = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        if params.startswith("dur="):
+            stages[name] = float(params[4:])
+    return stages
+
+
+def parse_pairs(values: List[str]) -> Dict[str, float]:
+    """['stripe=0.1', 'smtp=0.02'] -> {'stripe': 0.1, 'smtp': 0.02}"""
+    pairs = {}
+    for value in values:
+        name, _, number = value.partition("=")
+        pairs[name] = float(number)
+    return pairs
+
+
+class LoadStats:
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+        self.completed_flows = 0
+
+    def record(self, route: str, status: str, elapsed: float):
+        self.latencies[route].append(elapsed * 1000)
+        self.statuses[route][status] += 1
+
+
+async def timed(stats: LoadStats, route: str, request) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError as e:
+        stats.record(route, type(e).__name__, time.perf_counter() - started)
+        return None
+    stats.record(route, str(response.status_code), time.perf_counter() - started)
+    return response
+
+
+async def checkout_flow(client: httpx.AsyncClient, stats: LoadStats, index: int, payment_type: str):
+    config = await timed(stats, CONFIG_ROUTE, client.get("/api/v1/payments/config"))
+    if config is None or config.status_code != 200:
+        return
+    session = await timed(stats, SESSION_ROUTE, client.post("/api/v1/payments/session"))
+    if session is None or session.status_code != 200:
+        return
+
+    headers = {"X-Session-Key": session.json()["session_key"]}
+    created = await timed(stats, CREATE_ROUTE, client.post(
+        "/api/v1/payments/create", json=payment_payload(index, payment_type), headers=headers
+    ))
+    if created is not None and "server-timing" in created.headers:
+        for stage, duration in parse_server_timing(created.headers["server-timing"]).items():
+            stats.stages[stage].append(duration)
+    stats.completed_flows += 1
+
+
+async def drive(base_url: str, rate: float, duration: float, subscription_ratio: float, seed: int) -> dict:
+    """Open-loop arrivals: flows start on schedule no matter how slow the app is"""
+    rng = random.Random(seed)
+    stats = LoadStats()
+    total = int(rate * duration)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=BENCH_HEADERS, timeout=60.0, limits=limits) as client:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = []
+        late = 0
+        for index in range(total):
+            delay = started + index / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -0.05:
+                late += 1
+            payment_type = "monthly" if rng.random() < subscription_ratio else "one_time"
+            tasks.append(asyncio.create_task(checkout_flow(client, stats, index, payment_type)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+
+    return {
+        "offered_flows_per_second": rate,
+        "achieved_flows_per_second": round(stats.completed_flows / elapsed, 2),
+        "flows": total,
+        "late_arrivals": late,
+        "elapsed_seconds": round(elapsed, 2),
+        "routes": {
+            route: {**summarize(samples), "statuses": dict(stats.statuses[route])}
+            for route, samples in stats.latencies.items()
+        },
+        "stages": {stage: summarize(samples) for stage, samples in stats.stages.items()},
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict):
+    """Print throughput and latency deltas against a previous result file"""
+    def delta(new: float, old: float) -> str:
+        change = (new - old) / old * 100 if old else 0.0
+        return f"{old:>9.2f} -> {new:>9.2f} ({change:+.1f}%)"
+
+    print(f"\nCompared to {baseline.get('revision')} ({baseline.get('timestamp')})")
+    print(f"  throughput          {delta(current['achieved_flows_per_second'], baseline['achieved_flows_per_second'])}")
+    for section in ("routes", "stages"):
+        for name, summary in current[section].items():
+            old = baseline.get(section, {}).get(name)
+            if not old:
+                continue
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                print(f"  {name} {key:<7} {delta(summary[key], old[key])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=50.0, help="checkout flows started per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--subscription-ratio", type=float, default=0.2, help="share of monthly payments")
+    parser.add_argument("--email", choices=["mailtrap", "smtp"], default="mailtrap",
+                        help="smtp runs the app in development mode against the SMTP stand-in")
+    parser.add_argument("--latency", action="append", default=[], metavar="NAME=SECONDS",
+                        help="stand-in latency (stripe, turnstile, mailtrap, smtp)")
+    parser.add_argument("--error-rate", action="append", default=[], metavar="NAME=RATE",
+                        help="stand-in error rate between 0 and 1")
+    parser.add_argument("--app-env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra app settings, e.g. STRIPE_RATE_LIMIT=100")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path, help="result file (default benchmarks/results/<rev>-<time>.json)")
+    parser.add_argument("--compare", type=Path, help="previous result file to diff against")
+    args = parser.parse_args()
+
+    latency = {"stripe": 0.05, "turnstile": 0.02, "mailtrap": 0.03, "smtp": 0.01}
+    latency.update(parse_pairs(args.latency))
+    error_rate = parse_pairs(args.error_rate)
+
+    with StandInsProcess(latency, error_rate) as standins:
+        overrides = {"WARMUP_ENABLED": "true"}
+        if args.email == "smtp":
+            overrides["ENVIRONMENT"] = "development"
+        overrides.update(value.split("=", 1) for value in args.app_env)
+        env = bench_env(standins.app_env(), **overrides)
+        with AppProcess(env) as app:
+            app.wait_until("/ready")
+            result = asyncio.run(drive(app.base_url, args.rate, args.duration, args.subscription_ratio, args.seed))
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    result = {
+        "revision": git_revision(),
+        "timestamp": timestamp,
+        "parameters": {
+            "rate": args.rate, "duration": args.duration, "subscription_ratio": args.subscription_ratio,
+            "email": args.email, "latency": latency, "error_rate": error_rate, "app_env": args.app_env,
+        },
+        **result,
+        "standin_requests": standins.final_counts,
+    }
+
+    output = args.output or RESULTS_DIR / f"loadtest-{result['revision']}-{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+
+    print(json.dumps(result, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(result, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
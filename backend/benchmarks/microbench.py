@@ -0,0 +1,308 @@
+"""
+Middleware and validation microbenchmarks
+Times each request-path layer in isolation with synthetic ASGI requests
+(no sockets, no server), so a regression can be pinned to one layer:
+- the trusted-host and CORS middlewares (simple and preflight), as the app
+  configures them from the runtime config snapshot
+- real_ip, rate_limit and security_headers http middlewares
+- the admission (in-flight / load shedding) and shutdown (in-flight tracking) middlewares
+- the full middleware stack on /health
+- PaymentRequest validation, EmailStr, the phone pattern and the v1 validators
+- session_service.validate_session_key
+- payment ledger lookups (email, Stripe id, has_paid) over --ledger-rows rows
+
+Reports ns/op, allocated bytes/op (tracemalloc peak over a single call) and
+retained blocks/op (net allocated blocks after many calls, a leak signal).
+
+Usage:
+    python benchmarks/microbench.py [--filter cors] [--iterations 20000]
+    python benchmarks/microbench.py --save results/microbench-baseline.json
+    python benchmarks/microbench.py --baseline results/microbench-baseline.json --threshold 0.15
+Exits with status 1 when ns/op or bytes/op grows more than --threshold
+relative to the baseline.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Annotated, Any, Awaitable, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app_process import BENCH_ORIGIN, bench_env  # noqa: E402
+
+# Settings are read at import time
+os.environ.update(bench_env({}))
+
+from pydantic import EmailStr, Field, TypeAdapter  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.middleware.admission import AdmissionMiddleware  # noqa: E402
+from app.middleware.shutdown import ShutdownMiddleware  # noqa: E402
+from app.middleware.reloadable import ReloadableCORSMiddleware, ReloadableTrustedHostMiddleware  # noqa: E402
+from app.middleware.security import (  # noqa: E402
+    rate_limit_middleware, real_ip_middleware, security_headers_middleware
+)
+from app.models.payment import Currency, PaymentRequest  # noqa: E402
+from app.services.ledger import CREATED, SUCCEEDED, PaymentLedger  # noqa: E402
+from app.services.session_service import session_service  # noqa: E402
+from main import app  # noqa: E402
+
+CLIENT_IP = "203.0.113.10"
+USER_AGENT = "ezyba-microbench/1.0"
+
+PAYMENT_PAYLOAD = {
+    "name": "Bench Customer",
+    "email": "bench@example.com",
+    "phone": "+55 (11) 99999-9999",
+    "amount": 1500,
+    "currency": "brl",
+    "payment_type": "one_time",
+    "turnstile_token": "token",
+    "language": "pt",
+}
+
+
+def make_scope(path: str = "/api/v1/payments/config", method: str = "GET",
+               headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    raw_headers = {"host": "localhost", "user-agent": USER_AGENT, "origin": BENCH_ORIGIN}
+    raw_headers.update(headers or {})
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(k.encode(), v.encode()) for k, v in raw_headers.items()],
+        "client": (CLIENT_IP, 50000),
+        "server": ("localhost", 8000),
+        "state": {},
+    }
+
+
+async def terminal_app(scope, receive, send):
+    """Innermost app: an empty 200 response"""
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"0")]})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def asgi_case(asgi_app, scope: Dict[str, Any]) -> Callable[[], Awaitable[None]]:
+    async def call():
+        # ASGI apps may mutate the scope (state, headers), so each call gets a copy
+        await asgi_app(dict(scope), receive, send)
+    return call
+
+
+def http_middleware(dispatch) -> BaseHTTPMiddleware:
+    return BaseHTTPMiddleware(terminal_app, dispatch=dispatch)
+
+
+def session_case() -> Callable[[], bool]:
+    session_key = session_service.generate_session_key(CLIENT_IP, USER_AGENT)
+    session_service.active_sessions[session_key]["max_requests"] = float("inf")
+    return lambda: session_service.validate_session_key(session_key, CLIENT_IP, USER_AGENT)
+
+
+def ledger_cases(rows: int) -> Dict[str, Callable]:
+    ledger = PaymentLedger(os.path.join(tempfile.mkdtemp(prefix="microbench-ledger-"), "payments.db"),
+                           max_pending=rows * 2)
+    for index in range(rows):
+        ledger.record(f"req{index}", f"buyer{index % (rows // 3 or 1)}@example.com", "one_time", 1500, "brl",
+                      CREATED, customer_id=f"cus_{index}", stripe_id=f"pi_{index}")
+        if index % 2:
+            ledger.update_status(f"pi_{index}", SUCCEEDED)
+    ledger.flush()
+
+    probe = rows // 2
+    return {
+        "ledger_by_email": lambda: ledger.by_email(f"buyer{probe % (rows // 3 or 1)}@example.com", 10),
+        "ledger_by_stripe_id": lambda: ledger.by_stripe_id(f"pi_{probe}"),
+        "ledger_has_paid": lambda: ledger.has_paid(f"buyer{probe % (rows // 3 or 1)}@example.com", 1500, "brl"),
+    }
+
+
+def build_cases(ledger_rows: int = 100000) -> Dict[str, Callable]:
+    """name -> zero-argument callable (plain function or coroutine function)"""
+    preflight_headers = {"access-control-request-method": "POST",
+                         "access-control-request-headers": "content-type,x-session-key"}
+
+    email_adapter = TypeAdapter(EmailStr)
+    phone_pattern = PaymentRequest.model_fields["phone"].metadata[0].pattern
+    phone_adapter = TypeAdapter(Annotated[str, Field(pattern=phone_pattern)])
+    payment_json = json.dumps(PAYMENT_PAYLOAD).encode()
+
+    return {
+        "trusted_host": asgi_case(ReloadableTrustedHostMiddleware(terminal_app, extra_hosts=["127.0.0.1"]),
+                                  make_scope()),
+        "cors_simple": asgi_case(ReloadableCORSMiddleware(terminal_app, allow_credentials=True,
+                                                          allow_methods=["GET", "POST"], allow_headers=["*"]),
+                                 make_scope()),
+        "cors_preflight": asgi_case(ReloadableCORSMiddleware(terminal_app, allow_credentials=True,
+                                                             allow_methods=["GET", "POST"], allow_headers=["*"]),
+                                    make_scope(method="OPTIONS", headers=preflight_headers)),
+        "real_ip_middleware": asgi_case(http_middleware(real_ip_middleware), make_scope()),
+        "rate_limit_middleware": asgi_case(http_middleware(rate_limit_middleware), make_scope()),
+        "security_headers_middleware": asgi_case(http_middleware(security_headers_middleware), make_scope()),
+        # real_ip_middleware runs outside it in the app and leaves the IP in scope state
+        "admission_middleware": asgi_case(AdmissionMiddleware(terminal_app),
+                                          {**make_scope(), "state": {"real_ip": CLIENT_IP}}),
+        "shutdown_middleware": asgi_case(ShutdownMiddleware(terminal_app), make_scope()),
+        "full_stack_health": asgi_case(app, make_scope("/health")),
+        "payment_request": lambda: PaymentRequest.model_validate(PAYMENT_PAYLOAD),
+        "payment_request_json": lambda: PaymentRequest.model_validate_json(payment_json),
+        "email_str": lambda: email_adapter.validate_python(PAYMENT_PAYLOAD["email"]),
+        "phone_pattern": lambda: phone_adapter.validate_python(PAYMENT_PAYLOAD["phone"]),
+        "v1_validate_amount": lambda: PaymentRequest.validate_amount(1500, {"currency": Currency.BRL}),
+        "v1_validate_phone": lambda: PaymentRequest.validate_phone(PAYMENT_PAYLOAD["phone"]),
+        "validate_session_key": session_case(),
+        **ledger_cases(ledger_rows),
+    }
+
+
+class Runner:
+    """Runs sync and async cases on one event loop"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+
+    def close(self):
+        self.loop.close()
+
+    def run(self, case: Callable, iterations: int):
+        if asyncio.iscoroutinefunction(case):
+            self.loop.run_until_complete(self._run_async(case, iterations))
+        else:
+            for _ in range(iterations):
+                case()
+
+    @staticmethod
+    async def _run_async(case: Callable, iterations: int):
+        for _ in range(iterations):
+            await case()
+
+    def time_ns(self, case: Callable, iterations: int, repeats: int) -> float:
+        """Best-of-repeats ns per call, with the GC paused as in timeit"""
+        best = float("inf")
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(repeats):
+                started = time.perf_counter_ns()
+                self.run(case, iterations)
+                best = min(best, (time.perf_counter_ns() - started) / iterations)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return best
+
+    def allocations(self, case: Callable, samples: int, iterations: int) -> Dict[str, float]:
+        # Peak traced bytes for single calls (allocations, including short-lived ones)
+        peaks: List[int] = []
+        tracemalloc.start()
+        try:
+            for _ in range(samples):
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                self.run(case, 1)
+                _, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+        finally:
+            tracemalloc.stop()
+
+        # Net blocks left behind after many calls
+        gc.collect()
+        blocks_before = sys.getallocatedblocks()
+        self.run(case, iterations)
+        gc.collect()
+        retained = (sys.getallocatedblocks() - blocks_before) / iterations
+
+        peaks.sort()
+        return {"bytes_per_op": peaks[len(peaks) // 2], "retained_blocks_per_op": round(retained, 3)}
+
+
+def check_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                      threshold: float) -> List[str]:
+    failures = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ("ns_per_op", "bytes_per_op"):
+            old, new = previous.get(metric), current[metric]
+            if old and new > old * (1 + threshold):
+                failures.append(f"{name}: {metric} {old:.0f} -> {new:.0f} (+{(new - old) / old * 100:.1f}%)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only run cases whose name contains this")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--save", type=Path, help="write results as a baseline JSON file")
+    parser.add_argument("--baseline", type=Path, help="baseline JSON file to compare against")
+    parser.add_argument("--ledger-rows", type=int, default=100000, help="rows in the ledger lookup database")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative regression (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    # Keep the middlewares' logging out of the measurements
+    logging.disable(logging.CRITICAL)
+
+    cases = build_cases(args.ledger_rows)
+    runner = Runner()
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'case':<30}{'ns/op':>12}{'bytes/op':>12}{'retained/op':>14}")
+    try:
+        for name, case in cases.items():
+            if args.filter and args.filter not in name:
+                continue
+            runner.run(case, min(1000, args.iterations))  # warm caches
+            ns_per_op = runner.time_ns(case, args.iterations, args.repeats)
+            allocations = runner.allocations(case, samples=50, iterations=min(5000, args.iterations))
+            results[name] = {"ns_per_op": round(ns_per_op, 1), **allocations}
+            print(f"{name:<30}{ns_per_op:>12.0f}{allocations['bytes_per_op']:>12}"
+                  f"{allocations['retained_blocks_per_op']:>14}")
+    finally:
+        runner.close()
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(results, indent=2))
+        print(f"\nBaseline written to {args.save}")
+
+    if args.baseline:
+        if not args.baseline.exists():
+            print(f"\nNo baseline at {args.baseline}, skipping regression check")
+            return
+        failures = check_regressions(results, json.loads(args.baseline.read_text()), args.threshold)
+        if failures:
+            print(f"\nRegressions over {args.threshold:.0%}:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
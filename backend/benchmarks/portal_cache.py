@@ -0,0 +1,109 @@
+"""
+Customer portal session cache benchmark
+Replays manage-page traffic against the real app and local stand-ins, once
+with the portal cache disabled (PORTAL_CACHE_TTL=0) and once enabled:
+each customer double-clicks "manage subscription" (--burst concurrent
+requests), then comes back --revisits times, --gap seconds apart.
+
+Reports latency percentiles for the burst and the revisits, Stripe calls made (counted by the
+stand-in) and the app's own /admin/portal-cache counters.
+
+Usage:
+    python benchmarks/portal_cache.py [--customers 50] [--burst 2] [--revisits 2] [--stripe-latency 0.3]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app_process import BENCH_HEADERS, AppProcess, bench_env  # noqa: E402
+from standins import StandInsProcess  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+ADMIN_HEADERS = {**BENCH_HEADERS, "Authorization": "Bearer bench-api-key"}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+async def customer_visits(client: httpx.AsyncClient, index: int, args, latencies: Dict[str, List[float]]):
+    session_key = (await client.post("/api/v1/payments/session", headers=BENCH_HEADERS)).json()["session_key"]
+    headers = {**BENCH_HEADERS, "X-Session-Key": session_key}
+    body = {"customer_id": f"cus_bench{index}", "return_url": "https://example.com/en/manage"}
+
+    async def click(phase: str):
+        started = time.perf_counter()
+        response = await client.post("/api/v1/payments/customer-portal", json=body, headers=headers)
+        latencies[phase].append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+
+    await asyncio.gather(*(click("burst") for _ in range(args.burst)))
+    for _ in range(args.revisits):
+        await asyncio.sleep(args.gap)
+        await click("revisit")
+
+
+async def drive(base_url: str, args) -> Dict[str, Any]:
+    latencies: Dict[str, List[float]] = {"burst": [], "revisit": []}
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(customer_visits(client, index, args, latencies) for index in range(args.customers)))
+        elapsed = time.perf_counter() - started
+        stats = (await client.get("/api/v1/admin/portal-cache", headers=ADMIN_HEADERS)).json()
+    return {
+        "requests": sum(len(samples) for samples in latencies.values()),
+        "seconds": round(elapsed, 2),
+        **{f"{phase}_p{pct}_ms": round(percentile(samples, pct / 100), 1)
+           for phase, samples in latencies.items() for pct in (50, 95)},
+        "cache": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--burst", type=int, default=2, help="concurrent clicks per customer")
+    parser.add_argument("--revisits", type=int, default=2, help="later visits per customer")
+    parser.add_argument("--gap", type=float, default=1.0, help="seconds between visits")
+    parser.add_argument("--stripe-latency", type=float, default=0.3, help="seconds per stand-in Stripe call")
+    args = parser.parse_args()
+
+    runs = {}
+    for mode, ttl in (("disabled", "0"), ("enabled", "60")):
+        with StandInsProcess(latency={"stripe": args.stripe_latency}) as standins:
+            env = bench_env(standins.app_env(), PORTAL_CACHE_TTL=ttl, WARMUP_ENABLED="false",
+                            STATE_SNAPSHOT_ENABLED="false", STRIPE_RATE_LIMIT="1000", STRIPE_RATE_BURST="1000",
+                            STRIPE_MAX_CONCURRENCY="1000")
+            with AppProcess(env) as app:
+                app.wait_until("/health")
+                run = asyncio.run(drive(app.base_url, args))
+        run["stripe_requests"] = standins.final_counts.get("stripe")
+        runs[mode] = run
+        cache = run["cache"]
+        print(f"cache {mode:<9} {run['requests']} requests  "
+              f"burst p50/p95 {run['burst_p50_ms']}/{run['burst_p95_ms']}ms  "
+              f"revisit p50/p95 {run['revisit_p50_ms']}/{run['revisit_p95_ms']}ms  "
+              f"Stripe calls {run['stripe_requests']}  hits {cache['hits']}  coalesced {cache['coalesced']}  "
+              f"saved {cache['saved_stripe_seconds']}s of Stripe time")
+
+    result = {"args": vars(args), "runs": runs}
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = RESULTS_DIR / f"portal-cache-{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
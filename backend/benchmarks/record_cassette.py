@@ -0,0 +1,146 @@
+"""
+Record and replay outbound HTTP cassettes
+Runs the real app once with HTTP_CASSETTE_MODE=record against the local
+stand-ins (Stripe, Turnstile, Mailtrap), drives --checkouts payment
+creations and --portal customer-portal clicks, and stops it so the
+cassette is written. Then replays the same traffic with no stand-ins
+running at all and reports, per phase:
+- latency percentiles (replay keeps the recorded latencies unless
+  --replay-latency / --latency-scale say otherwise)
+- errors (an unrecorded call fails like an unreachable host)
+- exchanges in the cassette
+
+Replay an existing cassette from any benchmark with
+    --app-env HTTP_CASSETTE_MODE=replay --app-env HTTP_CASSETTE_PATH=<cassette>
+
+Usage:
+    python benchmarks/record_cassette.py [--checkouts 50] [--portal 20] [--stripe-latency 0.2] [--replay-only]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app_process import BACKEND_DIR, BENCH_HEADERS, AppProcess, bench_env, payment_payload  # noqa: E402
+from standins import StandInsProcess  # noqa: E402
+
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.cassette import read_cassette  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_CASSETTE = Path(__file__).resolve().parent / "cassettes" / "checkout.cassette"
+# Nothing listens here: in replay mode no call should leave the process
+OFFLINE_ENV = {
+    "STRIPE_API_BASE": "http://127.0.0.1:9",
+    "TURNSTILE_VERIFY_URL": "http://127.0.0.1:9/turnstile/v0/siteverify",
+    "MAILTRAP_API_BASE": "http://127.0.0.1:9",
+}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+async def drive(base_url: str, args) -> Dict[str, Any]:
+    latencies: Dict[str, List[float]] = {"create": [], "portal": []}
+    errors = {"create": 0, "portal": 0}
+
+    async def timed(phase: str, client: httpx.AsyncClient, path: str, body: Dict, session_key: str):
+        started = time.perf_counter()
+        response = await client.post(path, json=body, headers={"X-Session-Key": session_key})
+        latencies[phase].append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            errors[phase] += 1
+
+    async with httpx.AsyncClient(base_url=base_url, headers=BENCH_HEADERS, timeout=60.0) as client:
+        sessions = [(await client.post("/api/v1/payments/session")).json()["session_key"]
+                    for _ in range(args.checkouts + args.portal)]
+        await asyncio.gather(*(
+            timed("create", client, "/api/v1/payments/create", payment_payload(index), sessions[index])
+            for index in range(args.checkouts)
+        ))
+        await asyncio.gather(*(
+            timed("portal", client, "/api/v1/payments/customer-portal",
+                  {"customer_id": f"cus_bench{index}", "return_url": "https://example.com/en/manage"},
+                  sessions[args.checkouts + index])
+            for index in range(args.portal)
+        ))
+
+    return {
+        phase: {
+            "requests": len(samples),
+            "errors": errors[phase],
+            "p50_ms": round(percentile(samples, 0.5), 1),
+            "p95_ms": round(percentile(samples, 0.95), 1),
+        }
+        for phase, samples in latencies.items()
+    }
+
+
+def run_app(env: Dict[str, str], args) -> Dict[str, Any]:
+    app = AppProcess(env).start()
+    try:
+        app.wait_until("/health")
+        return asyncio.run(drive(app.base_url, args))
+    finally:
+        # The cassette is written when the app closes its HTTP clients
+        app.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", type=Path, default=DEFAULT_CASSETTE)
+    parser.add_argument("--checkouts", type=int, default=50)
+    parser.add_argument("--portal", type=int, default=20)
+    parser.add_argument("--stripe-latency", type=float, default=0.2, help="seconds per stand-in Stripe call while recording")
+    parser.add_argument("--replay-latency", type=float, default=None, help="fixed seconds per replayed call")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier on recorded latencies")
+    parser.add_argument("--replay-only", action="store_true", help="skip recording, replay --cassette as is")
+    args = parser.parse_args()
+
+    cassette_path = args.cassette.resolve()
+    limits = dict(STRIPE_RATE_LIMIT="1000", STRIPE_RATE_BURST="1000", STRIPE_MAX_CONCURRENCY="1000",
+                  WARMUP_ENABLED="false", HTTP_CASSETTE_PATH=str(cassette_path))
+    phases = {}
+
+    if not args.replay_only:
+        latency = {"stripe": args.stripe_latency, "turnstile": 0.02, "mailtrap": 0.05}
+        with StandInsProcess(latency=latency) as standins:
+            env = bench_env(standins.app_env(), HTTP_CASSETTE_MODE="record", **limits)
+            phases["record"] = run_app(env, args)
+        phases["record"]["standin_calls"] = standins.final_counts
+
+    replay_env = dict(HTTP_CASSETTE_MODE="replay", HTTP_CASSETTE_LATENCY_SCALE=str(args.latency_scale), **limits)
+    if args.replay_latency is not None:
+        replay_env["HTTP_CASSETTE_LATENCY"] = str(args.replay_latency)
+    phases["replay"] = run_app(bench_env(OFFLINE_ENV, **replay_env), args)
+
+    exchanges = read_cassette(cassette_path)
+    print(f"{cassette_path}: {len(exchanges)} exchanges, {cassette_path.stat().st_size / 1024:.1f} KiB")
+    for phase, run in phases.items():
+        print(f"{phase:<7} " + "  ".join(
+            f"{name} p50 {stats['p50_ms']}ms p95 {stats['p95_ms']}ms errors {stats['errors']}/{stats['requests']}"
+            for name, stats in run.items() if name != "standin_calls"
+        ))
+
+    result = {"args": {**vars(args), "cassette": str(cassette_path)}, "exchanges": len(exchanges), "phases": phases}
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = RESULTS_DIR / f"cassette-{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
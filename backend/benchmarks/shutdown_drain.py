@@ -0,0 +1,135 @@
+"""
+Graceful shutdown drain benchmark
+Starts the real app against local stand-ins, puts --requests payment
+creations in flight (each spends --stripe-latency per Stripe call and
+--email-latency on the confirmation email), sends SIGTERM --signal-after
+seconds after the app reports them all in flight and measures:
+- drain: SIGTERM -> process exit, the number to size gunicorn's
+  GRACEFUL_TIMEOUT and the compose stop_grace_period against
+- completed / refused (503 while draining) / dropped (connection reset
+  or 500 from a request cancelled at the deadline)
+- confirmation emails sent for the completed payments
+
+Keep-alive clients send one more request after the signal to check that
+they are turned away with Connection: close instead of hanging.
+
+Usage:
+    python benchmarks/shutdown_drain.py [--requests 50] [--stripe-latency 0.5] [--drain-timeout 15]
+"""
+
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app_process import BENCH_HEADERS, AppProcess, bench_env, payment_payload  # noqa: E402
+from standins import StandInsProcess  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+ADMIN_HEADERS = {**BENCH_HEADERS, "Authorization": "Bearer bench-api-key"}
+
+
+async def create_payment(client: httpx.AsyncClient, index: int, session_key: str) -> str:
+    try:
+        response = await client.post("/api/v1/payments/create", json=payment_payload(index),
+                                     headers={"X-Session-Key": session_key})
+    except httpx.HTTPError:
+        return "dropped"
+    if response.status_code == 200:
+        return "completed"
+    return "refused" if response.status_code == 503 else "dropped"
+
+
+async def late_request(client: httpx.AsyncClient) -> str:
+    """A keep-alive request sent while the app drains"""
+    try:
+        response = await client.get("/api/v1/payments/config")
+    except httpx.HTTPError:
+        return "connection closed"
+    return f"{response.status_code} connection={response.headers.get('connection', 'keep-alive')}"
+
+
+async def drive(app: AppProcess, args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.requests + 1, max_keepalive_connections=args.requests + 1)
+    async with httpx.AsyncClient(base_url=app.base_url, headers=BENCH_HEADERS, timeout=120.0, limits=limits) as client:
+        sessions = await asyncio.gather(*(client.post("/api/v1/payments/session") for _ in range(args.requests + 1)))
+        tasks = [asyncio.create_task(create_payment(client, index, session.json()["session_key"]))
+                 for index, session in enumerate(sessions[1:])]
+        async with httpx.AsyncClient(base_url=app.base_url, timeout=5.0) as admin:
+            # Wait until every unfinished request has reached the app (the admin call counts itself)
+            while True:
+                response = await admin.get("/api/v1/admin/shutdown", headers=ADMIN_HEADERS)
+                # 503 while the admission controller sheds the admin call under this load
+                if response.status_code == 200 and \
+                        response.json()["in_flight_requests"] - 1 >= sum(not task.done() for task in tasks):
+                    break
+                await asyncio.sleep(0.01)
+        await asyncio.sleep(args.signal_after)
+
+        signalled = time.perf_counter()
+        app.proc.send_signal(signal.SIGTERM)
+        await asyncio.sleep(0.05)
+        late = await late_request(client)
+
+        outcomes: List[str] = await asyncio.gather(*tasks)
+        while app.proc.poll() is None and time.perf_counter() - signalled < 120:
+            await asyncio.sleep(0.01)
+        drain = time.perf_counter() - signalled
+
+    return {
+        "drain_seconds": round(drain, 2),
+        "exit_code": app.proc.returncode,
+        "completed": outcomes.count("completed"),
+        "refused": outcomes.count("refused"),
+        "dropped": outcomes.count("dropped"),
+        "late_request": late,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--stripe-latency", type=float, default=0.5, help="seconds per stand-in Stripe call")
+    parser.add_argument("--email-latency", type=float, default=0.5, help="seconds per stand-in Mailtrap call")
+    parser.add_argument("--signal-after", type=float, default=0.1, help="seconds between the requests being in flight and SIGTERM")
+    parser.add_argument("--drain-timeout", type=float, nargs="+", default=[15.0],
+                        help="SHUTDOWN_DRAIN_TIMEOUT values to run with")
+    args = parser.parse_args()
+
+    runs = {}
+    for drain_timeout in args.drain_timeout:
+        latency = {"stripe": args.stripe_latency, "turnstile": 0.02, "mailtrap": args.email_latency}
+        with StandInsProcess(latency=latency) as standins:
+            env = bench_env(standins.app_env(), SHUTDOWN_DRAIN_TIMEOUT=str(drain_timeout), WARMUP_ENABLED="false",
+                            STRIPE_RATE_LIMIT="1000", STRIPE_RATE_BURST="1000", STRIPE_MAX_CONCURRENCY="1000")
+            app = AppProcess(env).start()
+            try:
+                app.wait_until("/health")
+                run = asyncio.run(drive(app, args))
+            finally:
+                app.stop()
+        run["emails_sent"] = standins.final_counts.get("mailtrap")
+        runs[str(drain_timeout)] = run
+        print(f"drain timeout {drain_timeout:>5}s  exited after {run['drain_seconds']}s (code {run['exit_code']})  "
+              f"completed {run['completed']}  refused {run['refused']}  dropped {run['dropped']}  "
+              f"emails {run['emails_sent']}  late keep-alive request: {run['late_request']}")
+
+    result = {"args": vars(args), "runs": runs}
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = RESULTS_DIR / f"shutdown-drain-{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Memory soak test
+Replays hours of synthetic traffic in compressed time against the app
+in-process (direct ASGI calls, virtual clock) and watches memory:
+- many client IPs and user agents, each visitor calling /config 1-5 times
+  and starting checkout (POST /session) once
+- RSS and tracemalloc samples every --sample-minutes of simulated time
+- top growing allocation sites and modules after the warm-up period
+- sizes of the process-global stores (sessions, rate-limit counters, caches)
+
+Passes when traced memory plateaus: growth between the end of warm-up and
+the end of the run stays under --tolerance. Warm-up defaults to the longest
+in-memory retention (rate limit window) plus one sweep interval.
+
+Usage:
+    python benchmarks/soak.py [--hours 4] [--rps 2] [--ips 50000]
+    python benchmarks/soak.py --hours 12 --rps 5 --tolerance 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app_process import BACKEND_DIR, BENCH_ORIGIN, bench_env  # noqa: E402
+
+# Settings are read at import time; keep the default rate limit so its counters are exercised
+os.environ.update(bench_env({}, RATE_LIMIT_REQUESTS="100", STATE_BACKEND="memory"))
+
+from app.config import settings  # noqa: E402
+from app.services.counter_store import counter_store  # noqa: E402
+from app.services.session_service import session_service  # noqa: E402
+from app.services.stripe_service import customer_cache  # noqa: E402
+from app.services.webhook_service import webhook_service  # noqa: E402
+from main import app  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+class VirtualClock:
+    """Replaces time.time so hours of TTLs and sweeps pass in seconds"""
+
+    def __init__(self):
+        self.now = time.time()
+        self._real_time = time.time
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    def time(self) -> float:
+        return self.now
+
+    def __enter__(self) -> "VirtualClock":
+        time.time = self.time
+        return self
+
+    def __exit__(self, *exc):
+        time.time = self._real_time
+
+
+async def asgi_call(method: str, path: str, client_ip: str, user_agent: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"localhost"), (b"origin", BENCH_ORIGIN.encode()),
+                    (b"user-agent", user_agent.encode())],
+        "client": (client_ip, 40000),
+        "server": ("localhost", 8000),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def module_of(filename: str) -> str:
+    """Collapse a source path to app.module or the third-party package name"""
+    path = Path(filename)
+    try:
+        relative = path.resolve().relative_to(BACKEND_DIR)
+        return ".".join(relative.with_suffix("").parts)
+    except ValueError:
+        pass
+    parts = path.parts
+    if "site-packages" in parts:
+        return parts[parts.index("site-packages") + 1]
+    return path.stem
+
+
+def store_sizes() -> Dict[str, int]:
+    return {
+        "active_sessions": len(session_service.active_sessions),
+        "counters": len(counter_store),
+        "customer_cache": len(customer_cache),
+        "webhook_seen_events": len(webhook_service.seen_events),
+    }
+
+
+def growth_report(baseline: tracemalloc.Snapshot, current: tracemalloc.Snapshot, top: int) -> Dict[str, Any]:
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    baseline = baseline.filter_traces(filters)
+    current = current.filter_traces(filters)
+
+    sites = current.compare_to(baseline, "lineno")
+    by_module: Dict[str, int] = defaultdict(int)
+    for stat in sites:
+        by_module[module_of(stat.traceback[0].filename)] += stat.size_diff
+
+    growing_sites = [stat for stat in sites if stat.size_diff > 0][:top]
+    return {
+        "modules": dict(sorted(by_module.items(), key=lambda item: -item[1])[:top]),
+        "sites": [
+            {"site": f"{module_of(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+             "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+            for stat in growing_sites
+        ],
+    }
+
+
+async def soak(args, clock: VirtualClock) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    ips = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(args.ips)]
+    user_agents = [f"Mozilla/5.0 (soak; agent {i}) Gecko/20100101 Firefox/{100 + i % 30}.0"
+                   for i in range(args.user_agents)]
+
+    total_seconds = int(args.hours * 3600)
+    sample_every = int(args.sample_minutes * 60)
+    warmup_seconds = int(args.warmup_hours * 3600)
+
+    samples: List[Dict[str, Any]] = []
+    statuses: Dict[int, int] = defaultdict(int)
+    requests = 0
+    warmup_snapshot = None
+    carry = 0.0
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for second in range(total_seconds + 1):
+        # Poisson-ish arrivals: rps visitors per simulated second on average
+        carry += args.rps
+        visitors, carry = int(carry), carry - int(carry)
+        for _ in range(visitors):
+            ip, user_agent = rng.choice(ips), rng.choice(user_agents)
+            for _ in range(rng.randint(1, 5)):
+                statuses[await asgi_call("GET", "/api/v1/payments/config", ip, user_agent)] += 1
+                requests += 1
+            statuses[await asgi_call("POST", "/api/v1/payments/session", ip, user_agent)] += 1
+            requests += 1
+
+        if second % sample_every == 0:
+            traced, _ = tracemalloc.get_traced_memory()
+            samples.append({"simulated_hours": round(second / 3600, 3), "requests": requests,
+                            "traced_bytes": traced, "rss_bytes": rss_bytes(), **store_sizes()})
+            if warmup_snapshot is None and second >= warmup_seconds:
+                warmup_snapshot = tracemalloc.take_snapshot()
+
+        clock.advance(1)
+
+    final_snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    post_warmup = [sample for sample in samples if sample["simulated_hours"] * 3600 >= warmup_seconds]
+    if not post_warmup:
+        raise SystemExit("Run is shorter than the warm-up period, increase --hours")
+    start, end = post_warmup[0], post_warmup[-1]
+    growth = (end["traced_bytes"] - start["traced_bytes"]) / start["traced_bytes"]
+
+    return {
+        "simulated_hours": args.hours,
+        "wall_seconds": round(time.perf_counter() - started, 1),
+        "requests": requests,
+        "statuses": dict(statuses),
+        "warmup_hours": args.warmup_hours,
+        "post_warmup_growth": round(growth, 4),
+        "tolerance": args.tolerance,
+        "passed": growth <= args.tolerance,
+        "growth_since_warmup": growth_report(warmup_snapshot, final_snapshot, args.top),
+        "samples": samples,
+    }
+
+
+def main():
+    default_warmup = (settings.rate_limit_window + counter_store.sweep_interval) / 3600
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=4.0, help="simulated hours of traffic")
+    parser.add_argument("--rps", type=float, default=2.0, help="new visitors per simulated second")
+    parser.add_argument("--ips", type=int, default=50000, help="distinct client IPs")
+    parser.add_argument("--user-agents", type=int, default=200, help="distinct user agents")
+    parser.add_argument("--sample-minutes", type=float, default=10.0, help="simulated minutes between samples")
+    parser.add_argument("--warmup-hours", type=float, default=round(default_warmup, 2))
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed traced-memory growth after warm-up")
+    parser.add_argument("--top", type=int, default=10, help="growing sites/modules to report")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path, help="result file (default benchmarks/results/soak-<time>.json)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    with VirtualClock() as clock:
+        result = asyncio.run(soak(args, clock))
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = args.output or RESULTS_DIR / f"soak-{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+
+    print(f"{'hours':>7}{'requests':>10}{'traced MB':>11}{'RSS MB':>9}{'sessions':>10}{'counters':>10}")
+    for sample in result["samples"]:
+        print(f"{sample['simulated_hours']:>7.2f}{sample['requests']:>10}{sample['traced_bytes'] / 2**20:>11.2f}"
+              f"{sample['rss_bytes'] / 2**20:>9.1f}{sample['active_sessions']:>10}{sample['counters']:>10}")
+
+    print("\nTop growing modules since warm-up (bytes):")
+    for module, size in result["growth_since_warmup"]["modules"].items():
+        print(f"  {module:<50}{size:>+12}")
+    print("Top growing sites since warm-up:")
+    for site in result["growth_since_warmup"]["sites"]:
+        print(f"  {site['site']:<50}{site['size_diff']:>+12} ({site['count_diff']:+} blocks)")
+
+    verdict = "PASS" if result["passed"] else "FAIL"
+    print(f"\n{verdict}: traced memory grew {result['post_warmup_growth']:.1%} after warm-up "
+          f"(tolerance {args.tolerance:.0%}) over {result['requests']} requests in {result['wall_seconds']}s")
+    print(f"Results written to {output}")
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Local stand-ins for outbound dependencies
+- Fake Stripe API, Turnstile siteverify, Mailtrap sending API and SMTP server
+- Plain HTTP/SMTP on 127.0.0.1 so benchmarks never touch the network
+- Configurable latency and error injection per stand-in
+"""
+
+import json
+import multiprocessing
+import random
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+Response = Tuple[int, Dict[str, Any]]
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server that dispatches to a route function"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, name: str, route: Callable[[str, str, Dict[str, Any]], Response],
+                 latency: float = 0.0, error_rate: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.name = name
+        self.route = route
+        self.latency = latency
+        self.error_rate = error_rate
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.serve_forever, name=f"standin-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        server: StandInServer = self.server
+        with server._lock:
+            server.request_count += 1
+
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        parsed = urlparse(self.path)
+        params: Dict[str, Any] = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        content_type = self.headers.get("Content-Type", "")
+        if raw and "json" in content_type:
+            params.update(json.loads(raw))
+        elif raw:
+            params.update({k: v[0] for k, v in parse_qs(raw.decode()).items()})
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.error_rate and random.random() < server.error_rate:
+            status, body = 500, {"error": {"message": "injected failure", "type": "api_error"}}
+        else:
+            status, body = server.route(self.command, parsed.path, params)
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _handle
+    do_POST = _handle
+    do_DELETE = _handle
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def stripe_route(method: str, path: str, params: Dict[str, Any]) -> Response:
+    """Minimal Stripe API covering the calls made by StripeService"""
+    if method == "GET" and path == "/v1/customers":
+        return 200, {"object": "list", "data": [], "has_more": False, "url": "/v1/customers"}
+
+    if method == "POST" and path == "/v1/customers":
+        return 200, {"id": _new_id("cus"), "object": "customer",
+                     "email": params.get("email"), "name": params.get("name")}
+
+    if method == "POST" and path == "/v1/payment_intents":
+        intent_id = _new_id("pi")
+        return 200, {"id": intent_id, "object": "payment_intent",
+                     "amount": int(params.get("amount", 0)), "currency": params.get("currency"),
+                     "status": "requires_payment_method", "client_secret": f"{intent_id}_secret_standin"}
+
+    if method == "POST" and path == "/v1/prices":
+        return 200, {"id": _new_id("price"), "object": "price"}
+
+    if method == "POST" and path == "/v1/subscriptions":
+        intent_id = _new_id("pi")
+        return 200, {"id": _new_id("sub"), "object": "subscription", "status": "incomplete",
+                     "latest_invoice": {"id": _new_id("in"), "object": "invoice",
+                                        "payment_intent": {"id": intent_id, "object": "payment_intent",
+                                                           "client_secret": f"{intent_id}_secret_standin"}}}
+
+    if method == "POST" and path == "/v1/billing_portal/sessions":
+        return 200, {"id": _new_id("bps"), "object": "billing_portal.session",
+                     "url": f"https://billing.stripe.com/session/{uuid.uuid4().hex}"}
+
+    return 404, {"error": {"message": f"Unrecognized request URL ({method}: {path})", "type": "invalid_request_error"}}
+
+
+def turnstile_route(method: str, path: str, params: Dict[str, Any]) -> Response:
+    """Turnstile siteverify that accepts every non-empty token"""
+    if method != "POST":
+        return 405, {"success": False, "error-codes": ["method-not-allowed"]}
+
+    if not params.get("response"):
+        return 200, {"success": False, "error-codes": ["missing-input-response"]}
+
+    return 200, {"success": True, "challenge_ts": "2024-01-01T00:00:00.000Z", "hostname": "localhost"}
+
+
+def mailtrap_route(method: str, path: str, params: Dict[str, Any]) -> Response:
+    """Mailtrap sending API"""
+    if method == "POST" and path == "/api/send":
+        return 200, {"success": True, "message_ids": [uuid.uuid4().hex]}
+
+    return 404, {"errors": ["Not Found"]}
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Just enough SMTP for aiosmtplib.send (no TLS, no auth)"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.name = "smtp"
+        self.latency = latency
+        self.error_rate = error_rate
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "SMTPStandIn":
+        threading.Thread(target=self.serve_forever, name="standin-smtp", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server: SMTPStandIn = self.server
+        self._reply("220 standin ESMTP")
+        for raw in self.rfile:
+            command = raw.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self._reply("250-standin")
+                self._reply("250 8BITMIME")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self._reply("250 OK")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                for line in self.rfile:
+                    if line.rstrip(b"\r\n") == b".":
+                        break
+                with server._lock:
+                    server.request_count += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.error_rate and random.random() < server.error_rate:
+                    self._reply("451 injected failure")
+                else:
+                    self._reply("250 queued")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class StandIns:
+    """Starts and stops every stand-in together"""
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None,
+                 error_rate: Optional[Dict[str, float]] = None):
+        latency = latency or {}
+        error_rate = error_rate or {}
+        routes = {"stripe": stripe_route, "turnstile": turnstile_route, "mailtrap": mailtrap_route}
+        self.servers = {
+            name: StandInServer(name, route, latency.get(name, 0.0), error_rate.get(name, 0.0))
+            for name, route in routes.items()
+        }
+        self.servers["smtp"] = SMTPStandIn(latency.get("smtp", 0.0), error_rate.get("smtp", 0.0))
+
+    def __enter__(self) -> "StandIns":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self) -> "StandIns":
+        for server in self.servers.values():
+            server.start()
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.stop()
+
+    def app_env(self) -> Dict[str, str]:
+        """Environment that points the real app at these stand-ins"""
+        return {
+            "STRIPE_API_BASE": self.servers["stripe"].base_url,
+            "TURNSTILE_VERIFY_URL": f"{self.servers['turnstile'].base_url}/turnstile/v0/siteverify",
+            "MAILTRAP_API_BASE": self.servers["mailtrap"].base_url,
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_PORT": str(self.servers["smtp"].port),
+        }
+
+    def request_counts(self) -> Dict[str, int]:
+        return {name: server.request_count for name, server in self.servers.items()}
+
+
+class StandInsProcess:
+    """Runs StandIns in a child process so they don't share a GIL with the load driver"""
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None,
+                 error_rate: Optional[Dict[str, float]] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=self._serve, args=(child_conn,), daemon=True)
+        self._env: Dict[str, str] = {}
+        self.final_counts: Dict[str, int] = {}
+
+    def _serve(self, conn):
+        with StandIns(self.latency, self.error_rate) as standins:
+            conn.send(standins.app_env())
+            conn.recv()  # stop signal
+            conn.send(standins.request_counts())
+
+    def __enter__(self) -> "StandInsProcess":
+        self._process.start()
+        self._env = self._conn.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self._conn.send("stop")
+        self.final_counts = self._conn.recv()
+        self._process.join(timeout=5)
+
+    def app_env(self) -> Dict[str, str]:
+        return dict(self._env)
@@ -0,0 +1,141 @@
+"""
+Webhook replay benchmark
+
+Replays recorded Stripe events (10k synthetic ones by default, ~10% of
+them redelivered duplicates) against the real app running with a
+webhook secret and the Mailtrap stand-in, then reports:
+- ack latency (p50/p95/p99) and ack throughput
+- background processing throughput until the queue is drained
+
+Usage:
+    python benchmarks/webhook_replay.py [--events 10000] [--concurrency 32]
+    python benchmarks/webhook_replay.py --recording events.jsonl   # one event JSON per line
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app_process import BENCH_HEADERS, AppProcess, bench_env  # noqa: E402
+from standins import StandIns  # noqa: E402
+
+WEBHOOK_SECRET = "whsec_bench"
+ADMIN_HEADERS = {**BENCH_HEADERS, "Authorization": "Bearer bench-api-key"}
+
+
+def synthetic_events(count: int, duplicate_rate: float = 0.1, seed: int = 7) -> List[dict]:
+    """Deterministic mix of payment and customer events with redeliveries"""
+    rng = random.Random(seed)
+    events: List[dict] = []
+    for index in range(count):
+        if events and rng.random() < duplicate_rate:
+            events.append(rng.choice(events))
+            continue
+
+        kind = rng.random()
+        email = f"customer{index % 2000}@example.com"
+        if kind < 0.6:
+            event_type = "payment_intent.succeeded" if kind < 0.5 else "payment_intent.payment_failed"
+            obj = {"id": f"pi_{index}", "object": "payment_intent", "amount": 1000 + index % 500,
+                   "currency": "brl", "metadata": {"customer_name": f"Customer {index}", "customer_email": email,
+                                                   "payment_type": "one_time", "language": "pt"}}
+        elif kind < 0.9:
+            event_type = "customer.created"
+            obj = {"id": f"cus_{index}", "object": "customer", "email": email}
+        else:
+            event_type = "charge.refunded"
+            obj = {"id": f"ch_{index}", "object": "charge"}
+
+        events.append({"id": f"evt_{index}", "object": "event", "type": event_type, "data": {"object": obj}})
+    return events
+
+
+def sign(payload: bytes) -> str:
+    timestamp = str(int(time.time()))
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+async def replay(base_url: str, events: List[dict], concurrency: int) -> dict:
+    payloads = [json.dumps(event).encode() for event in events]
+    latencies: List[float] = []
+    statuses: dict = {}
+    cursor = iter(payloads)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=BENCH_HEADERS, timeout=30.0) as client:
+        async def sender():
+            for payload in cursor:
+                started = time.perf_counter()
+                response = await client.post("/api/v1/payments/webhook", content=payload,
+                                             headers={"Stripe-Signature": sign(payload),
+                                                      "Content-Type": "application/json"})
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(sender() for _ in range(concurrency)))
+        ack_elapsed = time.perf_counter() - started
+
+        # Wait for the worker pool to drain the queue
+        while True:
+            stats = (await client.get("/api/v1/admin/webhooks", headers=ADMIN_HEADERS)).json()
+            if stats["queued"] == 0 and stats["processed"] + stats["failed"] >= stats["received"] - stats["duplicates"] - stats["rejected"]:
+                break
+            await asyncio.sleep(0.05)
+        drain_elapsed = time.perf_counter() - started
+
+    return {
+        "events": len(events),
+        "statuses": statuses,
+        "ack_p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "ack_p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "ack_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "ack_per_second": round(len(events) / ack_elapsed, 1),
+        "processed_per_second": round(stats["processed"] / drain_elapsed, 1),
+        "server": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--recording", type=Path, help="JSONL file of recorded Stripe events")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4, help="WEBHOOK_WORKERS for the app")
+    parser.add_argument("--email-latency", type=float, default=0.005, help="Mailtrap stand-in latency (s)")
+    args = parser.parse_args()
+
+    if args.recording:
+        events = [json.loads(line) for line in args.recording.read_text().splitlines() if line.strip()]
+    else:
+        events = synthetic_events(args.events)
+
+    with StandIns(latency={"mailtrap": args.email_latency}) as standins:
+        env = bench_env(standins.app_env(), STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+                        WEBHOOK_WORKERS=str(args.workers), WEBHOOK_QUEUE_SIZE=str(len(events)),
+                        WARMUP_ENABLED="false")
+        with AppProcess(env) as app:
+            app.wait_until("/health")
+            result = asyncio.run(replay(app.base_url, events, args.concurrency))
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Worker scaling benchmark
+Runs the app under gunicorn (gunicorn.conf.py) with 1..N uvicorn workers
+against local stand-ins and saturates it from several driver processes,
+reporting throughput, latency and scaling efficiency versus linear.
+
+Routes:
+- session: POST /session only (app CPU: middleware, session minting)
+- checkout: POST /session then POST /create (adds Turnstile/Stripe/email stand-ins)
+
+Usage:
+    python benchmarks/worker_scaling.py [--max-workers 4] [--route session] [--duration 10]
+Scaling can't exceed the CPUs left after the drivers and stand-ins, so run
+it on a machine with at least max-workers + drivers cores.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app_process import BENCH_HEADERS, AppProcess, bench_env, free_port, payment_payload  # noqa: E402
+from standins import StandInsProcess  # noqa: E402
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+async def saturate(base_url: str, route: str, concurrency: int, duration: float) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, headers=BENCH_HEADERS, timeout=30.0,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def user(index: int):
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/api/v1/payments/session")
+                    if route == "checkout" and response.status_code == 200:
+                        response = await client.post(
+                            "/api/v1/payments/create", json=payment_payload(index),
+                            headers={"X-Session-Key": response.json()["session_key"]}
+                        )
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(user(index) for index in range(concurrency)))
+
+    return {"latencies": latencies, "errors": errors}
+
+
+def driver(args) -> Dict:
+    return asyncio.run(saturate(*args))
+
+
+def measure(workers: int, standin_env: Dict[str, str], args) -> Dict:
+    port = free_port()
+    env = bench_env(standin_env, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}",
+                    LOG_LEVEL="warning", WARMUP_ENABLED="false",
+                    STRIPE_RATE_LIMIT="100000", STRIPE_RATE_BURST="100000", STRIPE_MAX_CONCURRENCY="1000")
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"]
+
+    with AppProcess(env, port=port, command=command) as app:
+        app.wait_until("/health")
+        # Let every worker finish booting before measuring
+        time.sleep(1.0 + 0.5 * workers)
+
+        with multiprocessing.Pool(args.drivers) as pool:
+            job = (app.base_url, args.route, args.concurrency, args.duration)
+            results = pool.map(driver, [job] * args.drivers)
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    return {
+        "workers": workers,
+        "requests_per_second": round(len(latencies) / args.duration, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "errors": sum(result["errors"] for result in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--route", choices=["session", "checkout"], default="session")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per worker count")
+    parser.add_argument("--drivers", type=int, default=2, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per driver")
+    args = parser.parse_args()
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    if cpus < args.max_workers + args.drivers:
+        print(f"Warning: {cpus} CPUs for {args.max_workers} workers + {args.drivers} drivers, "
+              f"scaling will flatten early", file=sys.stderr)
+
+    rows = []
+    with StandInsProcess(latency={"stripe": 0.02, "turnstile": 0.01, "mailtrap": 0.01}) as standins:
+        for workers in range(1, args.max_workers + 1):
+            row = measure(workers, standins.app_env(), args)
+            row["efficiency"] = round(row["requests_per_second"] / (rows[0]["requests_per_second"] * workers), 2) \
+                if rows else 1.0
+            rows.append(row)
+            print(f"{workers} worker(s): {row['requests_per_second']:>8} req/s  p50 {row['p50_ms']}ms  "
+                  f"p99 {row['p99_ms']}ms  efficiency {row['efficiency']:.0%}  errors {row['errors']}")
+
+    print(json.dumps({"route": args.route, "cpus": cpus, "results": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
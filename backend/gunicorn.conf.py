@@ -0,0 +1,58 @@
+"""
+Gunicorn configuration for multi-worker production mode
+- Prefork master with uvicorn workers (one event loop per worker)
+- Worker count from WEB_CONCURRENCY, else from the container's CPU quota
+- Workers are recycled after MAX_REQUESTS (+ jitter) requests
+- `kill -HUP <master>` reloads code and config with graceful worker rollover
+
+Run with: gunicorn -c gunicorn.conf.py main:app
+"""
+
+import math
+import os
+
+
+def cpu_quota() -> int:
+    """CPUs available to this container (cgroup v2/v1 quota, else affinity)"""
+    try:
+        quota, period = open("/sys/fs/cgroup/cpu.max").read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+
+    try:
+        quota = int(open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read())
+        period = int(open("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read())
+        if quota > 0:
+            return max(1, math.ceil(quota / period))
+    except (OSError, ValueError):
+        pass
+
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY") or cpu_quota())
+
+# The app reads WEB_CONCURRENCY to split per-process budgets (rate limits,
+# Stripe limiter) between workers; workers inherit the master's environment
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Recycle workers to bound slow memory growth
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+
+# Seconds a worker gets to finish in-flight requests on reload/shutdown; the app
+# drains for SHUTDOWN_DRAIN_TIMEOUT, then flushes, so keep this above both
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+# Import the app in each worker (not the master) so HUP picks up new code
+preload_app = False
+
+accesslog = None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
@@ -1,15 +1,26 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
-import stripe
+from fastapi.responses import JSONResponse, Response
 import logging
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.routers import payments
+from app.routers import admin, payments
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.shutdown import ShutdownMiddleware
+from app.middleware.reloadable import ReloadableCORSMiddleware, ReloadableTrustedHostMiddleware
 from app.middleware.security import rate_limit_middleware, security_headers_middleware, real_ip_middleware
+from app.services.health_service import health_service
+from app.services.http_clients import close_http_clients, configure_stripe, configure_thread_pool
+from app.services.loop_monitor import loop_monitor
+from app.services.runtime_config import runtime_config
+from app.services.shutdown import shutdown_coordinator
+from app.services.state_snapshot import state_snapshot_service
+from app.services.ledger import ledger
+from app.services.warmup_service import run_warmup
+from app.services.webhook_service import webhook_service
 from app.utils.logging import setup_logging
+from app.utils.responses import ORJSONResponse, static_json_body
 
 
 # Configure logging
@@ -20,28 +31,58 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    stripe.api_key = settings.stripe_secret_key
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+    configure_thread_pool()
+    configure_stripe()
+    runtime_config.start()
+    shutdown_coordinator.start()
     logger.info(f"Starting Ezyba API in {settings.environment} mode")
+    if settings.state_snapshot_enabled:
+        state_snapshot_service.restore()
+        state_snapshot_service.start()
+    if settings.warmup_enabled:
+        await run_warmup()
+    health_service.start()
+    ledger.start()
+    if webhook_service.enabled:
+        webhook_service.start()
+    # Lag from restore and warm-up would otherwise shed the first requests
+    loop_monitor.reset_recent()
     yield
-    # Shutdown
+    # Shutdown: wait for in-flight requests and background tasks (up to
+    # SHUTDOWN_DRAIN_TIMEOUT), then stop the services in order
     logger.info("Shutting down Ezyba API")
+    steps = {}
+    if settings.state_snapshot_enabled:
+        steps["state_snapshot"] = state_snapshot_service.stop
+    steps.update({
+        "health_probes": health_service.stop,
+        "webhook_queue": webhook_service.stop,
+        "ledger_flush": ledger.stop,
+        "http_clients": close_http_clients,
+        "loop_monitor": loop_monitor.stop,
+        "runtime_config": runtime_config.stop,
+    })
+    await shutdown_coordinator.shutdown(steps)
 
 
 app = FastAPI(
     title=settings.api_title,
     version=settings.api_version,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Innermost: per-client concurrency cap and load shedding by route priority
+app.add_middleware(AdmissionMiddleware)
+
 # Security Middleware
-app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=settings.allowed_hosts_list + ["127.0.0.1"]
-)
+# Host and origin lists follow the runtime config (reloadable)
+app.add_middleware(ReloadableTrustedHostMiddleware, extra_hosts=["127.0.0.1"])
 
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins_list,
+    ReloadableCORSMiddleware,
     allow_credentials=True,
     allow_methods=["GET", "POST"],
     allow_headers=["*"],
@@ -52,14 +93,34 @@ app.middleware("http")(real_ip_middleware)
 app.middleware("http")(rate_limit_middleware)
 app.middleware("http")(security_headers_middleware)
 
+# Outside the other middlewares, so profiles include all of them; absent unless enabled
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+
+# Outside everything, so a request is in flight until its response is sent
+app.add_middleware(ShutdownMiddleware)
+
 # Include routers
 app.include_router(payments.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
+
+
+HEALTH_BODY = static_json_body({"status": "healthy", "environment": settings.environment})
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "environment": settings.environment}
+    return Response(content=HEALTH_BODY, media_type="application/json")
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint served from cached background dependency probes"""
+    ready, payload = health_service.get_status()
+    if shutdown_coordinator.draining:
+        ready, payload = False, {**payload, "status": "shutting_down"}
+    return JSONResponse(status_code=200 if ready else 503, content=payload)
 
 
 @app.exception_handler(Exception)
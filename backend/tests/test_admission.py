@@ -0,0 +1,139 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+import asyncio
+import time
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from main import app
+from app.services.shutdown import shutdown_coordinator
+from app.services.admission import (
+    ADMITTED,
+    CLIENT_LIMIT,
+    OVERLOADED,
+    PRIORITY_CRITICAL,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+    AdmissionController,
+    admission_controller,
+)
+
+client = TestClient(app)
+
+
+def make_controller(lag: float = 0.0) -> AdmissionController:
+    return AdmissionController(max_in_flight=10, max_loop_lag=0.1, per_client=3, retry_after=2,
+                               lag_source=lambda: lag)
+
+
+@pytest.fixture
+def loop_lag():
+    """Set the lag the global controller sees"""
+    original = admission_controller.lag_source
+
+    def set_lag(seconds: float):
+        admission_controller.lag_source = lambda: seconds
+
+    yield set_lag
+    admission_controller.lag_source = original
+
+
+class TestAdmissionController:
+
+    def test_per_client_in_flight_limit(self):
+        """Test that one client can't hold more than its share of slots"""
+        controller = make_controller()
+        for _ in range(3):
+            assert controller.admit("203.0.113.1", PRIORITY_CRITICAL) == ADMITTED
+
+        assert controller.admit("203.0.113.1", PRIORITY_CRITICAL) == CLIENT_LIMIT
+        assert controller.admit("203.0.113.2", PRIORITY_CRITICAL) == ADMITTED
+
+        controller.release("203.0.113.1")
+        assert controller.admit("203.0.113.1", PRIORITY_CRITICAL) == ADMITTED
+
+    def test_low_priority_is_shed_first_by_queue_depth(self):
+        """Test that /config-like routes are refused before /payments/create"""
+        controller = make_controller()
+        for index in range(7):
+            assert controller.admit(f"198.51.100.{index}", PRIORITY_CRITICAL) == ADMITTED
+
+        assert controller.admit("192.0.2.1", PRIORITY_LOW) == OVERLOADED
+        assert controller.admit("192.0.2.1", PRIORITY_NORMAL) == ADMITTED
+        assert controller.admit("192.0.2.2", PRIORITY_CRITICAL) == ADMITTED
+        assert controller.rejected == {"overloaded:low": 1}
+
+    def test_loop_lag_counts_as_load(self):
+        """Test that event-loop lag alone triggers shedding"""
+        controller = make_controller(lag=0.09)
+        assert controller.admit("192.0.2.1", PRIORITY_NORMAL) == OVERLOADED
+        assert controller.admit("192.0.2.1", PRIORITY_CRITICAL) == ADMITTED
+
+        controller.lag_source = lambda: 0.2
+        assert controller.admit("192.0.2.1", PRIORITY_CRITICAL) == OVERLOADED
+
+    def test_release_forgets_idle_clients(self):
+        """Test that per-client counters don't grow with the number of clients seen"""
+        controller = make_controller()
+        for index in range(5):
+            controller.admit(f"192.0.2.{index}", PRIORITY_NORMAL)
+            controller.release(f"192.0.2.{index}")
+
+        assert controller.in_flight == 0
+        assert len(controller.by_client) == 0
+
+
+class TestAdmissionMiddleware:
+
+    def test_overloaded_low_priority_route_gets_503(self, loop_lag):
+        """Test that /config is shed with Retry-After while /payments/create still gets through"""
+        loop_lag(admission_controller.max_loop_lag * 0.7)
+
+        response = client.get("/api/v1/payments/config")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(admission_controller.retry_after)
+
+        response = client.post("/api/v1/payments/create", json={})
+        assert response.status_code != 503
+
+    def test_health_is_never_shed(self, loop_lag):
+        """Test that probes answer even under full load"""
+        loop_lag(admission_controller.max_loop_lag * 10)
+        assert client.get("/health").status_code == 200
+
+    def test_client_over_concurrency_limit_gets_429(self):
+        """Test that a client already holding every slot is refused"""
+        admission_controller.by_client["testclient"] = admission_controller.per_client
+        try:
+            response = client.get("/api/v1/payments/config")
+        finally:
+            del admission_controller.by_client["testclient"]
+
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+        assert admission_controller.in_flight == 0
+
+
+class TestStartup:
+
+    def test_first_config_after_warmup_is_admitted(self):
+        """Test that loop lag from a stalling warm-up doesn't shed the first requests after startup"""
+        async def stalling_warmup():
+            time.sleep(0.4)  # blocks the loop longer than ADMISSION_MAX_LOOP_LAG
+            await asyncio.sleep(0.15)  # let the heartbeat record it
+            time.sleep(0.4)  # and leave one beat waiting
+
+        with patch("main.settings.warmup_enabled", True), patch("main.settings.loop_monitor_enabled", True), \
+                patch("main.run_warmup", stalling_warmup):
+            try:
+                with TestClient(app) as started:
+                    response = started.get("/api/v1/payments/config")
+            finally:
+                # Leaving the lifespan drains the process; the module-level client keeps serving
+                shutdown_coordinator.draining = False
+
+        assert response.status_code == 200
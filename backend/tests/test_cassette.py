@@ -0,0 +1,189 @@
+import asyncio
+import json
+import pytest
+import time
+from unittest.mock import patch
+import sys
+import os
+
+import httpx
+import requests
+import stripe
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services import http_clients
+from app.services.cassette import (
+    MAGIC,
+    MODE_RECORD,
+    MODE_REPLAY,
+    Cassette,
+    CassetteAdapter,
+    CassetteTransport,
+    read_cassette,
+)
+from app.services.counter_store import MAGIC as COUNTER_MAGIC
+from app.services.state_snapshot import MAGIC as SNAPSHOT_MAGIC
+from app.services.turnstile_service import TurnstileService, token_cache
+
+STRIPE_CUSTOMERS = "https://api.stripe.com/v1/customers"
+SITEVERIFY = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
+JSON_HEADERS = (("Content-Type", "application/json"),)
+
+
+def customer_body(customer_id: str) -> bytes:
+    return json.dumps({"id": customer_id, "object": "customer", "email": "buyer@example.com"}).encode()
+
+
+def recorded_cassette(tmp_path, **kwargs) -> Cassette:
+    """Record a few exchanges, save them and open the file for replay"""
+    path = tmp_path / "checkout.cassette"
+    recorder = Cassette(str(path), MODE_RECORD)
+    recorder.record("POST", STRIPE_CUSTOMERS, 200, JSON_HEADERS, customer_body("cus_1"), 0.05)
+    recorder.record("POST", STRIPE_CUSTOMERS, 200, JSON_HEADERS, customer_body("cus_2"), 0.05)
+    recorder.record("GET", f"{STRIPE_CUSTOMERS}?limit=1&email=a%40example.com", 200, JSON_HEADERS,
+                    b'{"object": "list", "data": [], "has_more": false}', 0.01)
+    recorder.record("POST", SITEVERIFY, 200, JSON_HEADERS + (("Content-Encoding", "gzip"),),
+                    b'{"success": true, "hostname": "example.com"}', 0.02)
+    recorder.save()
+    return Cassette(str(path), MODE_REPLAY, **kwargs)
+
+
+def replay_session(cassette: Cassette) -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", CassetteAdapter(cassette))
+    return session
+
+
+class TestCassetteFile:
+
+    def test_round_trip(self, tmp_path):
+        """Test that exchanges come back from the file as recorded, minus framing headers"""
+        cassette = recorded_cassette(tmp_path)
+        exchanges = [exchange for _, _, exchange in read_cassette(cassette.path)]
+        assert [exchange.label for exchange in exchanges] == [
+            f"POST {STRIPE_CUSTOMERS}", f"POST {STRIPE_CUSTOMERS}", f"GET {STRIPE_CUSTOMERS}", f"POST {SITEVERIFY}",
+        ]
+        assert exchanges[0].body == customer_body("cus_1")
+        assert exchanges[3].headers == JSON_HEADERS
+        assert exchanges[2].latency == pytest.approx(0.01)
+
+    def test_invalid_file_is_rejected(self, tmp_path):
+        """Test that replaying a file that isn't a cassette fails loudly"""
+        path = tmp_path / "bad.cassette"
+        path.write_bytes(b"not a cassette at all")
+        with pytest.raises(ValueError):
+            Cassette(str(path), MODE_REPLAY)
+
+    def test_magic_is_not_shared_with_other_formats(self):
+        """Test that the cassette magic is not shared with the counter table or state snapshot"""
+        assert len({MAGIC, COUNTER_MAGIC, SNAPSHOT_MAGIC}) == 3
+
+    def test_unknown_mode_is_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            Cassette(str(tmp_path / "x.cassette"), "rewind")
+
+
+class TestMatching:
+
+    def test_exact_then_route_match_and_cycling(self, tmp_path):
+        """Test query-insensitive ordering, path fallback and cycling through repeats"""
+        cassette = recorded_cassette(tmp_path)
+        assert cassette.find("GET", f"{STRIPE_CUSTOMERS}?email=a%40example.com&limit=1").status == 200
+        # Never recorded for this email: served by the path match
+        assert cassette.find("GET", f"{STRIPE_CUSTOMERS}?email=z%40example.com&limit=1") is not None
+        bodies = [cassette.find("POST", STRIPE_CUSTOMERS).body for _ in range(3)]
+        assert bodies == [customer_body("cus_1"), customer_body("cus_2"), customer_body("cus_1")]
+        assert cassette.find("DELETE", STRIPE_CUSTOMERS) is None
+        assert cassette.stats()["misses"] == 1
+
+    def test_hosts_are_not_matched(self, tmp_path):
+        """Test that a recording made against one base URL replays against another"""
+        cassette = recorded_cassette(tmp_path)
+        assert cassette.find("POST", "http://127.0.0.1:8421/v1/customers").body == customer_body("cus_1")
+
+
+class TestReplay:
+
+    def test_stripe_sdk_parses_replayed_response(self, tmp_path):
+        """Test that the Stripe SDK goes through its own request and response handling"""
+        cassette = recorded_cassette(tmp_path, latency=0)
+        client = stripe.StripeClient("sk_test_cassette", http_client=stripe.RequestsClient(
+            session=replay_session(cassette)))
+        customer = client.customers.create(params={"email": "buyer@example.com"})
+        assert isinstance(customer, stripe.Customer)
+        assert customer.id == "cus_1"
+
+    def test_recorded_latency_is_honoured(self, tmp_path):
+        """Test that replay waits the recorded time, scaled or overridden"""
+        session = replay_session(recorded_cassette(tmp_path, latency_scale=2.0))
+        started = time.perf_counter()
+        assert session.post(STRIPE_CUSTOMERS).json()["id"] == "cus_1"
+        assert time.perf_counter() - started >= 0.1
+
+        session = replay_session(recorded_cassette(tmp_path, latency=0))
+        started = time.perf_counter()
+        session.post(STRIPE_CUSTOMERS)
+        assert time.perf_counter() - started < 0.05
+
+    def test_miss_fails_like_an_unreachable_host(self, tmp_path):
+        """Test that an unrecorded request raises the client's connection error"""
+        cassette = recorded_cassette(tmp_path, latency=0)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            replay_session(cassette).get("https://api.stripe.com/v1/prices")
+
+        async def call():
+            async with httpx.AsyncClient(transport=CassetteTransport(cassette, httpx.AsyncHTTPTransport())) as client:
+                await client.get("https://api.stripe.com/v1/prices")
+
+        with pytest.raises(httpx.ConnectError):
+            asyncio.run(call())
+
+    def test_turnstile_verification_replays_through_shared_client(self, tmp_path):
+        """Test that the app's pooled httpx client picks up the cassette"""
+        token_cache.clear()
+        http_clients.use_cassette(recorded_cassette(tmp_path, latency=0))
+        try:
+            service = TurnstileService()
+            service.secret_key = "0x-production-secret"
+            result = asyncio.run(service.verify_token("cassette-token"))
+        finally:
+            http_clients.use_cassette(None)
+            token_cache.clear()
+        assert result["success"] is True
+
+
+class TestRecord:
+
+    def test_httpx_transport_records(self, tmp_path):
+        """Test that responses from the real transport are recorded and passed through"""
+        cassette = Cassette(str(tmp_path / "rec.cassette"), MODE_RECORD)
+        upstream = httpx.MockTransport(lambda request: httpx.Response(200, json={"success": True}))
+
+        async def call():
+            async with httpx.AsyncClient(transport=CassetteTransport(cassette, upstream)) as client:
+                return await client.post(SITEVERIFY, data={"response": "tok"})
+
+        response = asyncio.run(call())
+        assert response.json() == {"success": True}
+        cassette.save()
+        [(_, _, exchange)] = read_cassette(cassette.path)
+        assert exchange.label == f"POST {SITEVERIFY}"
+        assert json.loads(exchange.body) == {"success": True}
+
+    def test_requests_adapter_records(self, tmp_path):
+        """Test that the adapter records what the real adapter returned"""
+        cassette = Cassette(str(tmp_path / "rec.cassette"), MODE_RECORD)
+        upstream = requests.Response()
+        upstream.status_code = 200
+        upstream.headers["Content-Type"] = "application/json"
+        upstream._content = customer_body("cus_live")
+
+        with patch.object(requests.adapters.HTTPAdapter, "send", return_value=upstream):
+            session = requests.Session()
+            session.mount("https://", CassetteAdapter(cassette))
+            assert session.post(STRIPE_CUSTOMERS, data={"email": "buyer@example.com"}).json()["id"] == "cus_live"
+
+        assert cassette.stats()["recorded"] == 1
+        assert cassette.recorded[0][2].body == customer_body("cus_live")
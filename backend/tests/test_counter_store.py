@@ -0,0 +1,93 @@
+import multiprocessing
+import time
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.counter_store import MemoryCounterStore, SharedMemoryCounterStore, key_digest
+
+
+def hammer(path: str, key: str, hits: int, limit: int, results):
+    store = SharedMemoryCounterStore(path, slots=1024)
+    results.put(sum(store.hit(key, limit, 60).allowed for _ in range(hits)))
+    store.close()
+
+
+class TestMemoryCounterStore:
+
+    def test_limit_and_window_reset(self):
+        """Test that hits beyond the limit are refused until the window ends"""
+        store = MemoryCounterStore()
+        assert [store.hit("ip:1", 2, 0.05).allowed for _ in range(3)] == [True, True, False]
+
+        time.sleep(0.06)
+        assert store.hit("ip:1", 2, 0.05).allowed is True
+
+    def test_expired_windows_are_swept(self):
+        """Test that keys whose window ended are dropped"""
+        store = MemoryCounterStore(sweep_interval=0)
+        store.hit("ip:old", 10, 0.01)
+        time.sleep(0.02)
+        store.hit("ip:new", 10, 60)
+
+        assert "ip:old" not in store
+        assert "ip:new" in store
+
+
+class TestSharedMemoryCounterStore:
+
+    def test_workers_share_counters(self, tmp_path):
+        """Test that two handles on the same table see the same counts"""
+        path = str(tmp_path / "counters")
+        worker_a = SharedMemoryCounterStore(path, slots=1024)
+        worker_b = SharedMemoryCounterStore(path, slots=1024)
+
+        assert worker_a.hit("session:abc", 3, 60).count == 1
+        assert worker_b.hit("session:abc", 3, 60).count == 2
+        assert worker_a.hit("session:abc", 3, 60).allowed is True
+        assert worker_b.hit("session:abc", 3, 60).allowed is False
+        assert worker_a.hit("session:other", 3, 60).count == 1
+
+    def test_concurrent_processes_never_exceed_limit(self, tmp_path):
+        """Test that bucket locking keeps the count exact across processes"""
+        path = str(tmp_path / "counters")
+        SharedMemoryCounterStore(path, slots=1024).close()
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=hammer, args=(path, "ip:203.0.113.1", 200, 500, results))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=30)
+
+        assert sum(results.get(timeout=5) for _ in workers) == 500
+
+    def test_full_bucket_evicts_entry_expiring_first(self, tmp_path):
+        """Test that the table stays fixed-size by evicting within a bucket"""
+        store = SharedMemoryCounterStore(str(tmp_path / "counters"), slots=2, bucket_size=2)
+        store.hit("a", 10, 10)
+        store.hit("b", 10, 60)
+        store.hit("c", 10, 60)
+
+        assert store.evictions == 1
+        assert store.hit("b", 10, 60).count == 2
+        assert store.hit("a", 10, 10).count == 1
+
+    def test_snapshot_is_restored_once_per_table(self, tmp_path):
+        """Test that a recycled worker's restore doesn't overwrite live shared counts"""
+        path = str(tmp_path / "counters")
+        now = time.time()
+        snapshot = [(key_digest("ip:1"), now, now + 60, 5), (key_digest("ip:2"), now, now + 60, 2)]
+        first = SharedMemoryCounterStore(path, slots=64, bucket_size=2)
+        assert first.load(snapshot) == 2
+        for _ in range(3):
+            first.hit("ip:1", 100, 60)
+
+        recycled = SharedMemoryCounterStore(path, slots=64, bucket_size=2)
+        assert recycled.load(snapshot) == 0
+        assert recycled.hit("ip:1", 100, 60).count == 9
+        assert recycled.hit("ip:2", 100, 60).count == 3
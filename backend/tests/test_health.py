@@ -0,0 +1,60 @@
+import asyncio
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from main import app
+from app.services.health_service import HealthService, health_service
+
+client = TestClient(app)
+
+
+class TestReadiness:
+
+    def test_not_ready_before_first_probe_round(self):
+        """Test that a fresh service reports starting"""
+        service = HealthService()
+        ready, payload = service.get_status()
+        assert ready is False
+        assert payload["status"] == "starting"
+
+    def test_ready_after_successful_round(self):
+        """Test that a successful probe round marks the service ready"""
+        service = HealthService()
+        probe = AsyncMock(return_value={"ok": True, "latency_ms": 1.0})
+
+        with patch.object(service, "_probe_connection", probe):
+            assert asyncio.run(service.run_probe_round()) is True
+
+        ready, payload = service.get_status()
+        assert ready is True
+        assert payload["status"] == "ready"
+        assert "event_loop" in payload["checks"]
+
+    def test_degraded_after_failing_round(self):
+        """Test that a failing dependency after startup reports degraded"""
+        service = HealthService()
+
+        with patch.object(service, "_probe_connection", AsyncMock(return_value={"ok": True})):
+            asyncio.run(service.run_probe_round())
+        with patch.object(service, "_probe_connection", AsyncMock(return_value={"ok": False, "error": "timeout"})):
+            assert asyncio.run(service.run_probe_round()) is False
+
+        ready, payload = service.get_status()
+        assert ready is False
+        assert payload["status"] == "degraded"
+
+    def test_ready_endpoint_uses_cached_status(self):
+        """Test that /ready answers from the cached probe results"""
+        with patch.object(health_service, "get_status", return_value=(False, {"status": "starting", "checks": {}})):
+            response = client.get("/ready")
+        assert response.status_code == 503
+
+        with patch.object(health_service, "get_status", return_value=(True, {"status": "ready", "checks": {}})):
+            response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
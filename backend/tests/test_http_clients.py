@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+import requests
+from mailtrap.api.sending import SendingApi
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services import http_clients
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    http_clients.use_cassette(None)
+    yield
+    http_clients.use_cassette(None)
+
+
+class TestMailtrapClient:
+
+    def test_sending_api_uses_our_pooled_session(self):
+        """Test that the Mailtrap client sends through the session we built, and shutdown closes it"""
+        session = http_clients.get_mailtrap_session()
+        assert isinstance(session, requests.Session)
+        assert session.get_adapter("https://send.api.mailtrap.io")._pool_maxsize == http_clients.POOL_SIZE
+        assert session.headers["Authorization"].startswith("Bearer ")
+
+        asyncio.run(http_clients.close_http_clients())
+        assert http_clients._mailtrap_session is None
+
+    def test_falls_back_to_stock_client_when_internals_change(self):
+        """Test that a mailtrap release without the private hooks doesn't break startup"""
+        with patch.object(http_clients.PooledMailtrapHttpClient, "__init__",
+                          side_effect=AttributeError("mailtrap HttpClient no longer has _session/_url")):
+            api = http_clients.get_mailtrap_sending_api()
+
+        assert isinstance(api, SendingApi)
+        assert http_clients.get_mailtrap_session() is None
+        asyncio.run(http_clients.close_http_clients())
@@ -179,4 +179,108 @@ class TestPaymentModels:
                 amount=1000,
                 currency=Currency.USD,
                 payment_type=PaymentType.ONE_TIME
-            )
\ No newline at end of file
+            )
+
+class TestCheckoutSession:
+
+    def test_config_is_cacheable_and_mints_no_session(self):
+        """Test that /config is static, ETag'd and leaves no server-side session"""
+        from app.services.session_service import session_service
+        sessions_before = len(session_service.active_sessions)
+
+        response = client.get("/api/v1/payments/config")
+        assert response.status_code == 200
+        assert "session_key" not in response.json()
+        assert response.headers["Cache-Control"].startswith("public, max-age=")
+        assert len(session_service.active_sessions) == sessions_before
+
+        revalidated = client.get("/api/v1/payments/config", headers={"If-None-Match": response.headers["ETag"]})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+
+    def test_session_is_minted_on_request(self):
+        """Test that POST /session returns a key the create endpoint accepts"""
+        from app.services.session_service import session_service
+
+        response = client.post("/api/v1/payments/session")
+        assert response.status_code == 200
+        assert response.headers.get("Cache-Control") is None or "public" not in response.headers["Cache-Control"]
+        session = response.json()
+        assert session["expires_at"] > 0
+        assert session_service.validate_session_key(session["session_key"], "testclient", "testclient")
+
+
+class TestJSONResponses:
+
+    def test_health_body_is_preserialized(self):
+        """Test that /health serves the constant body as JSON"""
+        response = client.get("/health")
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == {"status": "healthy", "environment": "development"}
+
+    @patch('app.services.turnstile_service.TurnstileService.verify_token', new_callable=AsyncMock)
+    @patch('app.services.stripe_service.StripeService.create_customer', new_callable=AsyncMock)
+    @patch('app.services.stripe_service.StripeService.create_payment_intent', new_callable=AsyncMock)
+    def test_create_returns_model_body_and_server_timing(self, mock_payment, mock_customer, mock_turnstile):
+        """Test that the pre-serialized PaymentResponse keeps its fields and headers"""
+        mock_turnstile.return_value = {"success": True}
+        mock_customer.return_value = {"success": True, "customer": type('Customer', (), {"id": "cus_test123"})()}
+        mock_payment.return_value = {
+            "success": True,
+            "payment_intent": type('PaymentIntent', (), {"id": "pi_test123"})(),
+            "client_secret": "pi_test123_secret"
+        }
+
+        session_key = client.post("/api/v1/payments/session").json()["session_key"]
+        payment_data = {
+            "name": "John Doe",
+            "email": "john@example.com",
+            "amount": 1000,
+            "currency": "usd",
+            "payment_type": "one_time",
+            "turnstile_token": "test_token",
+            "language": "en"
+        }
+
+        response = client.post("/api/v1/payments/create", json=payment_data, headers={"X-Session-Key": session_key})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert "Server-Timing" in response.headers
+        data = response.json()
+        assert data["success"] is True
+        assert data["payment_id"] == "pi_test123"
+        assert data["client_secret"] == "pi_test123_secret"
+
+    @patch('app.services.turnstile_service.TurnstileService.verify_token', new_callable=AsyncMock)
+    @patch('app.services.stripe_service.StripeService.create_customer', new_callable=AsyncMock)
+    @patch('app.services.stripe_service.StripeService.create_payment_intent', new_callable=AsyncMock)
+    def test_client_retry_reuses_idempotency_key(self, mock_payment, mock_customer, mock_turnstile):
+        """Test that resubmitting a checkout in the same session sends Stripe the same key"""
+        mock_turnstile.return_value = {"success": True}
+        mock_customer.return_value = {"success": True, "customer": type('Customer', (), {"id": "cus_retry"})()}
+        mock_payment.return_value = {
+            "success": True,
+            "payment_intent": type('PaymentIntent', (), {"id": "pi_retry"})(),
+            "client_secret": "pi_retry_secret"
+        }
+
+        session_key = client.post("/api/v1/payments/session").json()["session_key"]
+        payment_data = {
+            "name": "Jane Retry",
+            "email": "retry@example.com",
+            "amount": 1500,
+            "currency": "usd",
+            "payment_type": "one_time",
+            "turnstile_token": "first_token"
+        }
+        headers = {"X-Session-Key": session_key}
+
+        client.post("/api/v1/payments/create", json=payment_data, headers=headers)
+        client.post("/api/v1/payments/create", json={**payment_data, "turnstile_token": "second_token"}, headers=headers)
+        client.post("/api/v1/payments/create", json={**payment_data, "amount": 2500}, headers=headers)
+
+        keys = [call.kwargs["idempotency_key"] for call in mock_payment.call_args_list]
+        assert len(keys) == 3
+        assert keys[0] == keys[1]
+        assert keys[2] != keys[0]
+
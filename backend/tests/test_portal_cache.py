@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.portal_cache import MAX_TTL, PortalSessionCache, portal_cache
+from app.services.stripe_service import StripeService
+
+RETURN_URL = "https://example.com/en/manage"
+
+
+class SlowPortal:
+    """Stand-in for the Stripe call: counts calls, answers after a delay"""
+
+    def __init__(self, delay: float = 0.05, success: bool = True):
+        self.delay = delay
+        self.success = success
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if not self.success:
+            return {"success": False, "error": "No such customer"}
+        return {"success": True, "url": f"https://billing.stripe.com/session/{self.calls}"}
+
+
+class TestPortalSessionCache:
+
+    def test_repeat_visits_reuse_the_url(self):
+        """Test that the same customer and return URL get the cached session"""
+        cache = PortalSessionCache(maxsize=10, ttl=60)
+        create = SlowPortal()
+
+        async def run():
+            first = await cache.get_or_create("cus_1", RETURN_URL, create)
+            second = await cache.get_or_create("cus_1", RETURN_URL, create)
+            other_page = await cache.get_or_create("cus_1", "https://example.com/br/gerenciar", create)
+            return first, second, other_page
+
+        first, second, other_page = asyncio.run(run())
+        assert first["url"] == second["url"]
+        assert other_page["url"] != first["url"]
+        assert create.calls == 2
+        assert cache.stats()["hits"] == 1
+
+    def test_concurrent_requests_share_one_call(self):
+        """Test that a double click makes one Stripe call"""
+        cache = PortalSessionCache(maxsize=10, ttl=60)
+        create = SlowPortal()
+
+        async def run():
+            return await asyncio.gather(*(cache.get_or_create("cus_1", RETURN_URL, create) for _ in range(5)))
+
+        results = asyncio.run(run())
+        assert create.calls == 1
+        assert len({result["url"] for result in results}) == 1
+        assert cache.coalesced == 4
+        assert cache.pending == {}
+        assert cache.stats()["saved_stripe_seconds"] > 0
+
+    def test_cancelled_waiter_does_not_cancel_the_shared_call(self):
+        """Test that a client going away leaves the call running for the others"""
+        cache = PortalSessionCache(maxsize=10, ttl=60)
+        create = SlowPortal()
+
+        async def run():
+            leader = asyncio.create_task(cache.get_or_create("cus_1", RETURN_URL, create))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(cache.get_or_create("cus_1", RETURN_URL, create))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(run())["success"]
+        assert create.calls == 1
+
+    def test_failures_are_not_cached(self):
+        """Test that an error answer is shared by concurrent waiters but not remembered"""
+        cache = PortalSessionCache(maxsize=10, ttl=60)
+        create = SlowPortal(success=False)
+
+        async def run():
+            await asyncio.gather(*(cache.get_or_create("cus_1", RETURN_URL, create) for _ in range(3)))
+            return await cache.get_or_create("cus_1", RETURN_URL, create)
+
+        assert not asyncio.run(run())["success"]
+        assert create.calls == 2
+
+    def test_ttl_is_capped_under_the_url_lifetime(self):
+        """Test that a long TTL can't outlive Stripe's portal URL"""
+        assert PortalSessionCache(maxsize=10, ttl=3600).urls.ttl == MAX_TTL
+        assert not PortalSessionCache(maxsize=10, ttl=0).enabled
+
+    @patch('app.services.stripe_service.StripeService._call')
+    def test_stripe_service_goes_through_the_cache(self, mock_call):
+        """Test that StripeService makes one billing portal call for repeated requests"""
+        async def create_session(*args, **kwargs):
+            return SimpleNamespace(url="https://billing.stripe.com/session/abc")
+
+        mock_call.side_effect = create_session
+        portal_cache.clear()
+        service = StripeService()
+
+        async def run():
+            return await asyncio.gather(
+                *(service.create_customer_portal_session("cus_svc", RETURN_URL) for _ in range(3))
+            )
+
+        results = asyncio.run(run())
+        asyncio.run(service.create_customer_portal_session("cus_svc", RETURN_URL))
+        portal_cache.clear()
+
+        assert all(result["url"] == "https://billing.stripe.com/session/abc" for result in results)
+        assert mock_call.call_count == 1
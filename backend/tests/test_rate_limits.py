@@ -0,0 +1,118 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from main import app
+from app.services.counter_store import MemoryCounterStore
+from app.services.rate_limits import (
+    KEY_EMAIL,
+    KEY_IP,
+    KEY_SESSION,
+    RateLimitBucket,
+    RateLimitPolicy,
+    RateLimiter,
+)
+
+client = TestClient(app)
+
+BUCKETS = (
+    RateLimitBucket("default", 100, 60),
+    RateLimitBucket("config", 3, 60),
+    RateLimitBucket("checkout", 2, 60),
+    RateLimitBucket("per_session", 5, 60, KEY_SESSION),
+    RateLimitBucket("per_email", 1, 60, KEY_EMAIL),
+)
+
+POLICIES = (
+    RateLimitPolicy("/health", ()),
+    RateLimitPolicy("/config", ("config",), ("GET",)),
+    RateLimitPolicy("/create", ("checkout", "per_session", "per_email"), ("POST",)),
+    RateLimitPolicy("/portal", ("checkout",), ("POST",)),
+)
+
+
+def make_limiter(**kwargs) -> RateLimiter:
+    return RateLimiter(BUCKETS, POLICIES, store=MemoryCounterStore(), workers=1, **kwargs)
+
+
+def ip_keys(ip: str = "203.0.113.1", session: str = None):
+    return {KEY_IP: ip, KEY_SESSION: session}
+
+
+class TestRateLimitPolicies:
+
+    def test_routes_are_matched_by_method_and_path(self):
+        """Test exact matches, method filtering, exemptions and the default"""
+        limiter = make_limiter()
+        assert [b.name for b in limiter.buckets_for("GET", "/config")] == ["config"]
+        assert [b.name for b in limiter.buckets_for("POST", "/config")] == ["default"]
+        assert limiter.buckets_for("GET", "/health") == ()
+        assert limiter.buckets_for("HEAD", "/health") == ()
+        assert [b.name for b in limiter.buckets_for("GET", "/unknown")] == ["default"]
+
+    def test_shared_bucket_spans_routes(self):
+        """Test that a bucket listed by two routes is one budget"""
+        limiter = make_limiter()
+        assert limiter.check("POST", "/portal", ip_keys()) is None
+        assert limiter.check("POST", "/create", ip_keys(session="s1")) is None
+
+        denial = limiter.check("POST", "/portal", ip_keys())
+        assert denial.bucket.name == "checkout"
+        assert limiter.check("POST", "/portal", ip_keys("203.0.113.2")) is None
+
+    def test_config_does_not_spend_checkout_budget(self):
+        """Test that cheap routes have their own bucket"""
+        limiter = make_limiter()
+        for _ in range(3):
+            assert limiter.check("GET", "/config", ip_keys()) is None
+        assert limiter.check("GET", "/config", ip_keys()).bucket.name == "config"
+        assert limiter.check("POST", "/create", ip_keys(session="s1")) is None
+
+    def test_email_buckets_wait_for_the_email(self):
+        """Test that email-keyed buckets are skipped until the route passes the email"""
+        limiter = make_limiter()
+        assert limiter.check("POST", "/create", ip_keys(session="s1")) is None
+        assert limiter.check("POST", "/create", {KEY_EMAIL: "buyer@example.com"}) is None
+
+        denial = limiter.check("POST", "/create", {KEY_EMAIL: "buyer@example.com"})
+        assert denial.bucket.name == "per_email"
+        assert limiter.rejected["per_email"] == 1
+
+    def test_limits_are_split_between_workers_without_shared_counters(self):
+        """Test that per-worker stores enforce each worker's share"""
+        limiter = RateLimiter(BUCKETS, POLICIES, store=MemoryCounterStore(), workers=2)
+        assert limiter.buckets["default"].limit == 50
+        assert limiter.buckets["per_email"].limit == 1
+
+    def test_bad_policies_fail_at_startup(self):
+        """Test that undefined buckets, unknown keys and duplicate routes are rejected when compiling"""
+        with pytest.raises(ValueError, match="undefined buckets"):
+            RateLimiter(BUCKETS, (RateLimitPolicy("/x", ("missing",)),), store=MemoryCounterStore())
+        with pytest.raises(ValueError, match="unknown key"):
+            RateLimiter((RateLimitBucket("default", 1, 60, "cookie"),), (), store=MemoryCounterStore())
+        with pytest.raises(ValueError, match="defined twice"):
+            RateLimiter(BUCKETS, POLICIES + (RateLimitPolicy("/config", ("default",), ("get",)),),
+                        store=MemoryCounterStore())
+
+
+class TestRateLimitMiddleware:
+
+    def test_exhausted_bucket_returns_429_with_retry_after(self):
+        """Test that the middleware answers 429 instead of raising"""
+        limiter = RateLimiter(
+            (RateLimitBucket("default", 100, 60), RateLimitBucket("config", 1, 60)),
+            (RateLimitPolicy("/api/v1/payments/config", ("config",), ("GET",)),),
+            store=MemoryCounterStore(), workers=1,
+        )
+        with patch('app.middleware.security.rate_limiter', limiter):
+            assert client.get("/api/v1/payments/config").status_code == 200
+            response = client.get("/api/v1/payments/config")
+
+        assert response.status_code == 429
+        assert 1 <= int(response.headers["Retry-After"]) <= 60
+        assert client.get("/health").status_code == 200
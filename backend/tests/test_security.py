@@ -106,4 +106,4 @@ class TestSecurity:
         """Test that config endpoint doesn't require auth (public)"""
         response = client.get("/api/v1/payments/config")
         assert response.status_code == 200
-        assert "publishable_key" in response.json()
\ No newline at end of file
+        assert "publishable_key" in response.json()
@@ -0,0 +1,37 @@
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.session_service import SessionAPIService
+
+
+class TestSessionKeys:
+
+    def test_key_minted_by_another_worker_is_accepted(self):
+        """Test that a worker validates keys it did not generate"""
+        minting_worker, other_worker = SessionAPIService(), SessionAPIService()
+        session_key = minting_worker.generate_session_key("203.0.113.5", "agent")
+
+        assert other_worker.validate_session_key(session_key, "203.0.113.5", "agent") is True
+        assert session_key in other_worker.active_sessions
+
+    def test_key_is_bound_to_client_ip(self):
+        """Test that another IP cannot use an adopted key"""
+        session_key = SessionAPIService().generate_session_key("203.0.113.5", "agent")
+        assert SessionAPIService().validate_session_key(session_key, "203.0.113.6", "agent") is False
+
+    def test_tampered_or_expired_keys_are_rejected(self):
+        """Test that the signature covers the expiry and nonce"""
+        service = SessionAPIService()
+        session_key = service.generate_session_key("203.0.113.5", "agent")
+        expires_at, nonce, signature = session_key[len("sess_"):].split(".")
+
+        extended = f"sess_{int(expires_at) + 3600}.{nonce}.{signature}"
+        assert SessionAPIService().validate_session_key(extended, "203.0.113.5", "agent") is False
+        assert SessionAPIService().validate_session_key("sess_garbage", "203.0.113.5", "agent") is False
+
+        expired_key = f"sess_{int(expires_at) - 7200}.{nonce}"
+        expired_key = f"{expired_key}.{service._sign(expired_key[len('sess_'):], '203.0.113.5')}"
+        assert SessionAPIService().validate_session_key(expired_key, "203.0.113.5", "agent") is False
@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import asyncio
+
+from app.services.counter_store import MemoryCounterStore, SharedMemoryCounterStore, key_digest
+from app.services.state_snapshot import StateSnapshotService, read_snapshot
+
+
+class TestStateSnapshot:
+
+    def test_round_trip_restores_counts(self, tmp_path):
+        """Test that counters survive a save and restore into a fresh store"""
+        store = MemoryCounterStore()
+        for _ in range(3):
+            store.hit("ip:203.0.113.5", 10, 60)
+        asyncio.run(StateSnapshotService(store, str(tmp_path / "counters.snap"), 60).save())
+
+        restarted = MemoryCounterStore()
+        assert StateSnapshotService(restarted, str(tmp_path / "counters.snap"), 60).restore() == 1
+        assert restarted.hit("ip:203.0.113.5", 10, 60).count == 4
+
+    def test_expired_windows_are_not_restored(self, tmp_path):
+        """Test that a window ending before the restart is dropped"""
+        path = tmp_path / "counters.snap"
+        store = MemoryCounterStore()
+        store.hit("ip:short", 10, 0.01)
+        store.hit("ip:long", 10, 60)
+        asyncio.run(StateSnapshotService(store, str(path), 60).save())
+        time.sleep(0.02)
+
+        restarted = MemoryCounterStore()
+        assert StateSnapshotService(restarted, str(path), 60).restore() == 1
+        assert "ip:long" in restarted
+        assert "ip:short" not in restarted
+
+    def test_missing_or_corrupt_snapshot_is_ignored(self, tmp_path):
+        """Test that a bad file never blocks startup"""
+        path = tmp_path / "counters.snap"
+        assert StateSnapshotService(MemoryCounterStore(), str(path), 60).restore() == 0
+
+        path.write_bytes(b"EZYS" + b"\x00" * 40)
+        assert list(read_snapshot(path)) == []
+        assert StateSnapshotService(MemoryCounterStore(), str(path), 60).restore() == 0
+
+    def test_save_replaces_file_atomically(self, tmp_path):
+        """Test that no temp files are left next to the snapshot"""
+        store = MemoryCounterStore()
+        store.hit("session:abc", 50, 1800)
+        service = StateSnapshotService(store, str(tmp_path / "counters.snap"), 60)
+        asyncio.run(service.save())
+        asyncio.run(service.save())
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["counters.snap", "counters.snap.lock"]
+        assert [record[0] for record in read_snapshot(service.path)] == [key_digest("session:abc")]
+
+    def test_restore_into_shared_memory_store(self, tmp_path):
+        """Test that the shm backend loads the same snapshot format"""
+        store = MemoryCounterStore()
+        store.hit("ip:1", 10, 60)
+        store.hit("ip:1", 10, 60)
+        asyncio.run(StateSnapshotService(store, str(tmp_path / "counters.snap"), 60).save())
+
+        shared = SharedMemoryCounterStore(str(tmp_path / "shm"), slots=64)
+        try:
+            assert StateSnapshotService(shared, str(tmp_path / "counters.snap"), 60).restore() == 1
+            assert shared.hit("ip:1", 10, 60).count == 3
+        finally:
+            shared.close()
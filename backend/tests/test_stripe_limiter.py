@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.stripe_limiter import (
+    OutboundLimiter,
+    LimiterTimeoutError,
+    PRIORITY_PAYMENT,
+    PRIORITY_BACKGROUND,
+)
+from app.models.payment import PaymentRequest
+from app.services.circuit_breaker import CircuitBreaker, DependencyTimeoutError
+from app.services.stripe_service import StripeService
+
+
+class TestOutboundLimiter:
+
+    def test_concurrency_is_capped(self):
+        """Test that no more than max_concurrency calls run at once"""
+        limiter = OutboundLimiter("test", rate=1000, burst=1000, max_concurrency=2, max_wait=5)
+        peak = 0
+
+        async def worker():
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(*(worker() for _ in range(8)))
+
+        asyncio.run(run())
+        assert peak == 2
+        assert limiter.in_flight == 0
+        assert limiter.acquired == 8
+
+    def test_payment_calls_jump_the_queue(self):
+        """Test that queued payment calls are served before background calls"""
+        limiter = OutboundLimiter("test", rate=1000, burst=1000, max_concurrency=1, max_wait=5)
+        order = []
+
+        async def worker(name, priority):
+            async with limiter.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            blocker = asyncio.create_task(worker("first", PRIORITY_BACKGROUND))
+            await asyncio.sleep(0)
+            background = asyncio.create_task(worker("background", PRIORITY_BACKGROUND))
+            await asyncio.sleep(0)
+            payment = asyncio.create_task(worker("payment", PRIORITY_PAYMENT))
+            await asyncio.gather(blocker, background, payment)
+
+        asyncio.run(run())
+        assert order == ["first", "payment", "background"]
+
+    def test_bounded_wait_raises(self):
+        """Test that waiting longer than max_wait fails fast"""
+        limiter = OutboundLimiter("test", rate=1000, burst=1000, max_concurrency=1, max_wait=0.05)
+
+        async def run():
+            await limiter.acquire()
+            with pytest.raises(LimiterTimeoutError):
+                await limiter.acquire()
+            limiter.release()
+
+        asyncio.run(run())
+        assert limiter.timeouts == 1
+        assert limiter.in_flight == 0
+
+    def test_token_bucket_paces_calls(self):
+        """Test that calls beyond the burst wait for refilled tokens"""
+        limiter = OutboundLimiter("test", rate=100, burst=1, max_concurrency=10, max_wait=5)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            for _ in range(4):
+                async with limiter.slot():
+                    pass
+            return loop.time() - started
+
+        elapsed = asyncio.run(run())
+        assert elapsed >= 0.025
+        assert "payment" in limiter.snapshot()["queue_wait"]
+
+
+class TestStripeServiceCalls:
+
+    def service(self) -> StripeService:
+        service = StripeService()
+        service.limiter = OutboundLimiter("test", rate=1000, burst=1000, max_concurrency=5, max_wait=5)
+        service.breaker = CircuitBreaker("test-stripe")
+        return service
+
+    def test_timed_out_call_holds_its_slot_until_the_thread_returns(self):
+        """Test that giving up on a slow SDK call does not free its slot while Stripe may still be working"""
+        service = self.service()
+        release = threading.Event()
+
+        async def run():
+            with pytest.raises(DependencyTimeoutError):
+                await service._call(lambda: release.wait(5), timeout=0.05)
+            held = service.limiter.in_flight
+            release.set()
+            for _ in range(100):
+                if service.limiter.in_flight == 0:
+                    break
+                await asyncio.sleep(0.01)
+            return held
+
+        assert asyncio.run(run()) == 1
+        assert service.limiter.in_flight == 0
+
+    def test_create_calls_carry_idempotency_keys(self):
+        """Test that each create call of a payment gets its own stable idempotency key"""
+        service = self.service()
+        payment_request = PaymentRequest(name="John Doe", email="john@example.com", amount=1000, currency="usd",
+                                         payment_type="one_time", turnstile_token="token", language="en")
+        intent = SimpleNamespace(id="pi_1", client_secret="pi_1_secret")
+
+        with patch("stripe.PaymentIntent.create", return_value=intent) as create:
+            asyncio.run(service.create_payment_intent(payment_request, "cus_1", idempotency_key="abc123"))
+            asyncio.run(service.create_payment_intent(payment_request, "cus_1"))
+
+        assert create.call_args_list[0].kwargs["idempotency_key"] == "abc123-payment-intent"
+        assert "idempotency_key" not in create.call_args_list[1].kwargs
@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.turnstile_service import TokenReplayCache, TurnstileService, token_cache
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+
+def make_service(payload, status_code=200) -> TurnstileService:
+    service = TurnstileService()
+    service.secret_key = "0x-production-secret"
+    service._siteverify = AsyncMock(return_value=FakeResponse(payload, status_code))
+    return service
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+class TestTokenReplayCache:
+
+    def test_success_is_reused_by_the_same_session_only(self):
+        """Test that a verified token is replayed locally for its session and rejected for others"""
+        service = make_service({"success": True, "hostname": "example.com"})
+
+        first = asyncio.run(service.verify_token("token-1", session_key="session-a"))
+        retry = asyncio.run(service.verify_token("token-1", session_key="session-a"))
+        replay = asyncio.run(service.verify_token("token-1", session_key="session-b"))
+
+        assert first["success"] and retry["success"]
+        assert not replay["success"]
+        assert replay["error_codes"] == ["timeout-or-duplicate"]
+        assert service._siteverify.await_count == 1
+
+    def test_rejected_token_is_answered_locally(self):
+        """Test that a token siteverify refused is not sent again"""
+        service = make_service({"success": False, "error-codes": ["invalid-input-response"]})
+        rejected_before = token_cache.replays_rejected
+
+        for _ in range(3):
+            result = asyncio.run(service.verify_token("bad-token", session_key="session-a"))
+            assert not result["success"]
+            assert result["error_codes"] == ["invalid-input-response"]
+        assert service._siteverify.await_count == 1
+        assert token_cache.replays_rejected - rejected_before == 2
+
+    def test_api_errors_are_not_remembered(self):
+        """Test that a Turnstile API error leaves the token retryable"""
+        service = make_service({}, status_code=429)
+
+        asyncio.run(service.verify_token("token-2", session_key="session-a"))
+        asyncio.run(service.verify_token("token-2", session_key="session-a"))
+
+        assert service._siteverify.await_count == 2
+
+    def test_internal_error_is_not_remembered(self):
+        """Test that a failure siteverify may not repeat leaves the token retryable"""
+        service = make_service({"success": False, "error-codes": ["internal-error"]})
+
+        asyncio.run(service.verify_token("token-4", session_key="session-a"))
+        asyncio.run(service.verify_token("token-4", session_key="session-a"))
+
+        assert service._siteverify.await_count == 2
+
+    def test_retry_window_expires(self):
+        """Test that the bound session cannot reuse the token after the retry window"""
+        cache = TokenReplayCache(maxsize=10, ttl=300, retry_window=0)
+        cache.remember("token-3", {"success": True}, "session-a")
+
+        assert cache.lookup("token-3", "session-a")["error_codes"] == ["timeout-or-duplicate"]
+
+    def test_tokens_are_stored_hashed(self):
+        """Test that raw tokens are never kept in memory"""
+        cache = TokenReplayCache(maxsize=10, ttl=300, retry_window=60)
+        cache.remember("secret-token", {"success": True}, "session-a")
+
+        assert "secret-token" not in cache.entries
+        assert cache.lookup("secret-token", "session-a")["success"]
@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from main import app
+from app.services.webhook_service import WebhookService, webhook_service
+from app.services.stripe_service import customer_cache
+from app.services.ledger import PaymentLedger
+
+client = TestClient(app)
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+def signed_headers(payload: bytes, secret: str = WEBHOOK_SECRET) -> dict:
+    timestamp = str(int(time.time()))
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return {"Stripe-Signature": f"t={timestamp},v1={signature}", "Content-Type": "application/json"}
+
+
+def make_event(event_id: str, event_type: str = "payment_intent.succeeded", **obj) -> dict:
+    data = {
+        "id": "pi_test123",
+        "object": "payment_intent",
+        "amount": 1000,
+        "currency": "usd",
+        "metadata": {
+            "customer_name": "John Doe",
+            "customer_email": "john@example.com",
+            "payment_type": "one_time",
+            "language": "en"
+        }
+    }
+    data.update(obj)
+    return {"id": event_id, "type": event_type, "data": {"object": data}}
+
+
+class TestWebhookEndpoint:
+
+    def setup_method(self):
+        webhook_service.secret = WEBHOOK_SECRET
+        webhook_service.queue = None
+        webhook_service.seen_events.clear()
+
+    def teardown_method(self):
+        webhook_service.secret = None
+        webhook_service.queue = None
+
+    def test_signed_event_is_acknowledged(self):
+        """Test that a correctly signed event is queued"""
+        payload = json.dumps(make_event("evt_1")).encode()
+        response = client.post("/api/v1/payments/webhook", content=payload, headers=signed_headers(payload))
+
+        assert response.status_code == 200
+        assert response.json() == {"received": True, "duplicate": False}
+        assert webhook_service.queue.qsize() == 1
+
+    def test_invalid_signature_is_rejected(self):
+        """Test that events signed with another secret are rejected"""
+        payload = json.dumps(make_event("evt_2")).encode()
+        response = client.post("/api/v1/payments/webhook", content=payload, headers=signed_headers(payload, "whsec_other"))
+
+        assert response.status_code == 400
+
+    def test_duplicate_event_is_dropped(self):
+        """Test that redelivered events are acknowledged but not queued twice"""
+        payload = json.dumps(make_event("evt_3")).encode()
+        client.post("/api/v1/payments/webhook", content=payload, headers=signed_headers(payload))
+        response = client.post("/api/v1/payments/webhook", content=payload, headers=signed_headers(payload))
+
+        assert response.json()["duplicate"] is True
+        assert webhook_service.queue.qsize() == 1
+
+    def test_disabled_without_secret(self):
+        """Test that the endpoint is hidden when no webhook secret is configured"""
+        webhook_service.secret = None
+        response = client.post("/api/v1/payments/webhook", content=b"{}")
+        assert response.status_code == 404
+
+
+class TestWebhookHandlers:
+
+    def test_payment_succeeded_sends_confirmation(self):
+        """Test that a succeeded payment intent sends the success email"""
+        service = WebhookService()
+        email_service = AsyncMock()
+
+        with patch('app.services.webhook_service.get_email_service', return_value=email_service):
+            asyncio.run(service.handle(make_event("evt_4")))
+
+        payment_request, payment_id, success = email_service.send_payment_confirmation.call_args.args
+        assert payment_id == "pi_test123"
+        assert success is True
+        assert payment_request.email == "john@example.com"
+        assert payment_request.language == "en"
+
+    def test_subscription_intent_is_left_to_invoice(self):
+        """Test that subscription payment intents do not send a second email"""
+        service = WebhookService()
+        email_service = AsyncMock()
+
+        with patch('app.services.webhook_service.get_email_service', return_value=email_service):
+            asyncio.run(service.handle(make_event("evt_5", invoice="in_123")))
+
+        email_service.send_payment_confirmation.assert_not_called()
+
+    def test_failure_email_is_sent_once_per_intent(self, tmp_path):
+        """Test that repeated declines of one intent, handled by different workers, send one email"""
+        workers = [WebhookService(), WebhookService()]
+        email_service = AsyncMock()
+
+        with patch('app.services.webhook_service.get_email_service', return_value=email_service), \
+                patch('app.services.webhook_service.ledger', PaymentLedger(str(tmp_path / "payments.db"))):
+            for index, worker in enumerate(workers * 2):
+                asyncio.run(worker.handle(make_event(f"evt_decline{index}", "payment_intent.payment_failed")))
+
+        email_service.send_payment_confirmation.assert_called_once()
+        assert email_service.send_payment_confirmation.call_args.args[2] is False
+
+    def test_customer_events_update_cache(self):
+        """Test that customer events keep the customer cache fresh"""
+        service = WebhookService()
+        customer = {"id": "cus_abc", "object": "customer", "email": "cache@example.com"}
+
+        asyncio.run(service.handle({"id": "evt_6", "type": "customer.created", "data": {"object": customer}}))
+        assert customer_cache.get("cache@example.com").id == "cus_abc"
+
+        asyncio.run(service.handle({"id": "evt_7", "type": "customer.deleted", "data": {"object": customer}}))
+        assert customer_cache.get("cache@example.com") is None